@@ -0,0 +1,127 @@
+"""Requêtes/seconde et p99 des listes du catalogue, WSGI contre ASGI, sans serveur HTTP.
+
+Les requêtes sont envoyées directement aux handlers de Django : N threads pour WSGI,
+N coroutines pour ASGI, chacune enchaînant ses requêtes.
+
+    python -m benchmarks.bench_asgi --livres 10000 --concurrence 1 8 32 --requetes 400
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+from benchmarks.utils import setup, afficher
+
+CHEMINS = {
+    'viewset': '/api/livres/',
+    'async': '/api/async/livres/',
+}
+
+
+def statistiques(durees, total):
+    durees.sort()
+    p99 = durees[min(len(durees) - 1, int(len(durees) * 0.99))]
+    return f'{len(durees) / total:.0f}', f'{p99 * 1000:.1f}'
+
+
+def charge_wsgi(application, chemin, jeton, concurrence, requetes):
+    def environ():
+        env = {'PATH_INFO': chemin, 'QUERY_STRING': 'page_size=20', 'HTTP_AUTHORIZATION': f'Bearer {jeton}'}
+        setup_testing_defaults(env)
+        return env
+
+    def client(nombre):
+        durees = []
+        for _ in range(nombre):
+            debut = time.perf_counter()
+            corps = application(environ(), lambda statut, entetes: None)
+            b''.join(corps)
+            corps.close()
+            durees.append(time.perf_counter() - debut)
+        return durees
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(concurrence) as pool:
+        resultats = list(pool.map(client, [requetes // concurrence] * concurrence))
+    return statistiques([d for durees in resultats for d in durees], time.perf_counter() - debut)
+
+
+def charge_asgi(application, chemin, jeton, concurrence, requetes):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': chemin, 'raw_path': chemin.encode(), 'query_string': b'page_size=20', 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {jeton}'.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+
+    async def requete():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        termine = asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Django écoute la déconnexion du client jusqu'à la fin de la réponse
+            await termine.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start' and message['status'] != 200:
+                raise RuntimeError(f'{chemin} : statut {message["status"]}')
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                termine.set()
+
+        await application(dict(scope), receive, send)
+
+    async def client(nombre, durees):
+        for _ in range(nombre):
+            debut = time.perf_counter()
+            await requete()
+            durees.append(time.perf_counter() - debut)
+
+    async def lancer():
+        durees = []
+        debut = time.perf_counter()
+        await asyncio.gather(*(client(requetes // concurrence, durees) for _ in range(concurrence)))
+        return statistiques(durees, time.perf_counter() - debut)
+
+    return asyncio.run(lancer())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--livres', type=int, default=10000)
+    parser.add_argument('--concurrence', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requetes', type=int, default=400)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import Group
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+    from django.test import override_settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from benchmarks.utils import peupler
+    from gestion.models import UserAccount
+    from gestion.roles import add_roles_claim
+
+    peupler(livres=args.livres)
+    lecteur = UserAccount.objects.create(username='bench-asgi', email='asgi@example.com')
+    lecteur.groups.add(Group.objects.get_or_create(name='lecteur')[0])
+    jeton = str(add_roles_claim(RefreshToken.for_user(lecteur).access_token, lecteur))
+
+    wsgi, asgi = get_wsgi_application(), get_asgi_application()
+    lignes = []
+    # Le cache de pages des viewsets est désactivé : on compare le coût complet d'une page
+    with override_settings(GESTION_HTTP_CACHE={'CACHE': 'aucun'}):
+        for concurrence in args.concurrence:
+            for nom, chemin in CHEMINS.items():
+                lignes.append(('WSGI', nom, concurrence, *charge_wsgi(wsgi, chemin, jeton, concurrence, args.requetes)))
+                lignes.append(('ASGI', nom, concurrence, *charge_asgi(asgi, chemin, jeton, concurrence, args.requetes)))
+
+    afficher(f'GET liste de livres ({args.livres} livres, 20 par page)',
+             ['serveur', 'vue', 'concurrence', 'req/s', 'p99 ms'], lignes)
+
+
+if __name__ == '__main__':
+    main()
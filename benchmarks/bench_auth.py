@@ -0,0 +1,65 @@
+"""Débit des GET authentifiés : JWTAuthentication de SimpleJWT (lecture de UserAccount à chaque
+requête) contre StatelessJWTAuthentication (utilisateur construit depuis le jeton).
+
+    python -m benchmarks.bench_auth --requetes 2000
+"""
+import argparse
+import time
+from benchmarks.utils import setup, afficher, peupler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--livres', type=int, default=1000)
+    parser.add_argument('--requetes', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import Group
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from gestion.authentication import StatelessJWTAuthentication, ajouter_revendications
+    from gestion.liste_noire import RefreshToken
+    from gestion.models import Livre, UserAccount
+    from gestion.views import LivreViewSet, RechercheView
+
+    peupler(livres=args.livres)
+    lecteur = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+    lecteur.groups.add(Group.objects.create(name='lecteur'))
+    entete = f'Bearer {ajouter_revendications(RefreshToken.for_user(lecteur).access_token, lecteur)}'
+    livre = Livre.objects.order_by('pk').first()
+    factory = APIRequestFactory()
+
+    cas = (
+        # Page servie par le cache HTTP : l'authentification est l'essentiel du travail restant
+        ('liste (cache de pages)', lambda classes: LivreViewSet.as_view({'get': 'list'}, authentication_classes=classes), '/api/livres/', {}),
+        ('détail', lambda classes: LivreViewSet.as_view({'get': 'retrieve'}, authentication_classes=classes), f'/api/livres/{livre.pk}/', {'pk': livre.pk}),
+        ('recherche', lambda classes: RechercheView.as_view(authentication_classes=classes), '/api/search/?q=Livre+1&limit=5', {}),
+    )
+    lignes = []
+    for nom, fabrique, url, kwargs in cas:
+        for authentification in (JWTAuthentication, StatelessJWTAuthentication):
+            vue = fabrique([authentification])
+
+            def appeler():
+                response = vue(factory.get(url, HTTP_AUTHORIZATION=entete), **kwargs)
+                assert response.status_code == 200, response.status_code
+                return response.render()
+
+            appeler()
+            with CaptureQueriesContext(connection) as ctx:
+                appeler()
+            debut = time.perf_counter()
+            for _ in range(args.requetes):
+                appeler()
+            duree = time.perf_counter() - debut
+            lignes.append((nom, authentification.__name__, len(ctx.captured_queries), f'{args.requetes / duree:.0f}',
+                           f'{duree / args.requetes * 1e6:.0f}'))
+
+    afficher('GET authentifiés (séquentiels)', ['vue', 'authentification', 'requêtes SQL', 'req/s', 'µs/req'], lignes)
+
+
+if __name__ == '__main__':
+    main()
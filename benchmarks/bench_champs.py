@@ -0,0 +1,70 @@
+"""Octets par page et temps de sérialisation des listes : complète, résumée, `?fields=`.
+
+    python -m benchmarks.bench_champs --livres 10000 --page-size 100
+"""
+import argparse
+from benchmarks.utils import setup, mesurer, afficher, peupler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--livres', type=int, default=10000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import Group
+    from django.test import override_settings
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from gestion.models import UserAccount
+    from gestion.serializers import AuteurSerializer, LivreSerializer, restreindre_queryset
+    from gestion.views import AuteurViewSet, LivreViewSet
+
+    peupler(livres=args.livres, auteurs=args.livres // 5)
+    lecteur = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+    lecteur.groups.add(Group.objects.create(name='lecteur'))
+    factory = APIRequestFactory()
+
+    cas = []
+    for nom, viewset, serializer_class, legers in (
+        ('livres', LivreViewSet, LivreSerializer, 'id,titre'),
+        ('auteurs', AuteurViewSet, AuteurSerializer, 'id,nom'),
+    ):
+        complets = ','.join(serializer_class().fields)
+        cas += [
+            (nom, 'complète', viewset, serializer_class, {'fields': complets}),
+            (nom, 'résumé', viewset, serializer_class, {}),
+            (nom, f'fields={legers}', viewset, serializer_class, {'fields': legers}),
+        ]
+
+    lignes = []
+    # Sans le cache de pages : chaque appel refait requêtes et sérialisation
+    with override_settings(GESTION_HTTP_CACHE={'CACHE': 'aucun'}):
+        for nom, mode, viewset, serializer_class, params in cas:
+            params = {**params, 'page_size': args.page_size}
+            vue = viewset.as_view({'get': 'list'})
+
+            def appeler():
+                request = factory.get(f'/api/{nom}/', params)
+                force_authenticate(request, lecteur)
+                response = vue(request)
+                assert response.status_code == 200, response.status_code
+                return response.render()
+
+            octets = len(appeler().content)
+            requete, _ = mesurer(appeler, args.repetitions)
+
+            # Sérialisation seule, sur une page déjà chargée
+            contexte = {'request': Request(factory.get(f'/api/{nom}/', params)), 'summary': True}
+            queryset = restreindre_queryset(viewset.queryset.all(), serializer_class(context=contexte))
+            page = list(queryset.order_by('pk')[:args.page_size])
+            serialisation, _ = mesurer(lambda: serializer_class(page, many=True, context=contexte).data, args.repetitions)
+            lignes.append((nom, mode, octets, f'{requete:.2f}', f'{serialisation:.2f}'))
+
+    afficher(f'Une page de {args.page_size} lignes', ['liste', 'représentation', 'octets', 'requête ms', 'sérialisation ms'], lignes)
+
+
+if __name__ == '__main__':
+    main()
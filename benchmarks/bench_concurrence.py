@@ -0,0 +1,146 @@
+"""Lectures et écritures concurrentes sur EmpruntViewSet : des processus lecteurs listent les
+emprunts pendant que des processus écrivains enchaînent emprunts et retours (comme autant de
+workers gunicorn), avec SQLite par défaut (journal
+« delete », transactions DEFERRED, connexion rouverte à chaque requête) puis avec le profil
+'production' de gestion.sqlite (WAL, PRAGMA, IMMEDIATE, connexions persistantes).
+
+Chaque configuration tourne dans un processus à part, sur une base neuve.
+
+    python -m benchmarks.bench_concurrence --lecteurs 8 --ecrivains 2 --duree 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import multiprocessing
+import time
+from benchmarks.utils import setup, afficher, peupler
+
+CONFIGURATIONS = (('SQLite par défaut', 'defaut'), ('gestion.sqlite (production)', 'production'))
+
+
+def percentile(durees, p):
+    durees = sorted(durees)
+    return durees[min(len(durees) - 1, int(len(durees) * p))] if durees else 0
+
+
+def mesurer_configuration(args):
+    setup()
+    from django.contrib.auth.models import Group
+    from django.db import OperationalError, close_old_connections, connections
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from gestion.models import Emprunt, Livre, UserAccount
+    from gestion.views import EmpruntViewSet
+
+    peupler(livres=args.livres, emprunts=args.emprunts)
+    lecteur = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+    lecteur.groups.add(Group.objects.create(name='lecteur'))
+    admin = UserAccount.objects.create(username='admin', email='admin@example.com')
+    admin.groups.add(Group.objects.create(name='admin'), Group.objects.get(name='lecteur'))
+    livres = list(Livre.objects.values_list('pk', flat=True))
+    connections.close_all()
+
+    factory = APIRequestFactory()
+    lister = EmpruntViewSet.as_view({'get': 'list'}, throttle_classes=[])
+    emprunter = EmpruntViewSet.as_view({'post': 'checkout'}, throttle_classes=[])
+    rendre = EmpruntViewSet.as_view({'post': 'retour'}, throttle_classes=[])
+    fin = time.monotonic() + args.duree
+
+    def requete(resultats, appel):
+        # Comme le cycle request_started / request_finished : CONN_MAX_AGE décide de garder la connexion
+        close_old_connections()
+        debut = time.perf_counter()
+        try:
+            response = appel()
+        except OperationalError as e:
+            resultats['verrou' if 'locked' in str(e) else 'autre'] += 1
+            return None
+        finally:
+            close_old_connections()
+        resultats['durees'].append(time.perf_counter() - debut)
+        return response
+
+    def lire(resultats):
+        while time.monotonic() < fin:
+            request = factory.get('/api/emprunts/?limit=20')
+            force_authenticate(request, lecteur)
+            requete(resultats, lambda: lister(request).render())
+
+    def ecrire(resultats, rang):
+        numero = rang
+        while time.monotonic() < fin:
+            numero += args.ecrivains
+            request = factory.post('/api/emprunts/checkout/', {'livre': livres[numero % len(livres)]}, format='json')
+            force_authenticate(request, admin)
+            response = requete(resultats, lambda: emprunter(request))
+            if response is not None and response.status_code == 201:
+                request = factory.post(f"/api/emprunts/{response.data['id']}/return/")
+                force_authenticate(request, admin)
+                requete(resultats, lambda: rendre(request, pk=response.data['id']))
+
+    def processus(file, genre, *params):
+        resultats = {'durees': [], 'verrou': 0, 'autre': 0}
+        (lire if genre == 'lecture' else ecrire)(resultats, *params)
+        connections.close_all()
+        file.put((genre, resultats))
+
+    # fork : les processus héritent de Django configuré et de la base peuplée (connexions fermées)
+    contexte = multiprocessing.get_context('fork')
+    file = contexte.Queue()
+    enfants = [contexte.Process(target=processus, args=(file, 'lecture')) for _ in range(args.lecteurs)]
+    enfants += [contexte.Process(target=processus, args=(file, 'ecriture', rang)) for rang in range(args.ecrivains)]
+    for enfant in enfants:
+        enfant.start()
+    resultats = {'lecture': [], 'ecriture': []}
+    erreurs = {'verrou': 0, 'autre': 0}
+    for _ in enfants:
+        genre, partiel = file.get()
+        resultats[genre] += partiel['durees']
+        erreurs['verrou'] += partiel['verrou']
+        erreurs['autre'] += partiel['autre']
+    for enfant in enfants:
+        enfant.join()
+
+    print(json.dumps({
+        'lectures': len(resultats['lecture']), 'ecritures': len(resultats['ecriture']),
+        'lecture_p50': percentile(resultats['lecture'], 0.5) * 1000, 'lecture_p99': percentile(resultats['lecture'], 0.99) * 1000,
+        'ecriture_p50': percentile(resultats['ecriture'], 0.5) * 1000, 'ecriture_p99': percentile(resultats['ecriture'], 0.99) * 1000,
+        **erreurs, 'emprunts': Emprunt.objects.count(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--livres', type=int, default=1000)
+    parser.add_argument('--emprunts', type=int, default=20000)
+    parser.add_argument('--lecteurs', type=int, default=8)
+    parser.add_argument('--ecrivains', type=int, default=2)
+    parser.add_argument('--duree', type=float, default=10)
+    parser.add_argument('--configuration', choices=[cle for _, cle in CONFIGURATIONS])
+    args = parser.parse_args()
+
+    if args.configuration:
+        return mesurer_configuration(args)
+
+    lignes = []
+    for nom, cle in CONFIGURATIONS:
+        sortie = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_concurrence', *sys.argv[1:], '--configuration', cle],
+            env={**os.environ, 'BENCH_SQLITE': cle}, capture_output=True, text=True, check=True,
+        ).stdout
+        r = json.loads(sortie.strip().splitlines()[-1])
+        lignes.append((
+            nom, f"{r['lectures'] / args.duree:.0f}", f"{r['lecture_p50']:.1f}", f"{r['lecture_p99']:.1f}",
+            f"{r['ecritures'] / args.duree:.0f}", f"{r['ecriture_p50']:.1f}", f"{r['ecriture_p99']:.1f}",
+            r['verrou'], r['autre'],
+        ))
+    afficher(
+        f'{args.lecteurs} processus lecteurs (GET /api/emprunts/), {args.ecrivains} écrivains (checkout + return), {args.duree:.0f} s',
+        ['', 'lectures/s', 'p50 ms', 'p99 ms', 'écritures/s', 'p50 ms', 'p99 ms', '« database is locked »', 'autres erreurs'],
+        lignes,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Stress des actions checkout/return : N threads se disputent les exemplaires d'un même livre.
+
+Vérifie qu'aucun exemplaire n'est prêté deux fois en même temps et mesure le débit.
+
+    python -m benchmarks.bench_emprunts --threads 16 --exemplaires 4 --operations 200
+"""
+import argparse
+import threading
+import time
+from collections import Counter, defaultdict
+from benchmarks.utils import setup, afficher
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--exemplaires', type=int, default=4)
+    parser.add_argument('--operations', type=int, default=200, help='Emprunts tentés par thread')
+    args = parser.parse_args()
+
+    setup()
+    import datetime
+    from django.db import OperationalError, connection
+    from benchmarks.utils import peupler
+    from gestion import prets
+    from gestion.models import Emprunt, Exemplaire, Livre, UserAccount
+
+    peupler(livres=1, utilisateurs=args.threads)
+    livre = Livre.objects.get()
+    Exemplaire.objects.all().delete()
+    Exemplaire.objects.bulk_create([
+        Exemplaire(livre=livre, état='Bon', date_acquisition=datetime.date(2020, 1, 1), localisation='A1')
+        for _ in range(args.exemplaires)
+    ])
+    utilisateurs = list(UserAccount.objects.order_by('pk'))
+    resultats = Counter()
+    verrou = threading.Lock()
+    depart = threading.Barrier(args.threads)
+
+    def travailleur(utilisateur):
+        local = Counter()
+        depart.wait()
+        try:
+            for _ in range(args.operations):
+                try:
+                    emprunt = prets.emprunter(livre.pk, utilisateur)
+                except prets.PretImpossible:
+                    local['refusés'] += 1
+                    continue
+                except OperationalError:
+                    # SQLite : délai d'attente du verrou d'écriture dépassé (« database is locked »)
+                    local['verrou expiré'] += 1
+                    continue
+                local['prêtés'] += 1
+                while True:
+                    try:
+                        prets.rendre(emprunt.pk)
+                        break
+                    except OperationalError:
+                        local['verrou expiré'] += 1
+                local['rendus'] += 1
+        finally:
+            connection.close()
+        with verrou:
+            resultats.update(local)
+
+    threads = [threading.Thread(target=travailleur, args=(u,)) for u in utilisateurs[:args.threads]]
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duree = time.perf_counter() - debut
+
+    # Aucun chevauchement de deux emprunts sur un même exemplaire
+    periodes = defaultdict(list)
+    for exemplaire_id, debut_emprunt, fin in Emprunt.objects.values_list('exemplaire_id', 'date_emprunt', 'date_retour_effective'):
+        periodes[exemplaire_id].append((debut_emprunt, fin))
+    chevauchements = 0
+    for liste in periodes.values():
+        liste.sort()
+        chevauchements += sum(1 for (_, fin), (suivant, _) in zip(liste, liste[1:]) if fin is None or fin > suivant)
+    livre.refresh_from_db()
+    coherent = (
+        not Emprunt.objects.filter(date_retour_effective__isnull=True).exists()
+        and Exemplaire.objects.filter(livre=livre, disponibilité=False).count() == 0
+        and livre.exemplaires_disponibles == livre.nombre_exemplaires
+    )
+
+    afficher(
+        f'{args.threads} threads, {args.exemplaires} exemplaires, {args.operations} tentatives par thread',
+        ['prêtés', 'refusés', 'verrou expiré', 'chevauchements', 'état final cohérent', 'prêts+retours/s'],
+        [(resultats['prêtés'], resultats['refusés'], resultats['verrou expiré'], chevauchements, coherent,
+          f"{(resultats['prêtés'] + resultats['rendus']) / duree:.0f}")],
+    )
+    if chevauchements or not coherent:
+        raise SystemExit('Double prêt détecté')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Débit de import_catalogue sur un CSV synthétique.
+
+    python -m benchmarks.bench_import --rows 1000000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+from benchmarks.utils import setup, afficher
+
+COLONNES = ['titre', 'résumé', 'date_de_publication', 'isbn', 'nombre_de_pages', 'langue', 'format',
+            'categorie', 'editeur', 'auteurs', 'auteurs_naissance', 'exemplaires']
+
+
+def generer(chemin, lignes, auteurs=5000):
+    with open(chemin, 'w', encoding='utf-8', newline='') as fichier:
+        writer = csv.writer(fichier)
+        writer.writerow(COLONNES)
+        for i in range(lignes):
+            writer.writerow([
+                f'Livre {i}', 'Résumé ' * 10, f'{1800 + i % 220}-01-01', f'{i:013d}', 100 + i % 500,
+                ('fr', 'en', 'es')[i % 3], 'Broché', f'Catégorie {i % 50}', f'Éditeur {i % 200}',
+                f'Auteur {i % auteurs}|Auteur {(i + 1) % auteurs}', '1900-01-01|1900-01-01', 1 + i % 3,
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--index', action='store_true', help='Indexer aussi pour la recherche')
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+    from gestion.models import Livre, Exemplaire
+
+    chemin = os.path.join(tempfile.gettempdir(), 'catalogue_bench.csv')
+    generer(chemin, args.rows)
+
+    debut = time.perf_counter()
+    options = {'batch_size': args.batch_size, 'no_index': not args.index}
+    call_command('import_catalogue', chemin, **options)
+    duree = time.perf_counter() - debut
+    os.remove(chemin)
+
+    afficher(
+        f'import_catalogue, lots de {args.batch_size}',
+        ('lignes', 'livres', 'exemplaires', 'secondes', 'lignes/s'),
+        [(args.rows, Livre.objects.count(), Exemplaire.objects.count(), f'{duree:.1f}', f'{args.rows / duree:.0f}')],
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Rendu et lecture JSON de 1 000 livres : json de la bibliothèque standard contre orjson.
+
+    python -m benchmarks.bench_json --livres 1000
+"""
+import argparse
+from io import BytesIO
+from benchmarks.utils import setup, mesurer, afficher, peupler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--livres', type=int, default=1000)
+    parser.add_argument('--repetitions', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from gestion.models import Emprunt, Livre
+    from gestion.parsers import FastJSONParser
+    from gestion.renderers import FastJSONRenderer, orjson
+    from gestion.serializers import EmpruntSerializer, LivreSerializer
+
+    if orjson is None:
+        print('orjson absent : FastJSONRenderer retombe sur json, les deux colonnes mesurent la même chose')
+    peupler(livres=args.livres, emprunts=args.livres)
+    request = Request(APIRequestFactory().get('/api/livres/'))
+
+    jeux = []
+    for nom, queryset, serializer_class in (
+        ('livres', Livre.objects.prefetch_related('auteurs'), LivreSerializer),
+        ('emprunts', Emprunt.objects.all(), EmpruntSerializer),
+    ):
+        instances = list(queryset.order_by('pk')[:args.livres])
+        for mode, summary in (('complète', False), ('résumé', True)):
+            data = serializer_class(instances, many=True, context={'request': request, 'summary': summary}).data
+            jeux.append((f'{nom} ({mode})', data))
+
+    lignes = []
+    for nom, data in jeux:
+        standard, _ = mesurer(lambda: JSONRenderer().render(data), args.repetitions)
+        rapide, _ = mesurer(lambda: FastJSONRenderer().render(data), args.repetitions)
+        corps = JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data) == corps
+        lecture_standard, _ = mesurer(lambda: JSONParser().parse(BytesIO(corps)), args.repetitions)
+        lecture_rapide, _ = mesurer(lambda: FastJSONParser().parse(BytesIO(corps)), args.repetitions)
+        lignes.append((
+            nom, len(data), len(corps),
+            f'{standard:.2f}', f'{rapide:.2f}', f'x{standard / rapide:.1f}',
+            f'{lecture_standard:.2f}', f'{lecture_rapide:.2f}', f'x{lecture_standard / lecture_rapide:.1f}',
+        ))
+
+    afficher(
+        'Médianes en ms',
+        ['jeu', 'lignes', 'octets', 'rendu json', 'rendu orjson', 'gain', 'lecture json', 'lecture orjson', 'gain'],
+        lignes,
+    )
+
+
+if __name__ == '__main__':
+    main()
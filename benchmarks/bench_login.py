@@ -0,0 +1,52 @@
+"""Coût de chaque étape du login en deux temps (mot de passe puis OTP).
+
+    python -m benchmarks.bench_login --iterations 870000 100000
+"""
+import argparse
+from benchmarks.utils import setup, mesurer, afficher
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, nargs='+', default=[870000, 300000, 100000])
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    import jwt
+    import pyotp
+    from django.conf import settings
+    from django.contrib.auth.hashers import PBKDF2PasswordHasher
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from gestion import otp
+    from gestion.models import UserAccount
+    from gestion.roles import add_roles_claim
+    from gestion.serializers import generate_tmp_token
+
+    mot_de_passe = 'Un-Mot-De-Passe-Solide-42'
+    lignes = []
+    for iterations in args.iterations:
+        hasher = type('Hasher', (PBKDF2PasswordHasher,), {'iterations': iterations})()
+        encode = hasher.encode(mot_de_passe, hasher.salt())
+        lignes.append((f'check_password pbkdf2 {iterations}', *mesurer(lambda: hasher.verify(mot_de_passe, encode), args.repetitions)))
+
+    user = UserAccount.objects.create(username='bench-login', email='login@example.com', otp_secret=pyotp.random_base32())
+    tmp_token = generate_tmp_token(user)
+    lignes.append(('jeton temporaire : signature', *mesurer(lambda: generate_tmp_token(user), args.repetitions)))
+    lignes.append(('jeton temporaire : décodage', *mesurer(
+        lambda: jwt.decode(tmp_token, settings.SECRET_KEY, algorithms=['HS256']), args.repetitions)))
+    lignes.append(('lecture utilisateur (only)', *mesurer(
+        lambda: UserAccount.objects.only('id', 'otp_secret', 'password', 'is_active').get(id=user.pk), args.repetitions)))
+
+    code = pyotp.TOTP(user.otp_secret).now()
+    lignes.append(('TOTP sans cache', *mesurer(lambda: pyotp.TOTP(user.otp_secret).verify(code), args.repetitions)))
+    otp.get_totp(user)
+    lignes.append(('TOTP en cache', *mesurer(lambda: otp.get_totp(user).verify(code), args.repetitions)))
+    lignes.append(('émission access + refresh', *mesurer(
+        lambda: str(add_roles_claim(RefreshToken.for_user(user).access_token, user)), args.repetitions)))
+
+    afficher('Login', ['étape', 'médiane ms', 'p99 ms'], [(nom, f'{m:.3f}', f'{p:.3f}') for nom, m, p in lignes])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Latence d'une page d'emprunts selon sa profondeur : pagination keyset vs numéro de page.
+
+    python -m benchmarks.bench_pagination --rows 1000000
+"""
+import argparse
+from benchmarks.utils import setup, mesurer, afficher, peupler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.pagination import PageNumberPagination
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from django.contrib.auth.models import Group
+    from gestion.models import Emprunt, UserAccount
+    from gestion.pagination import KeysetPagination
+    from gestion.views import EmpruntViewSet
+
+    peupler(livres=1000, emprunts=args.rows)
+    lecteur = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+    lecteur.groups.add(Group.objects.create(name='lecteur'))
+
+    class OffsetPagination(PageNumberPagination):
+        page_size = args.page_size
+
+        def paginate_queryset(self, queryset, request, view=None):
+            return super().paginate_queryset(queryset.order_by('-date_emprunt', '-id'), request, view)
+
+    factory = APIRequestFactory()
+    keyset_view = EmpruntViewSet.as_view({'get': 'list'})
+    offset_view = EmpruntViewSet.as_view({'get': 'list'}, pagination_class=OffsetPagination)
+    ordered = Emprunt.objects.order_by('-date_emprunt', '-id')
+
+    def appeler(view, params):
+        request = factory.get('/api/emprunts/', params)
+        force_authenticate(request, lecteur)
+        response = view(request)
+        assert response.status_code == 200, response.status_code
+        response.render()
+
+    lignes = []
+    for profondeur in (0, 1000, 10000, 100000, args.rows // 2, args.rows - args.page_size):
+        if profondeur >= args.rows:
+            continue
+        page = profondeur // args.page_size + 1
+        params = {'page_size': args.page_size}
+        if profondeur:
+            precedent = ordered[profondeur - 1]
+            params['cursor'] = KeysetPagination.make_cursor([precedent.date_emprunt, precedent.pk], False)
+        k_med, k_p99 = mesurer(lambda: appeler(keyset_view, params), args.repetitions)
+        o_med, o_p99 = mesurer(lambda: appeler(offset_view, {'page': page}), args.repetitions)
+        lignes.append((profondeur, f'{k_med:.2f}', f'{k_p99:.2f}', f'{o_med:.2f}', f'{o_p99:.2f}'))
+
+    afficher(
+        f'/api/emprunts/ sur {args.rows} lignes, {args.page_size} par page (ms)',
+        ('profondeur', 'keyset med', 'keyset p99', 'offset med', 'offset p99'),
+        lignes,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Temps CPU du QR code d'inscription selon le mode de rendu.
+
+    python -m benchmarks.bench_qr --repetitions 50
+"""
+import argparse
+import time
+from benchmarks.utils import setup, afficher
+
+
+def cpu(fonction, repetitions):
+    """Temps CPU moyen (ms) du thread appelant : c'est ce qu'une inscription coûte au worker."""
+    debut = time.thread_time()
+    for _ in range(repetitions):
+        fonction()
+    return (time.thread_time() - debut) * 1000 / repetitions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repetitions', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    import pyotp
+    from gestion import qr
+
+    uri = pyotp.TOTP(pyotp.random_base32()).provisioning_uri('lecteur@example.com', issuer_name='YourAppName')
+    lignes = []
+    for format in qr.RENDERERS:
+        taille = len(qr.render(uri, format))
+        lignes.append((f'{format} en ligne', f'{cpu(lambda: qr.render(uri, format), args.repetitions):.2f}', taille))
+        cles = []
+        lignes.append((f'{format} différé', f'{cpu(lambda: cles.append(qr.planifier(uri, format)), args.repetitions):.2f}', taille))
+        for cle in cles:
+            qr.recuperer(cle)
+
+    afficher('QR code par inscription', ['mode', 'CPU requête ms', 'octets'], lignes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Plans d'exécution (EXPLAIN QUERY PLAN) des listes de l'API avant et après les index de 0005.
+
+    python -m benchmarks.bench_query_plans --rows 200000
+"""
+import argparse
+from benchmarks.utils import setup, mesurer, peupler
+
+ENDPOINTS = [
+    '/api/livres/?titre=Livre 4242',
+    '/api/livres/?langue=fr',
+    '/api/livres/?ordering=date_de_publication',
+    '/api/auteurs/?ordering=date_de_naissance',
+    '/api/auteurs/?nationalité=Anglaise',
+    '/api/emprunts/',
+    '/api/commentaires/',
+    '/api/evaluations/',
+]
+
+
+def requetes_orm():
+    from django.utils import timezone
+    from gestion.models import Commentaire, Emprunt, Livre, UserAccount
+    from gestion.retards import emprunts_a_marquer
+    utilisateur = UserAccount.objects.filter(username__startswith='bench-').order_by('pk').first()
+    livre = Livre.objects.order_by('pk').first()
+    return {
+        'emprunts en cours d\'un utilisateur': Emprunt.objects.filter(utilisateur=utilisateur, statut='En cours'),
+        'emprunts en retard': Emprunt.objects.filter(date_retour_prévue__lt=timezone.now(), date_retour_effective__isnull=True),
+        'emprunts à marquer en retard': emprunts_a_marquer(timezone.now()),
+        'emprunts actifs d\'un livre': Emprunt.objects.filter(exemplaire__livre=livre, date_retour_effective__isnull=True),
+        'commentaires visibles d\'un livre': Commentaire.objects.filter(livre=livre, visible=True).order_by('-date_publication'),
+    }
+
+
+def afficher_plan(sql, params):
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        for ligne in cursor.fetchall():
+            print(f'    {ligne[-1]}')
+
+
+def rapport(titre, client, repetitions):
+    from django.db import connection
+
+    print(f'\n===== {titre} =====')
+    for url in ENDPOINTS:
+        requetes = []
+
+        def capturer(execute, sql, params, many, context):
+            requetes.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capturer):
+            client.get(url)
+        mediane, _ = mesurer(lambda: client.get(url), repetitions)
+        print(f'\nGET {url}  ({mediane:.2f} ms)')
+        for sql, params in requetes:
+            if 'auth_group' not in sql:
+                afficher_plan(sql, params)
+
+    for nom, queryset in requetes_orm().items():
+        page = queryset[:100]
+        mediane, _ = mesurer(lambda: list(page.all()), repetitions)
+        print(f'\n{nom}  ({mediane:.2f} ms)')
+        afficher_plan(*page.query.sql_with_params())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repetitions', type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import Group
+    from django.core.management import call_command
+    from rest_framework.test import APIClient
+    from gestion.models import UserAccount
+
+    peupler(livres=args.rows // 10, auteurs=args.rows // 10, emprunts=args.rows, evaluations=args.rows, commentaires=args.rows)
+    lecteur = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+    lecteur.groups.add(Group.objects.create(name='lecteur'))
+    client = APIClient()
+    client.force_authenticate(lecteur)
+
+    call_command('migrate', 'gestion', '0004', verbosity=0)
+    rapport('Avant (0004)', client, args.repetitions)
+    call_command('migrate', 'gestion', '0005', verbosity=0)
+    rapport('Après (0005)', client, args.repetitions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Livres similaires : reconstruction complète de la table, lecture de /similaires/ contre le même
+calcul fait en direct par jointures Emprunt -> Exemplaire -> Livre, et coût d'un emprunt avec la
+mise à jour incrémentale.
+
+    python -m benchmarks.bench_recommandations --livres 5000 --utilisateurs 5000 --emprunts 200000
+"""
+import argparse
+import random
+import time
+from benchmarks.utils import setup, mesurer, afficher, peupler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--livres', type=int, default=5000)
+    parser.add_argument('--utilisateurs', type=int, default=5000)
+    parser.add_argument('--emprunts', type=int, default=200000)
+    parser.add_argument('--repetitions', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    from datetime import timedelta
+    from django.db import connection, transaction
+    from django.db.models import Count
+    from django.test import override_settings
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+    from gestion import recommandations
+    from gestion.models import Emprunt, Exemplaire, LivreSimilaire, UserAccount
+
+    peupler(livres=args.livres, utilisateurs=args.utilisateurs)
+    exemplaires = list(Exemplaire.objects.values_list('pk', 'livre_id'))
+    utilisateurs = list(UserAccount.objects.values_list('pk', flat=True))
+    aleatoire = random.Random(0)
+    # Popularité des livres en loi de puissance, comme dans un vrai catalogue
+    poids = [1 / (rang + 1) for rang in range(len(exemplaires))]
+    echeance = timezone.now() + timedelta(days=14)
+    Emprunt.objects.bulk_create(
+        (Emprunt(exemplaire_id=exemplaire, utilisateur_id=aleatoire.choice(utilisateurs),
+                 date_retour_prévue=echeance, date_retour_effective=echeance, statut='Terminé')
+         for exemplaire, _ in aleatoire.choices(exemplaires, poids, k=args.emprunts)),
+        batch_size=10000,
+    )
+
+    debut = time.perf_counter()
+    total = recommandations.construire()
+    duree = time.perf_counter() - debut
+    afficher(
+        f'Reconstruction ({args.emprunts} emprunts, {args.livres} livres, {args.utilisateurs} lecteurs)',
+        ['voisins', 'durée s'], [(total, f'{duree:.2f}')],
+    )
+
+    livres = [livre for _, livre in exemplaires[:200]]
+
+    def en_direct():
+        livre = aleatoire.choice(livres)
+        lecteurs = Emprunt.objects.filter(exemplaire__livre_id=livre).values('utilisateur_id')
+        list(
+            Emprunt.objects.filter(utilisateur_id__in=lecteurs).exclude(exemplaire__livre_id=livre)
+            .values('exemplaire__livre_id').annotate(n=Count('utilisateur_id', distinct=True)).order_by('-n')[:10]
+        )
+
+    def table():
+        recommandations.similaires(aleatoire.choice(livres), 10)
+
+    lignes = [
+        (nom, *(f'{x:.2f}' for x in mesurer(fonction, args.repetitions)))
+        for nom, fonction in (('jointures en direct', en_direct), ('table LivreSimilaire', table))
+    ]
+    afficher('Voisins d\'un livre populaire (10 premiers)', ['', 'médiane ms', 'p99 ms'], lignes)
+
+    def emprunter():
+        exemplaire, _ = aleatoire.choice(exemplaires)
+        with transaction.atomic():
+            Emprunt.objects.create(exemplaire_id=exemplaire, utilisateur_id=aleatoire.choice(utilisateurs),
+                                   date_retour_prévue=echeance, statut='En cours')
+
+    lignes = []
+    for nom, reglages in (
+        ('sans mise à jour', {'INCREMENTAL': False}),
+        ('mise à jour dans la requête', {'WORKERS': 0}),
+        ('mise à jour en arrière-plan', {'WORKERS': 1}),
+    ):
+        with override_settings(GESTION_RECOMMANDATIONS=reglages):
+            with CaptureQueriesContext(connection) as ctx:
+                emprunter()
+            lignes.append((nom, len(ctx.captured_queries), *(f'{x:.2f}' for x in mesurer(emprunter, args.repetitions))))
+    recommandations.get_executor().shutdown()
+    afficher('Création d\'un emprunt', ['', 'requêtes', 'médiane ms', 'p99 ms'], lignes)
+    print(f'\n{LivreSimilaire.objects.count()} voisins en table après les emprunts')
+
+
+if __name__ == '__main__':
+    main()
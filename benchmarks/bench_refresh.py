@@ -0,0 +1,79 @@
+"""Vérification de liste noire et débit de /auth/token/refresh/ : requêtes SQL de simplejwt
+contre le filtre de Bloom de gestion.liste_noire, avec une table de jetons révoqués déjà remplie.
+
+    python -m benchmarks.bench_refresh --revoques 100000 --rafraichissements 500
+"""
+import argparse
+import time
+import uuid
+from datetime import timedelta
+from benchmarks.utils import setup, mesurer, afficher
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--revoques', type=int, default=100000)
+    parser.add_argument('--rafraichissements', type=int, default=500)
+    parser.add_argument('--repetitions', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+    from rest_framework_simplejwt.tokens import RefreshToken as RefreshTokenSimplejwt
+    from rest_framework_simplejwt.views import TokenRefreshView
+    from gestion.liste_noire import RefreshToken, liste_noire
+    from gestion.models import UserAccount
+    from gestion.views import RefreshView
+
+    expiration = timezone.now() + timedelta(days=1)
+    OutstandingToken.objects.bulk_create(
+        (OutstandingToken(jti=uuid.uuid4().hex, token='', expires_at=expiration) for _ in range(args.revoques)),
+        batch_size=10000,
+    )
+    BlacklistedToken.objects.bulk_create(
+        (BlacklistedToken(token_id=pk) for pk in OutstandingToken.objects.values_list('pk', flat=True).iterator()),
+        batch_size=10000,
+    )
+    user = UserAccount.objects.create(username='bench-refresh', email='refresh@example.com')
+    brut = str(RefreshToken.for_user(user))
+
+    debut = time.perf_counter()
+    liste_noire.reconstruire()
+    reconstruction = (time.perf_counter() - debut) * 1000
+
+    lignes = []
+    for nom, classe in (('simplejwt (SQL)', RefreshTokenSimplejwt), ('gestion.liste_noire', RefreshToken)):
+        with CaptureQueriesContext(connection) as ctx:
+            classe(brut)
+        lignes.append((f'vérification {nom}', len(ctx.captured_queries), *(f'{x * 1000:.1f}' for x in mesurer(lambda: classe(brut), args.repetitions))))
+    afficher(
+        f'Jeton valide, {args.revoques} jetons révoqués (reconstruction du filtre : {reconstruction:.0f} ms)',
+        ['', 'requêtes', 'médiane µs', 'p99 µs'], lignes,
+    )
+
+    factory = APIRequestFactory()
+    lignes = []
+    for nom, vue in (
+        ('simplejwt', TokenRefreshView.as_view()),
+        ('gestion', RefreshView.as_view(throttle_classes=[])),
+    ):
+        refresh = str(RefreshToken.for_user(user))
+        requetes = 0
+        debut = time.perf_counter()
+        for _ in range(args.rafraichissements):
+            with CaptureQueriesContext(connection) as ctx:
+                response = vue(factory.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json'))
+            assert response.status_code == 200, response.data
+            refresh = response.data['refresh']
+            requetes += len(ctx.captured_queries)
+        duree = time.perf_counter() - debut
+        lignes.append((nom, f'{args.rafraichissements / duree:.0f}', f'{requetes / args.rafraichissements:.1f}'))
+    afficher('Rotation des jetons (séquentielle)', ['vue', 'rafraîchissements/s', 'requêtes/rafraîchissement'], lignes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Statistiques d'emprunts : agrégation initiale et incrémentale (gestion.statistiques), puis
+requêtes de /api/stats/ servies par les agrégats contre le même GROUP BY fait sur Emprunt.
+
+    python -m benchmarks.bench_statistiques --emprunts 1000000 --nouveaux 1000
+"""
+import argparse
+import time
+from benchmarks.utils import setup, mesurer, afficher, peupler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--livres', type=int, default=10000)
+    parser.add_argument('--emprunts', type=int, default=1000000)
+    parser.add_argument('--nouveaux', type=int, default=1000)
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from datetime import timedelta
+    from django.db.models import Count, F
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+    from gestion import statistiques
+    from gestion.models import Emprunt, Exemplaire, StatistiqueJour, StatistiqueLivreJour, UserAccount
+
+    peupler(livres=args.livres, emprunts=args.emprunts, utilisateurs=1000)
+    # Un emprunt par minute depuis 2015 (voir peupler), sorti 14 jours avant l'échéance
+    Emprunt.objects.update(date_emprunt=F('date_retour_prévue') - timedelta(days=14))
+    dernier = Emprunt.objects.order_by('-date_emprunt').values_list('date_emprunt', flat=True).first()
+
+    debut = time.perf_counter()
+    statistiques.agreger()
+    initiale = time.perf_counter() - debut
+
+    # Nouveaux emprunts datés du jour, puis passage incrémental (comme une exécution planifiée)
+    exemplaires = list(Exemplaire.objects.values_list('pk', flat=True)[:args.nouveaux])
+    utilisateur = UserAccount.objects.values_list('pk', flat=True).first()
+    Emprunt.objects.bulk_create(
+        Emprunt(exemplaire_id=pk, utilisateur_id=utilisateur, date_retour_prévue=timezone.now() + timedelta(days=14),
+                statut='En cours') for pk in exemplaires
+    )
+    debut = time.perf_counter()
+    statistiques.agreger()
+    incrementale = time.perf_counter() - debut
+    afficher(
+        f'Agrégation ({args.emprunts} emprunts, {args.livres} livres)',
+        ['', 'durée s', 'lignes jour', 'lignes livre/jour'],
+        [('initiale', f'{initiale:.2f}', StatistiqueJour.objects.count(), StatistiqueLivreJour.objects.count()),
+         (f'incrémentale ({args.nouveaux} nouveaux)', f'{incrementale:.3f}', '', '')],
+    )
+
+    fin = dernier.date()
+    periode = (fin - timedelta(days=364), fin)
+    bornes = {'date_emprunt__date__range': periode}
+    requetes = (
+        ('par jour', lambda: list(Emprunt.objects.filter(**bornes).annotate(jour=TruncDate('date_emprunt'))
+                                  .values('jour').annotate(n=Count('pk')).order_by('jour')),
+         lambda: statistiques.par_jour(*periode)),
+        ('par langue', lambda: list(Emprunt.objects.filter(**bornes).values('exemplaire__livre__langue')
+                                    .annotate(n=Count('pk')).order_by('-n')),
+         lambda: statistiques.par_langue(*periode)),
+        ('par catégorie', lambda: list(Emprunt.objects.filter(**bornes).values('exemplaire__livre__categorie_id')
+                                       .annotate(n=Count('pk')).order_by('-n')),
+         lambda: statistiques.par_categorie(*periode)),
+        ('10 livres les plus empruntés', lambda: list(Emprunt.objects.filter(**bornes).values('exemplaire__livre_id')
+                                                      .annotate(n=Count('pk')).order_by('-n')[:10]),
+         lambda: statistiques.par_livre(*periode)),
+    )
+    lignes = []
+    for nom, direct, agregats in requetes:
+        lignes.append((
+            nom, *(f'{x:.2f}' for x in mesurer(direct, args.repetitions)),
+            *(f'{x:.2f}' for x in mesurer(agregats, args.repetitions)),
+        ))
+    afficher(
+        'Une année d\'emprunts',
+        ['', 'GROUP BY Emprunt médiane ms', 'p99 ms', 'agrégats médiane ms', 'p99 ms'], lignes,
+    )
+
+
+if __name__ == '__main__':
+    main()
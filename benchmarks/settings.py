@@ -0,0 +1,33 @@
+"""Réglages des benchmarks : base SQLite jetable, sans limitation de débit."""
+import os
+import tempfile
+from bibliotheque.settings import *  # noqa: F401,F403
+from bibliotheque.settings import DATABASES, REST_FRAMEWORK
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.environ.get('BENCH_DB', os.path.join(tempfile.gettempdir(), 'bibliotheque_bench.sqlite3')),
+    }
+}
+
+# BENCH_SQLITE=defaut : SQLite sans PRAGMA, connexion rouverte à chaque requête et transactions
+# DEFERRED, comme avant gestion.sqlite (comparaison de bench_concurrence)
+if os.environ.get('BENCH_SQLITE') == 'defaut':
+    DATABASES['default'].update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False, OPTIONS={})
+    GESTION_SQLITE = {'PROFIL': 'defaut'}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_CLASSES': [],
+}
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    # Pour mesurer les vues sans le cache de pages (GESTION_HTTP_CACHE)
+    'aucun': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
@@ -0,0 +1,107 @@
+import datetime
+import os
+import statistics
+import time
+
+
+def setup(fresh=True):
+    """Configure Django sur la base de benchmark et applique les migrations.
+
+    Avec `fresh`, la base de benchmark est supprimée puis recréée.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    from django.conf import settings
+    if fresh:
+        nom = settings.DATABASES['default']['NAME']
+        for suffixe in ('', '-wal', '-shm'):
+            if os.path.exists(f'{nom}{suffixe}'):
+                os.remove(f'{nom}{suffixe}')
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def mesurer(fonction, repetitions=20):
+    """Exécute `fonction` plusieurs fois et renvoie (médiane, p99) en millisecondes."""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+    return statistics.median(durees), durees[min(len(durees) - 1, int(len(durees) * 0.99))]
+
+
+def afficher(titre, entetes, lignes):
+    print(f'\n{titre}')
+    largeurs = [max(len(str(x)) for x in colonne) for colonne in zip(entetes, *lignes)]
+    for ligne in [entetes, *lignes]:
+        print('  '.join(str(x).rjust(largeur) for x, largeur in zip(ligne, largeurs)))
+
+
+def peupler(livres=1000, emprunts=0, evaluations=0, commentaires=0, auteurs=0, utilisateurs=100, batch_size=10000):
+    """Insère un catalogue synthétique avec bulk_create (sans signaux)."""
+    from gestion.models import Auteur, Categorie, Editeur, Livre, Exemplaire, Emprunt, Evaluation, Commentaire, UserAccount
+
+    categorie = Categorie.objects.create(nom='Roman', description='', slug='roman-bench')
+    editeur = Editeur.objects.create(nom='Hetzel', adresse='', site_web='https://hetzel.fr', email_contact='a@b.fr', description='')
+    UserAccount.objects.bulk_create(
+        [UserAccount(username=f'bench-{i}', email=f'bench{i}@example.com') for i in range(utilisateurs)],
+        batch_size=batch_size,
+    )
+    user_ids = list(UserAccount.objects.filter(username__startswith='bench-').values_list('pk', flat=True))
+
+    Livre.objects.bulk_create(
+        (Livre(
+            titre=f'Livre {i}', résumé='Résumé ' * 20, date_de_publication=datetime.date(1800, 1, 1) + datetime.timedelta(days=i % 70000),
+            isbn=f'{i:013d}', nombre_de_pages=100 + i % 500, langue=('fr', 'en', 'es')[i % 3], format='Broché',
+            categorie=categorie, editeur=editeur,
+        ) for i in range(livres)),
+        batch_size=batch_size,
+    )
+    livre_ids = list(Livre.objects.values_list('pk', flat=True))
+    Exemplaire.objects.bulk_create(
+        (Exemplaire(livre_id=pk, état='Bon', date_acquisition=datetime.date(2020, 1, 1), localisation='A1') for pk in livre_ids),
+        batch_size=batch_size,
+    )
+    exemplaire_ids = list(Exemplaire.objects.values_list('pk', flat=True))
+
+    debut = datetime.datetime(2015, 1, 1, tzinfo=datetime.timezone.utc)
+    Emprunt.objects.bulk_create(
+        (Emprunt(
+            exemplaire_id=exemplaire_ids[i % len(exemplaire_ids)], utilisateur_id=user_ids[i % len(user_ids)],
+            date_retour_prévue=debut + datetime.timedelta(minutes=i, days=14),
+            # Un emprunt sur 20 n'est pas encore rendu
+            statut='En cours' if i % 20 == 0 else 'Terminé',
+            date_retour_effective=None if i % 20 == 0 else debut + datetime.timedelta(minutes=i, days=10),
+        ) for i in range(emprunts)),
+        batch_size=batch_size,
+    )
+    Evaluation.objects.bulk_create(
+        (Evaluation(
+            livre_id=livre_ids[i % len(livre_ids)], utilisateur_id=user_ids[i % len(user_ids)], note=1 + i % 5,
+        ) for i in range(evaluations)),
+        batch_size=batch_size,
+    )
+    Commentaire.objects.bulk_create(
+        (Commentaire(
+            livre_id=livre_ids[i % len(livre_ids)], utilisateur_id=user_ids[i % len(user_ids)], contenu='Commentaire',
+            visible=i % 10 != 0,
+        ) for i in range(commentaires)),
+        batch_size=batch_size,
+    )
+    Auteur.objects.bulk_create(
+        (Auteur(
+            nom=f'Auteur {i}', biographie='Biographie ' * 20, date_de_naissance=datetime.date(1700, 1, 1) + datetime.timedelta(days=i % 100000),
+            nationalité=('Française', 'Anglaise', 'Espagnole')[i % 3],
+        ) for i in range(auteurs)),
+        batch_size=batch_size,
+    )
+    # auto_now_add impose "maintenant" : on étale les dates d'emprunt pour un ordre réaliste
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE gestion_emprunt SET date_emprunt = datetime('2015-01-01', '+' || id || ' minutes')"
+        )
+    return livre_ids, user_ids
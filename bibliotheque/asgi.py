@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bibliotheque.settings')
 
 application = get_asgi_application()
+
+# Balayage périodique des emprunts en retard, si GESTION_RETARDS['INTERVAL'] est défini
+from gestion import retards  # noqa: E402
+retards.demarrer()
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En tête : mesure aussi le temps des autres middlewares
+    'gestion.profilage.ProfilageMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,12 +55,25 @@ REST_FRAMEWORK = {
         'anon': '5/minute',
         'user': '10/second',
     },
+    # Jetons d'accès SimpleJWT émis par OTPVerificationView, sans lecture de UserAccount par requête
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'gestion.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    # orjson si installé, sinon json de la bibliothèque standard
+    'DEFAULT_RENDERER_CLASSES': (
+        'gestion.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'gestion.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'gestion.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -74,6 +89,14 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+GESTION_ROLES = {
+    'LOCAL_CACHE_SIZE': 1024,
+    'LOCAL_CACHE_TTL': 60,
+    'SHARED_CACHE': None,
+    'SHARED_CACHE_TTL': 300,
+    'TOKEN_CLAIM': True,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -95,6 +118,91 @@ AUTH_PASSWORD_VALIDATORS = [
     }
 ]
 
+# Le premier hasher sert aux nouveaux mots de passe. Le coût de PBKDF2 domine le temps de login :
+# baisser PBKDF2_ITERATIONS augmente le débit de login au prix de la résistance au brute-force.
+PASSWORD_HASHERS = [
+    'gestion.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PBKDF2_ITERATIONS = 870000
+
+GESTION_OTP = {
+    'TOTP_CACHE_SIZE': 4096,
+    'TOTP_CACHE_TTL': 300,
+}
+
+# Pages de liste sérialisées des ressources du catalogue, indexées par version (alias de CACHES)
+GESTION_HTTP_CACHE = {
+    'CACHE': 'default',
+    'TTL': 300,
+}
+
+# Emprunts en retard : `manage.py sweep_overdue`, ou balayage dans le processus web toutes les INTERVAL secondes
+GESTION_RETARDS = {
+    'INTERVAL': None,
+    'BATCH_SIZE': 1000,
+    'PAUSE': 0,
+}
+
+# QR codes d'inscription : rendus en arrière-plan, récupérés via /api/auth/signup/qr/<clé>/
+GESTION_QR = {
+    'FORMAT': 'png',
+    'EXECUTOR': 'thread',
+    'WORKERS': 2,
+    'MAX_PENDING': 64,
+    'TTL': 300,
+}
+
+# Vignettes WebP/JPEG des photos, logos et couvertures, générées après l'envoi ; `manage.py deriver_images` pour l'existant
+GESTION_IMAGES = {
+    'LARGEURS': (160, 320, 640),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITE': 80,
+    'DOSSIER': 'derives',
+    'WORKERS': 2,
+}
+
+# Métriques par vue exposées à /api/metrics/ ; une fraction ECHANTILLON des requêtes est profilée
+# (cProfile) et gardée si elle dépasse SEUIL_LENT secondes, consultable à /api/metrics/profils/
+GESTION_PROFILAGE = {
+    'ACTIF': True,
+    'ECHANTILLON': 0.01,
+    'SEUIL_LENT': 0.5,
+    'PROFILS': 20,
+    'DOSSIER': None,
+}
+
+# Liste noire des jetons de rafraîchissement : filtre de Bloom local, révocations propagées par ce
+# cache (à partager entre workers) ; `manage.py flush_expired_tokens` purge les jetons expirés
+GESTION_LISTE_NOIRE = {
+    'CACHE': 'default',
+    'CAPACITE': 100_000,
+    'TAUX_FAUX_POSITIFS': 0.001,
+    'RECONSTRUCTION': 3600,
+}
+
+# Livres similaires (co-occurrence des emprunts et évaluations) : table reconstruite par
+# `manage.py construire_recommandations`, complétée en arrière-plan à chaque nouvel emprunt
+GESTION_RECOMMANDATIONS = {
+    'K': 20,
+    'NOTE_MIN': 3,
+    'COMMUNS_MIN': 2,
+    'MAX_HISTORIQUE': 200,
+    'INCREMENTAL': True,
+    'WORKERS': 1,
+}
+
+# Agrégats quotidiens servis par /api/stats/, complétés par `manage.py agreger_statistiques`
+# (à planifier, par exemple toutes les heures) depuis son dernier passage
+GESTION_STATISTIQUES = {
+    'MARGE': timedelta(hours=1),
+    'PERIODE': 30,
+}
+
 
 ROOT_URLCONF = 'bibliotheque.urls'
 
@@ -124,9 +232,25 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connexion gardée d'une requête à l'autre (et ses PRAGMA, voir GESTION_SQLITE), vérifiée
+        # avant réutilisation
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Verrou d'écriture pris dès BEGIN : une transaction qui lit puis écrit attend son tour
+            # (busy_timeout) au lieu d'échouer avec « database is locked » au moment d'écrire
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# PRAGMA appliqués à chaque connexion SQLite ouverte (gestion.sqlite.PROFILS) : WAL,
+# synchronous=NORMAL, mmap, cache et busy_timeout ; 'defaut' pour les réglages de SQLite
+GESTION_SQLITE = {
+    'PROFIL': 'production',
+    'PRAGMAS': {},
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
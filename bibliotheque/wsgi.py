@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bibliotheque.settings')
 
 application = get_wsgi_application()
+
+# Balayage périodique des emprunts en retard, si GESTION_RETARDS['INTERVAL'] est défini
+from gestion import retards  # noqa: E402
+retards.demarrer()
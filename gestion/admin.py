@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import search
 from .models import Auteur, Livre, Categorie, Exemplaire, Emprunt, Commentaire, Evaluation, Editeur, UserAccount
 
 @admin.register(UserAccount)
@@ -15,10 +16,17 @@ class AuteurAdmin(admin.ModelAdmin):
 
 @admin.register(Livre)
 class LivreAdmin(admin.ModelAdmin):
-    search_fields = ['titre', 'auteurs']
+    search_fields = ['titre']
     list_display = ('titre', 'editeur', 'date_de_publication')
+    list_select_related = ('editeur',)
     list_filter = ('categorie', 'editeur')
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        ids = [pk for pk, _ in search.rechercher(search_term, limite=1000)]
+        return queryset.filter(pk__in=ids), False
+
 @admin.register(Categorie)
 class CategorieAdmin(admin.ModelAdmin):
     search_fields = ['nom']
@@ -27,23 +35,27 @@ class CategorieAdmin(admin.ModelAdmin):
 @admin.register(Exemplaire)
 class ExemplaireAdmin(admin.ModelAdmin):
     list_display = ('livre', 'état')
+    list_select_related = ('livre',)
     list_filter = ('état',)
 
 @admin.register(Emprunt)
 class EmpruntAdmin(admin.ModelAdmin):
     search_fields = ['exemplaire__livre__titre', 'utilisateur']
     list_display = ('exemplaire', 'utilisateur', 'date_emprunt', 'date_retour_effective')
+    list_select_related = ('exemplaire__livre', 'utilisateur')
     list_filter = ('date_retour_effective',)
 
 @admin.register(Commentaire)
 class CommentaireAdmin(admin.ModelAdmin):
     list_display = ('livre', 'utilisateur', 'date_publication', 'contenu')
+    list_select_related = ('livre', 'utilisateur')
     search_fields = ['livre__titre', 'utilisateur']
     list_filter = ('date_publication',)
 
 @admin.register(Evaluation)
 class EvaluationAdmin(admin.ModelAdmin):
     list_display = ('livre', 'utilisateur', 'note', 'date_évaluation')
+    list_select_related = ('livre', 'utilisateur')
     search_fields = ['livre__titre', 'utilisateur']
     list_filter = ('note',)
 
@@ -0,0 +1,106 @@
+from django.http import HttpResponse
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import exceptions, status
+from rest_framework.filters import OrderingFilter
+from rest_framework.request import Request
+from .authentication import StatelessJWTAuthentication
+from .filters import LivreFilter
+from .models import Auteur, Exemplaire, Livre
+from .pagination import KeysetPagination
+from .permissions import IsLecteur
+from .renderers import FastJSONRenderer
+from .serializers import AuteurSerializer, ExemplaireSerializer, LivreSerializer, restreindre_queryset
+
+
+class AsyncCatalogueView(View):
+    """Liste et détail en lecture seule, servis nativement sous ASGI.
+
+    Même représentation, filtres, tri et pagination que le viewset correspondant. Seuls les
+    accès à la base (`aget`, `acount`, `aiterator`) passent par le thread de l'ORM ;
+    authentification JWT (sans lecture de l'utilisateur), permissions et sérialisation restent
+    sur la boucle d'événements.
+    Sous WSGI, Django exécute ces vues via `async_to_sync`.
+    """
+    http_method_names = ['get', 'head', 'options']
+    queryset = None
+    serializer_class = None
+    ordering = ('id',)
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = None
+    filterset_fields = ()
+    ordering_fields = ()
+    authentication = StatelessJWTAuthentication()
+    permission_classes = [IsLecteur]
+
+    async def get(self, request, pk=None):
+        try:
+            await self.authentifier(request)
+            if pk is None:
+                data = await self.lister(Request(request))
+            else:
+                data = await self.detail(Request(request), pk)
+        except exceptions.APIException as exc:
+            return self.erreur(request, exc)
+        return HttpResponse(FastJSONRenderer().render(data), content_type='application/json')
+
+    async def authentifier(self, request):
+        resultat = await self.authentication.aauthenticate(request)
+        if resultat is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = resultat
+        for permission in self.permission_classes:
+            if not await permission().ahas_permission(request, self):
+                raise exceptions.PermissionDenied()
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    async def lister(self, request):
+        queryset = self.get_queryset()
+        for backend in self.filter_backends:
+            # Construire le filtre ne fait aucune requête : seuls les paquets de résultats en font
+            queryset = backend().filter_queryset(request, queryset, self)
+        pagination = KeysetPagination()
+        context = {'request': request, 'summary': True}
+        ordering = [champ.lstrip('-') for champ in pagination.get_ordering(request, queryset, self)]
+        queryset = restreindre_queryset(queryset, self.serializer_class(context=context), ordering)
+        page = await pagination.apaginate_queryset(queryset, request, self)
+        return pagination.get_paginated_data(self.serializer_class(page, many=True, context=context).data)
+
+    async def detail(self, request, pk):
+        context = {'request': request}
+        queryset = restreindre_queryset(self.get_queryset(), self.serializer_class(context=context))
+        try:
+            instance = await queryset.aget(pk=pk)
+        except self.queryset.model.DoesNotExist:
+            raise exceptions.NotFound()
+        return self.serializer_class(instance, context=context).data
+
+    def erreur(self, request, exc):
+        detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = HttpResponse(FastJSONRenderer().render(detail), content_type='application/json', status=exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+        return response
+
+
+class AsyncLivreView(AsyncCatalogueView):
+    queryset = Livre.objects.prefetch_related('auteurs')
+    serializer_class = LivreSerializer
+    ordering = ('-date_de_publication', '-id')
+    filterset_class = LivreFilter
+    ordering_fields = ['date_de_publication', 'exemplaires_disponibles', 'note_moyenne']
+
+
+class AsyncAuteurView(AsyncCatalogueView):
+    queryset = Auteur.objects.all()
+    serializer_class = AuteurSerializer
+    ordering = ('nom', 'id')
+    filterset_fields = ['nom', 'nationalité']
+    ordering_fields = ['date_de_naissance', 'nom']
+
+
+class AsyncExemplaireView(AsyncCatalogueView):
+    queryset = Exemplaire.objects.all()
+    serializer_class = ExemplaireSerializer
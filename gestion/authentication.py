@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .roles import add_roles_claim
+
+USERNAME_CLAIM = 'username'
+
+
+def ajouter_revendications(token, user):
+    """Revendications d'un jeton d'accès lues par StatelessJWTAuthentication : nom d'utilisateur et rôles."""
+    token[USERNAME_CLAIM] = user.get_username()
+    return add_roles_claim(token, user)
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication utilisable depuis une vue async : seule la lecture de l'utilisateur touche la base.
+
+    La lecture et la validation du jeton sont du calcul pur, reprises telles quelles de SimpleJWT.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = await get_user_model().objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except get_user_model().DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class UtilisateurJeton:
+    """Utilisateur construit à partir du jeton d'accès, sans requête : `id`, `pk`, `username`.
+
+    Les rôles sont lus dans la revendication `roles` (voir roles.get_roles). Tout autre attribut
+    (email, groups, is_staff, ...) charge le UserAccount, une seule fois par requête.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        self.token = token
+        self.id = self.pk = token[api_settings.USER_ID_CLAIM]
+        if USERNAME_CLAIM in token:
+            self.username = token[USERNAME_CLAIM]
+
+    @cached_property
+    def utilisateur(self):
+        try:
+            return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+        except get_user_model().DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+    def __getattr__(self, nom):
+        # Appelé uniquement pour les attributs absents de l'objet
+        if nom.startswith('__'):
+            raise AttributeError(nom)
+        return getattr(self.utilisateur, nom)
+
+    def get_username(self):
+        return self.username
+
+    def __str__(self):
+        return str(self.username)
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk and getattr(other, 'is_authenticated', False)
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+def utilisateur_reel(user):
+    """Le UserAccount derrière `request.user`, à passer aux clés étrangères et aux opérations sensibles."""
+    return user.utilisateur if isinstance(user, UtilisateurJeton) else user
+
+
+class StatelessJWTAuthentication(AsyncJWTAuthentication):
+    """Authentification JWT sans lecture de UserAccount : `request.user` est un UtilisateurJeton.
+
+    Un compte désactivé garde l'accès aux lectures jusqu'à l'expiration de son jeton d'accès ;
+    les permissions d'administration (IsAdmin) revérifient le compte et son rôle en base.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        return UtilisateurJeton(validated_token)
+
+    async def aget_user(self, validated_token):
+        return self.get_user(validated_token)
@@ -0,0 +1,14 @@
+from django_filters import rest_framework as filters
+from .models import Livre
+
+class LivreFilter(filters.FilterSet):
+    available = filters.BooleanFilter(method='filter_available')
+
+    class Meta:
+        model = Livre
+        fields = ['titre', 'langue', 'available']
+
+    def filter_available(self, queryset, name, value):
+        if value:
+            return queryset.filter(exemplaires_disponibles__gt=0)
+        return queryset.filter(exemplaires_disponibles=0)
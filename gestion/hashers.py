@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 dont le nombre d'itérations se règle par `PBKDF2_ITERATIONS`.
+
+    Même identifiant d'algorithme que le hasher de Django : les mots de passe existants restent
+    valides et sont ré-hachés au prochain login si le nombre d'itérations change.
+    """
+    iterations = getattr(settings, 'PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,89 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from . import versions
+from .roles import get_roles
+
+DEFAULTS = {
+    # Alias du cache Django qui stocke les pages de liste sérialisées (mémoire locale par défaut)
+    'CACHE': 'default',
+    'TTL': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_HTTP_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class CacheMixin:
+    """ETag / Last-Modified sur `list` et `retrieve`, et cache des pages de liste sérialisées.
+
+    La version vient du compteur `VersionRessource` de `cache_resource`, incrémenté par les
+    signaux à chaque écriture : une seule requête par clé primaire suffit pour répondre 304
+    (sans queryset ni serializer) ou pour servir une page déjà sérialisée. Les entrées ne sont
+    jamais invalidées : une nouvelle version change les clés.
+    """
+    cache_resource = None
+
+    def get_version(self):
+        if not hasattr(self, '_version'):
+            self._version = versions.lire(self.cache_resource) if self.cache_resource else None
+        return self._version
+
+    def get_etag(self):
+        version, modifie = self.get_version()
+        # La date départage deux états de même numéro (compteur recréé après un flush)
+        return f'W/"{self.cache_resource}-{version}-{modifie.timestamp():.6f}"'
+
+    def not_modified(self, request):
+        etags = request.headers.get('If-None-Match')
+        if etags:
+            return self.get_etag() in parse_etags(etags) or etags.strip() == '*'
+        depuis = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        return depuis is not None and int(self.get_version()[1].timestamp()) <= depuis
+
+    def page_cache_key(self, request):
+        # Les rôles font partie de la clé : une page n'est jamais servie à un rôle qui ne l'a pas calculée
+        contenu = '|'.join([
+            self.get_etag(), request.build_absolute_uri(), ','.join(sorted(get_roles(request))),
+            request.accepted_renderer.format or '',
+        ])
+        return f'gestion:page:{self.cache_resource}:{hashlib.sha256(contenu.encode()).hexdigest()}'
+
+    def conditional(self, request, calculer, cache_key=None):
+        if self.get_version() is None:
+            return calculer()
+        if self.not_modified(request):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif cache_key is not None:
+            backend = caches[get_setting('CACHE')]
+            data = backend.get(cache_key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = calculer()
+                if response.status_code == status.HTTP_200_OK:
+                    backend.set(cache_key, response.data, get_setting('TTL'))
+        else:
+            response = calculer()
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.get_etag()
+            response['Last-Modified'] = http_date(self.get_version()[1].timestamp())
+            # Revalidation systématique : le client garde la page mais redemande avec If-None-Match
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            request, lambda: super(CacheMixin, self).list(request, *args, **kwargs),
+            self.page_cache_key(request) if self.get_version() is not None else None,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, lambda: super(CacheMixin, self).retrieve(request, *args, **kwargs))
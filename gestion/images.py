@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from .models import Auteur, Editeur, Livre
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Largeurs maximales des vignettes, en pixels ; une image plus petite n'est pas agrandie
+    'LARGEURS': (160, 320, 640),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITE': 80,
+    'DOSSIER': 'derives',
+    # Threads générant les vignettes après un envoi ; 0 pour les générer dans la requête
+    'WORKERS': 2,
+}
+
+# Champ image -> champ mémorisant l'empreinte des vignettes générées
+IMAGES = {
+    Auteur: ('photo', 'photo_empreinte'),
+    Editeur: ('logo', 'logo_empreinte'),
+    Livre: ('image_de_couverture', 'couverture_empreinte'),
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+OPTIONS = {'webp': {'method': 4}, 'jpeg': {'optimize': True, 'progressive': True}}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_IMAGES', {}).get(name, DEFAULTS[name])
+
+
+def parametres():
+    return tuple(get_setting('LARGEURS')), tuple(get_setting('FORMATS')), get_setting('QUALITE')
+
+
+def empreinte(contenu, params=None):
+    """Empreinte du fichier source et des paramètres de génération : elle change avec l'un ou l'autre."""
+    return hashlib.sha256(contenu + repr(params or parametres()).encode()).hexdigest()[:32]
+
+
+def chemin(valeur, largeur, format):
+    return f"{get_setting('DOSSIER')}/{valeur[:2]}/{valeur}-{largeur}.{EXTENSIONS[format]}"
+
+
+def chemins(valeur):
+    """{format: {largeur: chemin}} des vignettes d'une empreinte, sans accès au stockage."""
+    largeurs, formats, _ = parametres()
+    return {format: {largeur: chemin(valeur, largeur, format) for largeur in largeurs} for format in formats}
+
+
+def generer(contenu, largeurs, formats, qualite):
+    """{(largeur, format): octets} des vignettes d'une image. Sans état : exécutable dans un autre processus."""
+    source = ImageOps.exif_transpose(Image.open(BytesIO(contenu)))
+    vignettes = {}
+    for largeur in sorted(largeurs, reverse=True):
+        # Chaque vignette est réduite depuis la précédente, plus grande : moins de pixels à relire
+        source = source.copy()
+        source.thumbnail((largeur, 1 << 16), Image.LANCZOS)
+        for format in formats:
+            image = source
+            if format == 'jpeg' and image.mode != 'RGB':
+                fond = Image.new('RGB', image.size, 'white')
+                image = image.convert('RGBA')
+                fond.paste(image, mask=image.getchannel('A'))
+                image = fond
+            elif format == 'webp' and image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            sortie = BytesIO()
+            image.save(sortie, format=format.upper(), quality=qualite, **OPTIONS[format])
+            vignettes[largeur, format] = sortie.getvalue()
+    return vignettes
+
+
+def manquantes(valeur):
+    largeurs, formats, _ = parametres()
+    return [(l, f) for l in largeurs for f in formats if not default_storage.exists(chemin(valeur, l, f))]
+
+
+def enregistrer(valeur, vignettes):
+    for (largeur, format), octets in vignettes.items():
+        nom = chemin(valeur, largeur, format)
+        # Noms adressés par le contenu : un fichier existant est déjà le bon
+        if not default_storage.exists(nom):
+            default_storage.save(nom, ContentFile(octets))
+
+
+def associer(model, pk, nom, valeur):
+    """Mémorise l'empreinte, si l'image n'a pas été remplacée entre-temps ; renvoie True si la ligne a changé."""
+    champ, champ_empreinte = IMAGES[model]
+    if model.objects.filter(pk=pk, **{champ: nom}).exclude(**{champ_empreinte: valeur}).update(**{champ_empreinte: valeur}):
+        # update() n'envoie pas de signaux
+        versions.incrementer(model._meta.model_name)
+        return True
+    return False
+
+
+def deriver(model, pk, nom):
+    """Génère les vignettes manquantes du fichier `nom` et les rattache à la ligne ; renvoie l'empreinte."""
+    with default_storage.open(nom, 'rb') as fichier:
+        contenu = fichier.read()
+    largeurs, formats, qualite = params = parametres()
+    valeur = empreinte(contenu, params)
+    if manquantes(valeur):
+        enregistrer(valeur, generer(contenu, largeurs, formats, qualite))
+    associer(model, pk, nom, valeur)
+    return valeur
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Pillow libère le GIL pendant le décodage, le redimensionnement et l'encodage
+            _executor = ThreadPoolExecutor(max_workers=get_setting('WORKERS'), thread_name_prefix='gestion-images')
+        return _executor
+
+
+def _deriver_en_tache(model, pk, nom):
+    try:
+        deriver(model, pk, nom)
+    except Exception:
+        logger.exception('Échec de la génération des vignettes de %s', nom)
+    finally:
+        # Le thread du pool garde sinon sa propre connexion ouverte
+        connection.close()
+
+
+def planifier(model, pk, nom):
+    """Lance la génération des vignettes en arrière-plan (ou tout de suite si WORKERS vaut 0).
+
+    Une tâche perdue (arrêt du processus) est rattrapée par la commande `deriver_images`.
+    """
+    if get_setting('WORKERS'):
+        get_executor().submit(_deriver_en_tache, model, pk, nom)
+    else:
+        deriver(model, pk, nom)
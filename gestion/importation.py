@@ -0,0 +1,266 @@
+import csv
+import datetime
+import io
+import json
+from itertools import islice
+from django.db import DatabaseError, connection, transaction
+from django.utils.text import slugify
+from .models import Auteur, Categorie, Editeur, Exemplaire, Livre
+from . import search, versions
+
+FORMATS = {choix for choix, _ in Livre._meta.get_field('format').choices}
+SEPARATEUR = '|'
+
+
+class ErreurLigne(Exception):
+    pass
+
+
+def lire_csv(fichier):
+    """Lignes d'un CSV avec en-têtes ; `auteurs` et `auteurs_naissance` sont séparés par `|`."""
+    for ligne in csv.DictReader(fichier):
+        auteurs = [nom.strip() for nom in (ligne.get('auteurs') or '').split(SEPARATEUR) if nom.strip()]
+        naissances = (ligne.get('auteurs_naissance') or '').split(SEPARATEUR)
+        ligne['auteurs'] = [
+            {'nom': nom, 'date_de_naissance': (naissances[i].strip() if i < len(naissances) else '') or None}
+            for i, nom in enumerate(auteurs)
+        ]
+        yield ligne
+
+
+def lire_jsonl(fichier):
+    """Un objet JSON par ligne ; `auteurs` est une liste de noms ou d'objets Auteur."""
+    for texte in fichier:
+        texte = texte.strip()
+        if not texte:
+            continue
+        try:
+            ligne = json.loads(texte)
+        except ValueError as e:
+            yield ErreurLigne(f'JSON invalide : {e}')
+            continue
+        if not isinstance(ligne, dict):
+            yield ErreurLigne('Chaque ligne doit être un objet JSON')
+            continue
+        ligne['auteurs'] = [
+            auteur if isinstance(auteur, dict) else {'nom': auteur} for auteur in ligne.get('auteurs') or []
+        ]
+        yield ligne
+
+
+LECTEURS = {
+    'csv': lire_csv,
+    'jsonl': lire_jsonl,
+}
+
+
+def ouvrir_texte(fichier):
+    """Enveloppe un fichier binaire (upload, open(..., 'rb')) pour une lecture texte en flux."""
+    if isinstance(fichier, io.TextIOBase):
+        return fichier
+    return io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+
+
+def texte_requis(ligne, champ, longueur=None):
+    valeur = str(ligne.get(champ) or '').strip()
+    if not valeur:
+        raise ErreurLigne(f'{champ} est obligatoire')
+    if longueur and len(valeur) > longueur:
+        raise ErreurLigne(f'{champ} dépasse {longueur} caractères')
+    return valeur
+
+
+def date_requise(valeur, champ):
+    try:
+        return datetime.date.fromisoformat(str(valeur).strip())
+    except (TypeError, ValueError):
+        raise ErreurLigne(f'{champ} doit être une date AAAA-MM-JJ')
+
+
+def entier(valeur, champ, defaut=None):
+    if valeur in (None, '') and defaut is not None:
+        return defaut
+    try:
+        resultat = int(valeur)
+    except (TypeError, ValueError):
+        raise ErreurLigne(f'{champ} doit être un entier')
+    if resultat < 0:
+        raise ErreurLigne(f'{champ} doit être positif')
+    return resultat
+
+
+def inserer(model, champs, lignes):
+    """INSERT en executemany pour les tables simples dont on n'a pas besoin des clés primaires.
+
+    Évite la construction d'une instance et la compilation SQL champ par champ de bulk_create.
+    """
+    if not lignes:
+        return 0
+    fields = [model._meta.get_field(champ) for champ in champs]
+    colonnes = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    valeurs = ', '.join(['%s'] * len(fields))
+    # Les entiers, textes et booléens passent tels quels : seuls les autres types (dates...) sont convertis
+    lignes = [
+        [
+            valeur if valeur is None or isinstance(valeur, (int, str)) else field.get_db_prep_save(valeur, connection)
+            for field, valeur in zip(fields, ligne)
+        ]
+        for ligne in lignes
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({colonnes}) VALUES ({valeurs})', lignes
+        )
+    return len(lignes)
+
+
+class ImportCatalogue:
+    """Importe des livres par lots : résolution des références en mémoire puis bulk_create.
+
+    Les erreurs sont collectées par ligne (`self.erreurs`) sans interrompre l'import.
+    """
+
+    def __init__(self, batch_size=1000, indexer=True, localisation='Réserve'):
+        self.batch_size = batch_size
+        self.indexer = indexer
+        self.localisation = localisation
+        self.crees = 0
+        self.exemplaires = 0
+        self.erreurs = []
+        self.charger_references()
+
+    def charger_references(self):
+        # Tables de correspondance chargées une seule fois, puis complétées au fil des lots
+        self.categories = dict(Categorie.objects.values_list('slug', 'pk'))
+        self.editeurs = dict(Editeur.objects.values_list('nom', 'pk'))
+        self.auteurs = dict(Auteur.objects.values_list('nom', 'pk'))
+        self.isbns = set(Livre.objects.values_list('isbn', flat=True))
+        self.auteurs_a_creer = {}
+
+    def importer(self, fichier, format='csv'):
+        lignes = enumerate(LECTEURS[format](ouvrir_texte(fichier)), start=1)
+        while True:
+            lot = list(islice(lignes, self.batch_size))
+            if not lot:
+                break
+            self.importer_lot(lot)
+        return self
+
+    def resume(self):
+        return {'crees': self.crees, 'exemplaires': self.exemplaires, 'erreurs': self.erreurs}
+
+    def valider(self, ligne):
+        if isinstance(ligne, ErreurLigne):
+            raise ligne
+        isbn = texte_requis(ligne, 'isbn', 13)
+        if isbn in self.isbns:
+            raise ErreurLigne(f'ISBN {isbn} déjà présent')
+        format_livre = texte_requis(ligne, 'format')
+        if format_livre not in FORMATS:
+            raise ErreurLigne(f'format doit être parmi {", ".join(sorted(FORMATS))}')
+        slug = slugify(texte_requis(ligne, 'categorie', 255))[:50]
+        if not slug:
+            raise ErreurLigne('categorie invalide')
+        auteurs = []
+        for auteur in ligne['auteurs']:
+            nom = texte_requis(auteur, 'nom', 255)
+            if nom not in self.auteurs and nom not in self.auteurs_a_creer:
+                if not auteur.get('date_de_naissance'):
+                    raise ErreurLigne(f'Auteur inconnu "{nom}" : date_de_naissance requise pour le créer')
+                date_requise(auteur['date_de_naissance'], 'date_de_naissance')
+            auteurs.append({**auteur, 'nom': nom})
+        return {
+            'titre': texte_requis(ligne, 'titre', 255),
+            'résumé': str(ligne.get('résumé') or ligne.get('resume') or '').strip(),
+            'date_de_publication': date_requise(ligne.get('date_de_publication'), 'date_de_publication'),
+            'isbn': isbn,
+            'nombre_de_pages': entier(ligne.get('nombre_de_pages'), 'nombre_de_pages'),
+            'langue': texte_requis(ligne, 'langue', 100),
+            'format': format_livre,
+            'categorie': texte_requis(ligne, 'categorie', 255),
+            'categorie_slug': slug,
+            'editeur': str(ligne.get('editeur') or '').strip()[:255],
+            'auteurs': auteurs,
+            'exemplaires': entier(ligne.get('exemplaires'), 'exemplaires', defaut=0),
+        }
+
+    def creer_references(self, valides):
+        nouvelles_categories = {}
+        nouveaux_editeurs = set()
+        for donnees in valides:
+            if donnees['categorie_slug'] not in self.categories:
+                nouvelles_categories.setdefault(donnees['categorie_slug'], donnees['categorie'])
+            if donnees['editeur'] and donnees['editeur'] not in self.editeurs:
+                nouveaux_editeurs.add(donnees['editeur'])
+
+        for categorie in Categorie.objects.bulk_create(
+            [Categorie(nom=nom, slug=slug, description='') for slug, nom in nouvelles_categories.items()]
+        ):
+            self.categories[categorie.slug] = categorie.pk
+        for editeur in Editeur.objects.bulk_create(
+            [Editeur(nom=nom, adresse='', site_web='', email_contact='', description='') for nom in nouveaux_editeurs]
+        ):
+            self.editeurs[editeur.nom] = editeur.pk
+        for auteur in Auteur.objects.bulk_create([
+            Auteur(
+                nom=nom, biographie=auteur.get('biographie') or '', nationalité=auteur.get('nationalité') or '',
+                date_de_naissance=date_requise(auteur['date_de_naissance'], 'date_de_naissance'),
+            ) for nom, auteur in self.auteurs_a_creer.items()
+        ]):
+            self.auteurs[auteur.nom] = auteur.pk
+        self.auteurs_a_creer = {}
+
+    def importer_lot(self, lot):
+        valides = []
+        for numero, ligne in lot:
+            try:
+                donnees = self.valider(ligne)
+            except ErreurLigne as e:
+                self.erreurs.append({'ligne': numero, 'erreur': str(e)})
+                continue
+            # Réservé tout de suite : un ISBN répété plus loin dans le fichier est une erreur
+            self.isbns.add(donnees['isbn'])
+            for auteur in donnees['auteurs']:
+                if auteur['nom'] not in self.auteurs:
+                    self.auteurs_a_creer.setdefault(auteur['nom'], auteur)
+            valides.append((numero, donnees))
+        if not valides:
+            return
+
+        try:
+            self.enregistrer([donnees for _, donnees in valides])
+        except DatabaseError as e:
+            # Lot annulé : les tables de correspondance peuvent contenir des lignes qui n'existent plus
+            self.erreurs.extend({'ligne': numero, 'erreur': f'Lot rejeté : {e}'} for numero, _ in valides)
+            self.charger_references()
+
+    def enregistrer(self, valides):
+        with transaction.atomic():
+            self.creer_references(valides)
+            livres = Livre.objects.bulk_create([
+                Livre(
+                    titre=d['titre'], résumé=d['résumé'], date_de_publication=d['date_de_publication'], isbn=d['isbn'],
+                    nombre_de_pages=d['nombre_de_pages'], langue=d['langue'], format=d['format'],
+                    categorie_id=self.categories[d['categorie_slug']],
+                    editeur_id=self.editeurs.get(d['editeur']),
+                    nombre_exemplaires=d['exemplaires'], exemplaires_disponibles=d['exemplaires'],
+                ) for d in valides
+            ])
+            inserer(Livre.auteurs.through, ['livre', 'auteur'], [
+                (livre.pk, self.auteurs[nom])
+                for livre, d in zip(livres, valides)
+                for nom in dict.fromkeys(auteur['nom'] for auteur in d['auteurs'])
+            ])
+            aujourd_hui = datetime.date.today()
+            exemplaires = inserer(Exemplaire, ['livre', 'état', 'date_acquisition', 'localisation', 'disponibilité'], [
+                (livre.pk, 'Neuf', aujourd_hui, self.localisation, True)
+                for livre, d in zip(livres, valides)
+                for _ in range(d['exemplaires'])
+            ])
+            if self.indexer:
+                search.reindexer([livre.pk for livre in livres])
+            # bulk_create n'envoie pas de signaux
+            versions.incrementer('auteur', 'categorie', 'editeur', 'livre')
+
+        self.crees += len(livres)
+        self.exemplaires += exemplaires
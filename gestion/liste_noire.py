@@ -0,0 +1,168 @@
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+DEFAULTS = {
+    # Alias du cache partagé entre workers qui propage les révocations ; doit être commun à tous
+    # les processus (Redis, Memcached) dès qu'il y en a plusieurs
+    'CACHE': 'default',
+    # Dimensionnement du filtre de Bloom ; au-delà, les faux positifs (donc les requêtes SQL) augmentent
+    'CAPACITE': 100_000,
+    'TAUX_FAUX_POSITIFS': 0.001,
+    # Reconstruction périodique (secondes) depuis la base, qui oublie les jetons expirés
+    'RECONSTRUCTION': 3600,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_LISTE_NOIRE', {}).get(name, DEFAULTS[name])
+
+
+class FiltreBloom:
+    """Ensemble probabiliste : `in` ne se trompe jamais sur un absent, rarement sur un présent."""
+
+    def __init__(self, capacite, taux):
+        self.taille = max(8, int(-capacite * math.log(taux) / math.log(2) ** 2))
+        self.hachages = max(1, round(self.taille / capacite * math.log(2)))
+        self.bits = bytearray((self.taille + 7) // 8)
+
+    def _positions(self, cle):
+        # Double hachage (Kirsch-Mitzenmacher) : deux entiers de 64 bits suffisent pour k positions
+        empreinte = hashlib.blake2b(cle.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(empreinte[:8], 'little')
+        h2 = int.from_bytes(empreinte[8:], 'little') | 1
+        return [(h1 + i * h2) % self.taille for i in range(self.hachages)]
+
+    def add(self, cle):
+        for position in self._positions(cle):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, cle):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(cle))
+
+
+class ListeNoire:
+    """JTI révoqués, consultés sans requête SQL dans le cas courant.
+
+    - un filtre de Bloom de tous les jetons révoqués non expirés, reconstruit depuis la base au
+      premier usage dans le processus puis toutes les RECONSTRUCTION secondes ;
+    - les révocations récentes (jti -> expiration), oubliées une fois le jeton expiré ;
+    - un journal numéroté dans le cache partagé, par lequel chaque worker récupère les
+      révocations faites ailleurs (une lecture de cache par vérification).
+
+    Un jti absent du filtre n'est pas révoqué ; présent, il est confirmé par la base
+    (BlacklistedToken), qui reste la référence.
+    """
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.filtre = None
+        self.recents = {}
+        self.generation = 0
+        self.reconstruit = 0
+
+    def _cache(self):
+        return caches[get_setting('CACHE')]
+
+    def _cle(self, suite):
+        return f'gestion:liste_noire:{suite}'
+
+    def reconstruire(self):
+        cache = self._cache()
+        # Génération lue avant la base : une révocation concurrente sera relue dans le journal
+        generation = cache.get(self._cle('generation'), 0)
+        revoques = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list('token__jti', flat=True)
+        )
+        filtre = FiltreBloom(max(get_setting('CAPACITE'), 2 * len(revoques)), get_setting('TAUX_FAUX_POSITIFS'))
+        for jti in revoques:
+            filtre.add(jti)
+        with self.verrou:
+            self.filtre = filtre
+            self.recents = {}
+            self.generation = generation
+            self.reconstruit = time.monotonic()
+
+    def synchroniser(self):
+        if self.filtre is None or time.monotonic() - self.reconstruit > get_setting('RECONSTRUCTION'):
+            return self.reconstruire()
+        cache = self._cache()
+        generation = cache.get(self._cle('generation'), 0)
+        if generation == self.generation:
+            return
+        if generation < self.generation:
+            # Cache vidé ou redémarré : le journal est perdu
+            return self.reconstruire()
+        entrees = cache.get_many([self._cle(n) for n in range(self.generation + 1, generation + 1)])
+        if len(entrees) < generation - self.generation:
+            # Entrée expirée, évincée, ou pas encore écrite par le worker qui l'a numérotée
+            return self.reconstruire()
+        maintenant = time.time()
+        with self.verrou:
+            for jti, exp in entrees.values():
+                self.filtre.add(jti)
+                self.recents[jti] = exp
+            self.recents = {jti: exp for jti, exp in self.recents.items() if exp > maintenant}
+            self.generation = max(self.generation, generation)
+
+    def contient(self, jti):
+        self.synchroniser()
+        if jti in self.recents:
+            return True
+        if jti not in self.filtre:
+            return False
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def ajouter(self, jti, exp):
+        """Publie une révocation déjà enregistrée en base, pour ce processus et les autres workers."""
+        cache = self._cache()
+        ttl = max(1, int(exp - time.time()))
+        cache.add(self._cle('generation'), 0, None)
+        suite = cache.incr(self._cle('generation'))
+        cache.set(self._cle(suite), (jti, exp), ttl)
+        if self.filtre is not None:
+            with self.verrou:
+                self.filtre.add(jti)
+                self.recents[jti] = exp
+
+
+liste_noire = ListeNoire()
+
+
+class RefreshToken(BaseRefreshToken):
+    """RefreshToken de simplejwt dont la liste noire est consultée via `liste_noire`.
+
+    La révocation est aussi une prise : si le jeton a déjà été révoqué entre la vérification et
+    l'écriture (deux rafraîchissements simultanés du même jeton), elle lève TokenError.
+    """
+
+    def check_blacklist(self):
+        if liste_noire.contient(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload['exp']
+        try:
+            # Pas de get_or_create (et de ses points de sauvegarde) : une collision sur le jti ou sur
+            # le jeton révoqué signifie de toute façon un usage concurrent
+            with transaction.atomic():
+                token = OutstandingToken.objects.filter(jti=jti).first() or OutstandingToken.objects.create(
+                    jti=jti, token=str(self), expires_at=datetime_from_epoch(exp),
+                )
+                blacklisted = BlacklistedToken.objects.create(token=token)
+        except IntegrityError:
+            raise TokenError(_('Token is blacklisted'))
+        liste_noire.ajouter(jti, exp)
+        return blacklisted
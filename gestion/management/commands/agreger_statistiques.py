@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from gestion import statistiques
+from gestion.models import Filigrane
+
+class Command(BaseCommand):
+    help = "Met à jour les statistiques quotidiennes avec les emprunts, retours et évaluations depuis le dernier passage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depuis-le-debut', action='store_true',
+                            help="Oublie le filigrane et recalcule tout l'historique")
+
+    def handle(self, *args, **options):
+        if options['depuis_le_debut']:
+            Filigrane.objects.filter(nom=statistiques.FILIGRANE).delete()
+        total = statistiques.agreger()
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} lignes livre/jour recalculées, données à jour au {statistiques.filigrane():%Y-%m-%d %H:%M}.'
+        ))
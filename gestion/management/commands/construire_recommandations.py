@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from gestion import recommandations
+
+class Command(BaseCommand):
+    help = "Recalcule les livres similaires à partir des emprunts et des évaluations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=None, help='Voisins gardés par livre (GESTION_RECOMMANDATIONS par défaut)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        total = recommandations.construire(options['k'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} voisins enregistrés en {time.perf_counter() - debut:.1f} s.'
+        ))
@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from gestion import images
+
+class Command(BaseCommand):
+    help = "Génère les vignettes manquantes des photos d'auteurs, logos d'éditeurs et couvertures de livres"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processus générant les vignettes en parallèle')
+        parser.add_argument('--modeles', nargs='*', choices=[model._meta.model_name for model in images.IMAGES],
+                            help='Modèles à traiter (tous par défaut)')
+        parser.add_argument('--tous', action='store_true',
+                            help="Revérifie aussi les lignes qui ont déjà une empreinte")
+
+    def a_traiter(self, options):
+        for model, (champ, champ_empreinte) in images.IMAGES.items():
+            if options['modeles'] and model._meta.model_name not in options['modeles']:
+                continue
+            queryset = model.objects.exclude(**{champ: ''}).exclude(**{f'{champ}__isnull': True})
+            if not options['tous']:
+                queryset = queryset.filter(**{champ_empreinte: ''})
+            # Liste chargée d'avance : SQLite n'isole pas une lecture en cours des UPDATE de la même connexion
+            for pk, nom in list(queryset.order_by('pk').values_list('pk', champ)):
+                yield model, pk, nom
+
+    def handle(self, *args, **options):
+        largeurs, formats, qualite = params = images.parametres()
+        compteurs = {'generees': 0, 'existantes': 0, 'absentes': 0, 'associees': 0}
+        # Lecture des sources, écriture des vignettes et mises à jour dans ce processus ; seul le
+        # décodage et l'encodage Pillow partent dans le pool. Le nombre de tâches en vol est borné.
+        en_vol = {}
+        # Lignes en attente d'une génération en cours, par empreinte : un même fichier n'est traité qu'une fois
+        lignes = {}
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            def terminer(futures):
+                for future in futures:
+                    valeur = en_vol.pop(future)
+                    images.enregistrer(valeur, future.result())
+                    compteurs['generees'] += 1
+                    for model, pk, nom in lignes.pop(valeur):
+                        compteurs['associees'] += images.associer(model, pk, nom, valeur)
+
+            for model, pk, nom in self.a_traiter(options):
+                if not default_storage.exists(nom):
+                    compteurs['absentes'] += 1
+                    self.stderr.write(f'Fichier absent : {nom} ({model._meta.model_name} {pk})')
+                    continue
+                with default_storage.open(nom, 'rb') as fichier:
+                    contenu = fichier.read()
+                valeur = images.empreinte(contenu, params)
+                if valeur in lignes:
+                    lignes[valeur].append((model, pk, nom))
+                    continue
+                if not images.manquantes(valeur):
+                    compteurs['existantes'] += 1
+                    compteurs['associees'] += images.associer(model, pk, nom, valeur)
+                    continue
+                lignes[valeur] = [(model, pk, nom)]
+                en_vol[executor.submit(images.generer, contenu, largeurs, formats, qualite)] = valeur
+                if len(en_vol) >= 2 * options['workers']:
+                    termines, _ = wait(en_vol, return_when=FIRST_COMPLETED)
+                    terminer(termines)
+            terminer(list(en_vol))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{compteurs['generees']} images dérivées, {compteurs['existantes']} déjà dérivées, "
+            f"{compteurs['associees']} lignes mises à jour, {compteurs['absentes']} fichiers absents."
+        ))
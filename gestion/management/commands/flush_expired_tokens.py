@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+class Command(BaseCommand):
+    help = "Supprime par lots les jetons expirés (OutstandingToken et leur BlacklistedToken)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0, help='Pause en secondes entre deux lots')
+
+    def handle(self, *args, **options):
+        # Contrairement à `flushexpiredtokens`, un lot = une transaction courte : le verrou
+        # d'écriture SQLite n'est jamais tenu pendant toute la purge
+        maintenant = timezone.now()
+        supprimes = revoques = lots = 0
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=maintenant)
+                .order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            _, detail = OutstandingToken.objects.filter(pk__in=ids).delete()
+            supprimes += detail.get('token_blacklist.OutstandingToken', 0)
+            revoques += detail.get('token_blacklist.BlacklistedToken', 0)
+            lots += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{supprimes} jetons expirés supprimés, dont {revoques} révoqués ({lots} lots).'
+        ))
@@ -0,0 +1,36 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from gestion.importation import ImportCatalogue, LECTEURS
+
+class Command(BaseCommand):
+    help = 'Importe un catalogue de livres depuis un fichier CSV ou JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier')
+        parser.add_argument('--format', choices=sorted(LECTEURS), help="Déduit de l'extension par défaut")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-index', action='store_true',
+                            help="Ne pas indexer pour la recherche (lancer reindexer_recherche ensuite)")
+        parser.add_argument('--erreurs', help='Fichier JSON Lines où écrire les erreurs par ligne')
+
+    def handle(self, *args, **options):
+        format = options['format'] or options['fichier'].rsplit('.', 1)[-1].lower()
+        if format not in LECTEURS:
+            raise CommandError(f'Format inconnu : {format}')
+
+        importation = ImportCatalogue(batch_size=options['batch_size'], indexer=not options['no_index'])
+        with open(options['fichier'], 'rb') as fichier:
+            importation.importer(fichier, format)
+
+        if options['erreurs']:
+            with open(options['erreurs'], 'w', encoding='utf-8') as sortie:
+                for erreur in importation.erreurs:
+                    sortie.write(json.dumps(erreur, ensure_ascii=False) + '\n')
+        else:
+            for erreur in importation.erreurs[:20]:
+                self.stdout.write(self.style.ERROR(f"Ligne {erreur['ligne']} : {erreur['erreur']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{importation.crees} livres et {importation.exemplaires} exemplaires importés, '
+            f'{len(importation.erreurs)} erreurs.'
+        ))
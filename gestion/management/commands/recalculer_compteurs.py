@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from gestion.models import Livre
+from gestion import versions
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs d'exemplaires, d'emprunts et d'évaluations de tous les livres"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = Livre.objects.order_by('pk').values_list('pk', flat=True)
+        dernier_id = 0
+        total = 0
+
+        while True:
+            # Découpage par plages de clés primaires pour garder des transactions courtes
+            tranche = list(ids.filter(pk__gt=dernier_id)[:batch_size])
+            if not tranche:
+                break
+            with transaction.atomic():
+                livres = Livre.objects.filter(pk__gte=tranche[0], pk__lte=tranche[-1])
+                total += livres.mettre_a_jour_compteurs()
+                livres.mettre_a_jour_notes()
+                versions.incrementer('livre')
+            dernier_id = tranche[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Compteurs recalculés pour {total} livres.'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from gestion import search
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte de tout le catalogue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        index = search.get_index()
+        total = 0
+
+        with transaction.atomic():
+            index.vider()
+
+            # iterator() + prefetch_related charge les livres par lots sans tout garder en mémoire
+            lot = []
+            for livre in search.livres_a_indexer().iterator(chunk_size=batch_size):
+                lot.append(livre)
+                if len(lot) == batch_size:
+                    index.indexer(lot)
+                    total += len(lot)
+                    lot = []
+            index.indexer(lot)
+            total += len(lot)
+
+        self.stdout.write(self.style.SUCCESS(f'{total} livres indexés ({type(index).__name__}).'))
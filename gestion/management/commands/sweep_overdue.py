@@ -0,0 +1,27 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from gestion import retards
+
+class Command(BaseCommand):
+    help = "Passe en 'En retard' les emprunts en cours dont la date de retour prévue est dépassée"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--pause', type=float, default=None, help='Pause en secondes entre deux lots')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Relance le balayage toutes les N secondes au lieu de sortir')
+        parser.add_argument('--json', action='store_true', help='Métriques au format JSON')
+
+    def handle(self, *args, **options):
+        while True:
+            metriques = retards.marquer_retards(batch_size=options['batch_size'], pause=options['pause'])
+            if options['json']:
+                self.stdout.write(json.dumps(metriques))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{metriques['marques']} emprunts marqués en retard ({metriques['lots']} lots, {metriques['duree_ms']} ms)."
+                ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
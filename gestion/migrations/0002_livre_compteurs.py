@@ -0,0 +1,49 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def initialiser_compteurs(apps, schema_editor):
+    Livre = apps.get_model('gestion', 'Livre')
+    Exemplaire = apps.get_model('gestion', 'Exemplaire')
+    Emprunt = apps.get_model('gestion', 'Emprunt')
+
+    exemplaires = Exemplaire.objects.filter(livre=OuterRef('pk')).order_by().values('livre')
+    emprunts = Emprunt.objects.filter(
+        exemplaire__livre=OuterRef('pk'), date_retour_effective__isnull=True
+    ).order_by().values('exemplaire__livre')
+    Livre.objects.update(
+        nombre_exemplaires=Coalesce(Subquery(exemplaires.annotate(n=Count('pk')).values('n')), 0),
+        exemplaires_disponibles=Coalesce(
+            Subquery(exemplaires.filter(disponibilité=True).annotate(n=Count('pk')).values('n')), 0
+        ),
+        emprunts_en_cours=Coalesce(Subquery(emprunts.annotate(n=Count('pk')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livre',
+            name='emprunts_en_cours',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='exemplaires_disponibles',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='nombre_exemplaires',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
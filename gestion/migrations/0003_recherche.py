@@ -0,0 +1,43 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def creer_table_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # remove_diacritics 2 rend la recherche insensible aux accents, prefix accélère les recherches "mot*"
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS gestion_livre_fts USING fts5("
+        "titre, resume, auteurs, biographies, editeur, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+
+def supprimer_table_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS gestion_livre_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0002_livre_compteurs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermeRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terme', models.CharField(max_length=64)),
+                ('poids', models.FloatField()),
+                ('livre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.livre')),
+            ],
+            options={
+                'unique_together': {('terme', 'livre')},
+            },
+        ),
+        migrations.RunPython(creer_table_fts, supprimer_table_fts),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0003_recherche'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auteur',
+            index=models.Index(fields=['nom', 'id'], name='auteur_nom_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentaire',
+            index=models.Index(fields=['-date_publication', '-id'], name='commentaire_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprunt',
+            index=models.Index(fields=['-date_emprunt', '-id'], name='emprunt_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=models.Index(fields=['-date_évaluation', '-id'], name='evaluation_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livre',
+            index=models.Index(fields=['-date_de_publication', '-id'], name='livre_publication_id_idx'),
+        ),
+    ]
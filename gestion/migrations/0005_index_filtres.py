@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0004_index_pagination'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auteur',
+            index=models.Index(fields=['date_de_naissance', 'id'], name='auteur_naissance_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auteur',
+            index=models.Index(fields=['nationalité', 'nom', 'id'], name='auteur_nationalite_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentaire',
+            index=models.Index(condition=models.Q(('visible', True)), fields=['livre', '-date_publication'], name='commentaire_visible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprunt',
+            index=models.Index(fields=['utilisateur', 'statut'], name='emprunt_utilisateur_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprunt',
+            index=models.Index(condition=models.Q(('date_retour_effective__isnull', True)), fields=['date_retour_prévue'], name='emprunt_actif_echeance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprunt',
+            index=models.Index(condition=models.Q(('date_retour_effective__isnull', True)), fields=['exemplaire'], name='emprunt_actif_exemplaire_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livre',
+            index=models.Index(fields=['titre'], name='livre_titre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livre',
+            index=models.Index(fields=['langue', '-date_de_publication', '-id'], name='livre_langue_publication_idx'),
+        ),
+    ]
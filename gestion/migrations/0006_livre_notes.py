@@ -0,0 +1,89 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:21
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def initialiser_notes(apps, schema_editor):
+    Livre = apps.get_model('gestion', 'Livre')
+    Evaluation = apps.get_model('gestion', 'Evaluation')
+    evaluations = Evaluation.objects.filter(livre=OuterRef('pk')).order_by().values('livre')
+
+    def agreger(expression, **filtres):
+        sous_requete = evaluations.filter(**filtres).annotate(v=expression).values('v')
+        return Coalesce(Subquery(sous_requete), 0, output_field=expression.output_field)
+
+    Livre.objects.update(
+        nombre_evaluations=agreger(Count('pk')),
+        somme_notes=agreger(Sum('note', output_field=IntegerField())),
+        note_moyenne=agreger(Avg('note', output_field=FloatField())),
+        nombre_recommandations=agreger(Count('pk'), recommandé=True),
+        **{f'notes_{note}': agreger(Count('pk'), note=note) for note in range(1, 6)},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0005_index_filtres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livre',
+            name='nombre_evaluations',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='nombre_recommandations',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='note_moyenne',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='notes_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='notes_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='notes_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='notes_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='notes_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='somme_notes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='evaluation',
+            name='note',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AddIndex(
+            model_name='livre',
+            index=models.Index(fields=['-note_moyenne', '-id'], name='livre_note_moyenne_idx'),
+        ),
+        migrations.RunPython(initialiser_notes, migrations.RunPython.noop),
+    ]
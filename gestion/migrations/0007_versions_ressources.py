@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def creer_versions(apps, schema_editor):
+    VersionRessource = apps.get_model('gestion', 'VersionRessource')
+    VersionRessource.objects.bulk_create(
+        [VersionRessource(nom=nom) for nom in ('auteur', 'categorie', 'editeur', 'livre')], ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0006_livre_notes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionRessource',
+            fields=[
+                ('nom', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('modifie', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(creer_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0007_versions_ressources'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emprunt',
+            index=models.Index(condition=models.Q(('date_retour_effective__isnull', True)), fields=['statut', 'date_retour_prévue'], name='emprunt_statut_echeance_idx'),
+        ),
+    ]
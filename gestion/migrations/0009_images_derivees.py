@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_index_retards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auteur',
+            name='photo_empreinte',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='editeur',
+            name='logo_empreinte',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='livre',
+            name='couverture_empreinte',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0009_images_derivees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LivreSimilaire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('communs', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('livre', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.livre')),
+                ('voisin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.livre')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['livre', '-score', 'voisin'], name='livre_similaire_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('livre', 'voisin'), name='livre_similaire_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0010_recommandations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Filigrane',
+            fields=[
+                ('nom', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatistiqueJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('langue', models.CharField(max_length=100)),
+                ('emprunts', models.PositiveIntegerField(default=0)),
+                ('retours', models.PositiveIntegerField(default=0)),
+                ('retards', models.PositiveIntegerField(default=0)),
+                ('evaluations', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatistiqueLivreJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('emprunts', models.PositiveIntegerField(default=0)),
+                ('retours', models.PositiveIntegerField(default=0)),
+                ('retards', models.PositiveIntegerField(default=0)),
+                ('evaluations', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatistiqueLivreMois',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField()),
+                ('emprunts', models.PositiveIntegerField(default=0)),
+                ('retours', models.PositiveIntegerField(default=0)),
+                ('retards', models.PositiveIntegerField(default=0)),
+                ('evaluations', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='emprunt',
+            index=models.Index(fields=['date_retour_effective'], name='emprunt_retour_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprunt',
+            index=models.Index(fields=['date_retour_prévue'], name='emprunt_echeance_idx'),
+        ),
+        migrations.AddField(
+            model_name='statistiquejour',
+            name='categorie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.categorie'),
+        ),
+        migrations.AddField(
+            model_name='statistiquelivrejour',
+            name='livre',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.livre'),
+        ),
+        migrations.AddField(
+            model_name='statistiquelivremois',
+            name='livre',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.livre'),
+        ),
+        migrations.AddConstraint(
+            model_name='statistiquejour',
+            constraint=models.UniqueConstraint(fields=('jour', 'categorie', 'langue'), name='statistique_jour_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='statistiquelivrejour',
+            constraint=models.UniqueConstraint(fields=('jour', 'livre'), name='statistique_livre_jour_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='statistiquelivremois',
+            constraint=models.UniqueConstraint(fields=('mois', 'livre'), name='statistique_livre_mois_unique'),
+        ),
+    ]
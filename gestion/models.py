@@ -1,5 +1,7 @@
-from django.db import models
-import pyotp
+from django.db import models, transaction
+from django.db.models.functions import Cast, Coalesce
+from django.core.validators import MaxValueValidator, MinValueValidator
+from . import otp
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
@@ -10,14 +12,10 @@ class UserAccount(AbstractUser):
         return self.email
 
     def get_otp(self):
-        if not self.otp_secret:
-            self.otp_secret = pyotp.random_base32()
-            self.save()
-        return pyotp.TOTP(self.otp_secret)
+        return otp.get_totp(self)
 
     def verify_otp(self, token):
-        totp = self.get_otp()
-        return totp.verify(token)
+        return otp.verify(self, token)
 
 class Auteur(models.Model):
     nom = models.CharField(max_length=255)
@@ -26,6 +24,15 @@ class Auteur(models.Model):
     date_de_décès = models.DateField(null=True, blank=True)
     nationalité = models.CharField(max_length=255)
     photo = models.ImageField(upload_to='auteurs_photos/', null=True, blank=True)
+    # Empreinte des vignettes générées (voir images.py), vide tant qu'elles ne sont pas prêtes
+    photo_empreinte = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['nom', 'id'], name='auteur_nom_id_idx'),
+            models.Index(fields=['date_de_naissance', 'id'], name='auteur_naissance_id_idx'),
+            models.Index(fields=['nationalité', 'nom', 'id'], name='auteur_nationalite_nom_idx'),
+        ]
 
     def __str__(self):
         return self.nom
@@ -45,10 +52,65 @@ class Editeur(models.Model):
     email_contact = models.EmailField()
     description = models.TextField()
     logo = models.ImageField(upload_to='editeurs_logos/', null=True, blank=True)
+    logo_empreinte = models.CharField(max_length=64, blank=True, default='', editable=False)
 
     def __str__(self):
         return self.nom
 
+NOTES = range(1, 6)
+
+class LivreQuerySet(models.QuerySet):
+
+    def mettre_a_jour_compteurs(self):
+        """Recalcule en un seul UPDATE les compteurs d'exemplaires et d'emprunts des livres sélectionnés."""
+        exemplaires = Exemplaire.objects.filter(livre=models.OuterRef('pk')).order_by().values('livre')
+        emprunts = Emprunt.objects.filter(
+            exemplaire__livre=models.OuterRef('pk'), date_retour_effective__isnull=True
+        ).order_by().values('exemplaire__livre')
+        return self.update(
+            nombre_exemplaires=Coalesce(models.Subquery(exemplaires.annotate(n=models.Count('pk')).values('n')), 0),
+            exemplaires_disponibles=Coalesce(
+                models.Subquery(exemplaires.filter(disponibilité=True).annotate(n=models.Count('pk')).values('n')), 0
+            ),
+            emprunts_en_cours=Coalesce(models.Subquery(emprunts.annotate(n=models.Count('pk')).values('n')), 0),
+        )
+
+    def mettre_a_jour_notes(self):
+        """Recalcule entièrement le résumé des évaluations des livres sélectionnés."""
+        evaluations = Evaluation.objects.filter(livre=models.OuterRef('pk')).order_by().values('livre')
+
+        def agreger(expression, **filtres):
+            sous_requete = evaluations.filter(**filtres).annotate(v=expression).values('v')
+            return Coalesce(models.Subquery(sous_requete), 0, output_field=expression.output_field)
+
+        return self.update(
+            nombre_evaluations=agreger(models.Count('pk')),
+            somme_notes=agreger(models.Sum('note', output_field=models.IntegerField())),
+            note_moyenne=agreger(models.Avg('note', output_field=models.FloatField())),
+            nombre_recommandations=agreger(models.Count('pk'), recommandé=True),
+            **{f'notes_{note}': agreger(models.Count('pk'), note=note) for note in NOTES},
+        )
+
+    def ajuster_notes(self, note, recommande, sens):
+        """Ajoute (sens=1) ou retire (sens=-1) une évaluation du résumé, sans relire les autres évaluations.
+
+        Les expressions F() lisent les valeurs d'avant l'UPDATE (SQLite, PostgreSQL), la moyenne
+        est donc calculée à partir de l'ancienne somme et de l'ancien nombre.
+        """
+        champs = {
+            'nombre_evaluations': models.F('nombre_evaluations') + sens,
+            'somme_notes': models.F('somme_notes') + sens * note,
+            'nombre_recommandations': models.F('nombre_recommandations') + sens * int(recommande),
+            'note_moyenne': models.Case(
+                models.When(nombre_evaluations=-sens, then=models.Value(0.0)),
+                default=Cast(models.F('somme_notes') + sens * note, models.FloatField()) / (models.F('nombre_evaluations') + sens),
+                output_field=models.FloatField(),
+            ),
+        }
+        if note in NOTES:
+            champs[f'notes_{note}'] = models.F(f'notes_{note}') + sens
+        return self.update(**champs)
+
 class Livre(models.Model):
     titre = models.CharField(max_length=255)
     résumé = models.TextField()
@@ -57,10 +119,42 @@ class Livre(models.Model):
     nombre_de_pages = models.IntegerField()
     langue = models.CharField(max_length=100)
     image_de_couverture = models.ImageField(upload_to='livres_couvertures/', null=True, blank=True)
+    couverture_empreinte = models.CharField(max_length=64, blank=True, default='', editable=False)
     format = models.CharField(max_length=50, choices=[('Broché', 'Broché'), ('Relié', 'Relié'), ('Numérique', 'Numérique')])
     auteurs = models.ManyToManyField(Auteur, related_name='livres')
     categorie = models.ForeignKey(Categorie, on_delete=models.CASCADE, related_name='livres')
     editeur = models.ForeignKey(Editeur, on_delete=models.SET_NULL, null=True, related_name='livres')
+    nombre_exemplaires = models.PositiveIntegerField(default=0, editable=False)
+    exemplaires_disponibles = models.PositiveIntegerField(default=0, editable=False)
+    emprunts_en_cours = models.PositiveIntegerField(default=0, editable=False)
+    nombre_evaluations = models.PositiveIntegerField(default=0, editable=False)
+    somme_notes = models.IntegerField(default=0, editable=False)
+    note_moyenne = models.FloatField(default=0, editable=False)
+    nombre_recommandations = models.PositiveIntegerField(default=0, editable=False)
+    notes_1 = models.PositiveIntegerField(default=0, editable=False)
+    notes_2 = models.PositiveIntegerField(default=0, editable=False)
+    notes_3 = models.PositiveIntegerField(default=0, editable=False)
+    notes_4 = models.PositiveIntegerField(default=0, editable=False)
+    notes_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = LivreQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_de_publication', '-id'], name='livre_publication_id_idx'),
+            models.Index(fields=['titre'], name='livre_titre_idx'),
+            models.Index(fields=['langue', '-date_de_publication', '-id'], name='livre_langue_publication_idx'),
+            models.Index(fields=['-note_moyenne', '-id'], name='livre_note_moyenne_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Les compteurs et le résumé des notes sont maintenus par UPDATE atomiques :
+        # une modification du livre ne doit pas les écraser avec des valeurs périmées
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields if field.editable and not field.primary_key
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.titre
@@ -72,6 +166,26 @@ class Exemplaire(models.Model):
     localisation = models.CharField(max_length=255)
     disponibilité = models.BooleanField(default=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.memoriser_livre()
+        return instance
+
+    def memoriser_livre(self):
+        # Livre enregistré en base : un exemplaire déplacé met aussi à jour les compteurs de l'ancien
+        if 'livre_id' in self.__dict__:
+            self._livre_enregistre = self.livre_id
+
+    def save(self, *args, **kwargs):
+        # Les compteurs des livres sont mis à jour par signal dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"Exemplaire de {self.livre.titre} - {self.état}"
 
@@ -84,6 +198,50 @@ class Emprunt(models.Model):
     statut = models.CharField(max_length=100, choices=[('En cours', 'En cours'), ('Terminé', 'Terminé'), ('En retard', 'En retard')])
     remarques = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_emprunt', '-id'], name='emprunt_date_id_idx'),
+            models.Index(fields=['utilisateur', 'statut'], name='emprunt_utilisateur_statut_idx'),
+            # Emprunts non rendus : détection des retards et compteurs de Livre
+            models.Index(
+                fields=['date_retour_prévue'], condition=models.Q(date_retour_effective__isnull=True),
+                name='emprunt_actif_echeance_idx',
+            ),
+            models.Index(
+                fields=['exemplaire'], condition=models.Q(date_retour_effective__isnull=True),
+                name='emprunt_actif_exemplaire_idx',
+            ),
+            # Balayage des retards (gestion.retards) : emprunts 'En cours' par échéance
+            models.Index(
+                fields=['statut', 'date_retour_prévue'], condition=models.Q(date_retour_effective__isnull=True),
+                name='emprunt_statut_echeance_idx',
+            ),
+            # Agrégats quotidiens (gestion.statistiques) : retours et échéances d'une période, emprunts
+            # rendus compris, que les index partiels ci-dessus ne couvrent pas
+            models.Index(fields=['date_retour_effective'], name='emprunt_retour_idx'),
+            models.Index(fields=['date_retour_prévue'], name='emprunt_echeance_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.memoriser_exemplaire()
+        return instance
+
+    def memoriser_exemplaire(self):
+        # Exemplaire enregistré en base : un emprunt déplacé met aussi à jour les compteurs de l'ancien livre
+        if 'exemplaire_id' in self.__dict__:
+            self._exemplaire_enregistre = self.exemplaire_id
+
+    def save(self, *args, **kwargs):
+        # Les compteurs des livres sont mis à jour par signal dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"Emprunt par {self.utilisateur.username} de {self.exemplaire.livre.titre}"
 
@@ -95,17 +253,146 @@ class Commentaire(models.Model):
     visible = models.BooleanField(default=True)
     modéré = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_publication', '-id'], name='commentaire_date_id_idx'),
+            models.Index(
+                fields=['livre', '-date_publication'], condition=models.Q(visible=True),
+                name='commentaire_visible_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"Commentaire sur {self.livre.titre} par {self.utilisateur.username}"
 
 class Evaluation(models.Model):
     utilisateur = models.ForeignKey(UserAccount, on_delete=models.CASCADE, related_name='evaluations')
     livre = models.ForeignKey(Livre, on_delete=models.CASCADE, related_name='evaluations')
-    note = models.IntegerField()
+    note = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     commentaire = models.TextField(null=True, blank=True)
     date_évaluation = models.DateTimeField(auto_now_add=True)
     recommandé = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=['-date_évaluation', '-id'], name='evaluation_date_id_idx')]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.memoriser_note()
+        return instance
+
+    def memoriser_note(self):
+        # Valeurs enregistrées en base, pour ajuster le résumé du livre lors d'une modification
+        if all(champ in self.__dict__ for champ in ('livre_id', 'note', 'recommandé')):
+            self._note_enregistree = (self.livre_id, self.note, self.recommandé)
+
+    def save(self, *args, **kwargs):
+        # Le résumé des notes du livre est mis à jour par signal dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"Évaluation de {self.livre.titre} par {self.utilisateur.username} - {self.note}/5"
 
+class TermeRecherche(models.Model):
+    """Entrée de l'index inversé portable utilisé quand la base ne fournit pas FTS5."""
+    LONGUEUR_MAX = 64
+
+    terme = models.CharField(max_length=LONGUEUR_MAX)
+    livre = models.ForeignKey(Livre, on_delete=models.CASCADE, related_name='+')
+    poids = models.FloatField()
+
+    class Meta:
+        unique_together = ('terme', 'livre')
+
+    def __str__(self):
+        return f"{self.terme} -> {self.livre_id}"
+
+class VersionRessource(models.Model):
+    """Compteur de version d'une ressource de l'API, incrémenté à chaque écriture qui change sa représentation."""
+    nom = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modifie = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.nom} v{self.version}"
+
+class LivreSimilaire(models.Model):
+    """Voisin d'un livre dans la matrice de co-occurrence emprunts/évaluations (voir recommandations.py).
+
+    Seuls les K meilleurs voisins de chaque livre sont gardés.
+    """
+    livre = models.ForeignKey(Livre, on_delete=models.CASCADE, related_name='+', db_index=False)
+    voisin = models.ForeignKey(Livre, on_delete=models.CASCADE, related_name='+')
+    # Lecteurs communs et similarité cosinus : communs / sqrt(lecteurs(livre) * lecteurs(voisin))
+    communs = models.PositiveIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['livre', 'voisin'], name='livre_similaire_unique')]
+        # Lecture des voisins d'un livre dans l'ordre de l'API, sans tri
+        indexes = [models.Index(fields=['livre', '-score', 'voisin'], name='livre_similaire_score_idx')]
+
+    def __str__(self):
+        return f"{self.livre_id} -> {self.voisin_id} ({self.score:.3f})"
+
+class StatistiqueJour(models.Model):
+    """Événements d'un jour par catégorie et langue, agrégés par `manage.py agreger_statistiques` (voir statistiques.py)."""
+    jour = models.DateField()
+    categorie = models.ForeignKey(Categorie, on_delete=models.CASCADE, related_name='+')
+    langue = models.CharField(max_length=100)
+    emprunts = models.PositiveIntegerField(default=0)
+    retours = models.PositiveIntegerField(default=0)
+    # Emprunts arrivés à échéance ce jour-là sans avoir été rendus à temps
+    retards = models.PositiveIntegerField(default=0)
+    evaluations = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # L'index de la contrainte sert aussi les lectures par période
+        constraints = [models.UniqueConstraint(fields=['jour', 'categorie', 'langue'], name='statistique_jour_unique')]
+
+    def __str__(self):
+        return f"{self.jour} {self.categorie_id} {self.langue}"
+
+class StatistiqueLivreJour(models.Model):
+    """Mêmes compteurs que StatistiqueJour, par livre : classements des livres les plus empruntés."""
+    jour = models.DateField()
+    livre = models.ForeignKey(Livre, on_delete=models.CASCADE, related_name='+')
+    emprunts = models.PositiveIntegerField(default=0)
+    retours = models.PositiveIntegerField(default=0)
+    retards = models.PositiveIntegerField(default=0)
+    evaluations = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['jour', 'livre'], name='statistique_livre_jour_unique')]
+
+    def __str__(self):
+        return f"{self.jour} {self.livre_id}"
+
+class StatistiqueLivreMois(models.Model):
+    """Somme des StatistiqueLivreJour d'un mois (`mois` : son premier jour) : classements sur de longues périodes."""
+    mois = models.DateField()
+    livre = models.ForeignKey(Livre, on_delete=models.CASCADE, related_name='+')
+    emprunts = models.PositiveIntegerField(default=0)
+    retours = models.PositiveIntegerField(default=0)
+    retards = models.PositiveIntegerField(default=0)
+    evaluations = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['mois', 'livre'], name='statistique_livre_mois_unique')]
+
+    def __str__(self):
+        return f"{self.mois:%Y-%m} {self.livre_id}"
+
+class Filigrane(models.Model):
+    """Date jusqu'à laquelle un traitement incrémental a lu les données sources."""
+    nom = models.CharField(max_length=50, primary_key=True)
+    position = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nom} @ {self.position}"
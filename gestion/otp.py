@@ -0,0 +1,44 @@
+import time
+import pyotp
+from django.conf import settings
+from django.core.cache import cache
+from .cache import LRUCache
+
+DEFAULTS = {
+    # Objets TOTP déjà construits, par utilisateur
+    'TOTP_CACHE_SIZE': 4096,
+    'TOTP_CACHE_TTL': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_OTP', {}).get(name, DEFAULTS[name])
+
+
+_totps = LRUCache(get_setting('TOTP_CACHE_SIZE'), get_setting('TOTP_CACHE_TTL'))
+
+
+def get_totp(user):
+    """TOTP de l'utilisateur, ou None s'il n'a pas de secret. Ne fait aucune écriture."""
+    if not user.otp_secret:
+        return None
+    # Le secret fait partie de la clé : un secret renouvelé ne réutilise pas l'ancien objet
+    cle = (user.pk, user.otp_secret)
+    totp = _totps.get(cle)
+    if totp is None:
+        totp = pyotp.TOTP(user.otp_secret)
+        _totps.set(cle, totp)
+    return totp
+
+
+def verify(user, code):
+    """Vérifie un code TOTP et refuse qu'un même code soit rejoué dans sa fenêtre de validité."""
+    totp = get_totp(user)
+    if totp is None or not code:
+        return False
+    instant = time.time()
+    if not totp.verify(str(code), for_time=instant):
+        return False
+    # cache.add est atomique : seul le premier usage d'un couple (utilisateur, pas de temps) réussit
+    pas = int(instant // totp.interval)
+    return cache.add(f'gestion:otp:{user.pk}:{pas}', True, totp.interval * 2)
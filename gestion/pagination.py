@@ -0,0 +1,215 @@
+import base64
+import datetime
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+def encode_value(value):
+    # isoformat() complet : DjangoJSONEncoder tronque les microsecondes, ce qui fausserait la position
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+class KeysetPagination(BasePagination):
+    """Pagination par clé (keyset) : chaque page reprend après la dernière ligne vue.
+
+    L'ordre vient de l'attribut `ordering` de la vue (ou du paramètre `?ordering=`),
+    complété par la clé primaire pour départager les ex aequo. Aucune page ne fait
+    de `COUNT(*)` ni d'`OFFSET` : le coût d'une page ne dépend pas de sa profondeur.
+    `?count=exact` ou `?count=approx` (plafonné à `approximate_count_limit`) ajoutent un total.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    approximate_count_limit = 10000
+    invalid_cursor_message = 'Curseur invalide'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.prepare(queryset, request, view)
+        self.count = self.get_count(queryset, request)
+        return self.finish(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Version async pour les vues servies sous ASGI (`aiterator` gère prefetch_related par paquet)."""
+        page = self.prepare(queryset, request, view)
+        self.count = await self.aget_count(queryset, request)
+        return self.finish([obj async for obj in page.aiterator(chunk_size=self.page_size + 1)])
+
+    def prepare(self, queryset, request, view):
+        """Queryset de la page demandée, avec une ligne de plus pour savoir s'il y a une suite."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.values, self.reverse = self.decode_cursor(request, queryset.model)
+        ordering = [self.flip(field) for field in self.ordering] if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.values is not None:
+            queryset = queryset.filter(self.after(ordering, self.values))
+        return queryset[:self.page_size + 1]
+
+    def finish(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.values is not None
+
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_paginated_data(self, data):
+        response = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            response['count'], response['count_approximate'] = self.count
+        response['results'] = data
+        return response
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_approximate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = getattr(view, 'ordering', None) or ('-pk',)
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        ordering = list(ordering)
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count(), False
+        if mode == 'approx':
+            count = queryset.order_by()[:self.approximate_count_limit + 1].count()
+            return min(count, self.approximate_count_limit), count > self.approximate_count_limit
+        return None
+
+    async def aget_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return await queryset.acount(), False
+        if mode == 'approx':
+            count = await queryset.order_by()[:self.approximate_count_limit + 1].acount()
+            return min(count, self.approximate_count_limit), count > self.approximate_count_limit
+        return None
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, values):
+        """Condition "(a, b, ...) vient après (va, vb, ...)" dans l'ordre donné."""
+        condition = Q()
+        egalites = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**egalites, **{f'{name}__{lookup}': value})
+            egalites[name] = value
+        # Borne redondante sur la première colonne : permet à la base de sauter
+        # directement à la position dans l'index au lieu de le parcourir depuis le début
+        first = ordering[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]}) & condition
+
+    def position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    @staticmethod
+    def make_cursor(values, reverse):
+        payload = json.dumps({'v': values, 'r': reverse}, default=encode_value, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def encode_cursor(self, values, reverse):
+        return replace_query_param(self.base_url, self.cursor_query_param, self.make_cursor(values, reverse))
+
+    @staticmethod
+    def get_field(model, name):
+        """Champ désigné par un terme d'ordre (`pk`, `champ`, `relation__champ`), None pour une annotation."""
+        field = None
+        for part in name.split('__'):
+            if field is not None:
+                if not field.is_relation:
+                    return None
+                model = field.related_model
+            try:
+                field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None
+        return field
+
+    def decode_cursor(self, request, model=None):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if model is not None:
+            # Un curseur bien formé peut porter des valeurs fausses : converties ici, avant les filtres
+            fields = [self.get_field(model, field.lstrip('-')) for field in self.ordering]
+            try:
+                values = [value if field is None else field.to_python(value) for field, value in zip(fields, values)]
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.last is None:
+            # Page vide obtenue en revenant en arrière : on repart du début
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position(self.last), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.position(self.first), True)
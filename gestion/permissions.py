@@ -1,14 +1,29 @@
 from rest_framework import permissions
 from rest_framework.permissions import BasePermission, SAFE_METHODS
+from django.contrib.auth import get_user_model
+from .roles import aget_roles, get_roles
 
 class IsAdmin(BasePermission):
-    
+    """Rôle admin lu dans le jeton, puis revérifié en base : compte actif et rôle toujours attribué."""
+
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.groups.filter(name='admin').exists()
+        if not request.user.is_authenticated or 'admin' not in get_roles(request):
+            return False
+        verifie = getattr(request, '_gestion_admin', None)
+        if verifie is None:
+            verifie = request._gestion_admin = get_user_model().objects.filter(
+                pk=request.user.pk, is_active=True, groups__name='admin',
+            ).exists()
+        return verifie
 
 class IsLecteur(permissions.BasePermission):
 
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
-            return request.user.groups.filter(name='lecteur').exists()
-        return False
\ No newline at end of file
+            return 'lecteur' in get_roles(request)
+        return False
+
+    async def ahas_permission(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return 'lecteur' in await aget_roles(request)
+        return False
@@ -0,0 +1,98 @@
+import datetime
+import sqlite3
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Emprunt, Exemplaire, Livre
+from . import versions
+
+DUREE_PAR_DEFAUT = datetime.timedelta(days=14)
+
+
+class PretImpossible(Exception):
+    pass
+
+
+def reserver_exemplaire(livre_id):
+    """Passe un exemplaire disponible du livre à indisponible et renvoie sa clé, ou None.
+
+    À appeler dans une transaction. Les exemplaires déjà verrouillés par une autre transaction
+    sont sautés (SKIP LOCKED) ; sur SQLite, qui n'a pas de verrou de ligne, la réservation est un
+    UPDATE conditionnel unique : c'est la première écriture de la transaction, qui prend donc
+    immédiatement le verrou d'écriture de la base, et `disponibilité = true` est revérifié.
+    UPDATE … RETURNING demande SQLite 3.35 ; avant, ou sur une autre base sans SKIP LOCKED,
+    voir _reserver_conditionnel.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        exemplaire_id = (
+            Exemplaire.objects.select_for_update(skip_locked=True)
+            .filter(livre_id=livre_id, disponibilité=True)
+            .order_by('pk').values_list('pk', flat=True).first()
+        )
+        if exemplaire_id is not None:
+            Exemplaire.objects.filter(pk=exemplaire_id).update(disponibilité=False)
+        return exemplaire_id
+    if connection.vendor != 'sqlite' or sqlite3.sqlite_version_info < (3, 35):
+        return _reserver_conditionnel(livre_id)
+
+    qn = connection.ops.quote_name
+    table = qn(Exemplaire._meta.db_table)
+    pk = qn(Exemplaire._meta.pk.column)
+    livre = qn(Exemplaire._meta.get_field('livre').column)
+    disponible = qn(Exemplaire._meta.get_field('disponibilité').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {disponible} = %s WHERE {disponible} = %s AND {pk} = '
+            f'(SELECT {pk} FROM {table} WHERE {livre} = %s AND {disponible} = %s ORDER BY {pk} LIMIT 1) '
+            f'RETURNING {pk}',
+            [False, True, livre_id, True],
+        )
+        ligne = cursor.fetchone()
+    return ligne[0] if ligne else None
+
+
+def _reserver_conditionnel(livre_id):
+    """Réservation sans RETURNING : lecture d'un exemplaire disponible, puis UPDATE conditionnel.
+
+    Un exemplaire pris entre les deux par une autre transaction n'est pas modifié (0 ligne) :
+    on passe au suivant.
+    """
+    essayes = []
+    candidats = Exemplaire.objects.filter(livre_id=livre_id, disponibilité=True).order_by('pk')
+    while (exemplaire_id := candidats.exclude(pk__in=essayes).values_list('pk', flat=True).first()) is not None:
+        if Exemplaire.objects.filter(pk=exemplaire_id, disponibilité=True).update(disponibilité=False):
+            return exemplaire_id
+        essayes.append(exemplaire_id)
+    return None
+
+
+def emprunter(livre_id, utilisateur, duree=DUREE_PAR_DEFAUT):
+    """Prête un exemplaire disponible du livre : réservation et création de l'emprunt dans une même transaction."""
+    with transaction.atomic():
+        exemplaire_id = reserver_exemplaire(livre_id)
+        if exemplaire_id is None:
+            if not Livre.objects.filter(pk=livre_id).exists():
+                raise Livre.DoesNotExist()
+            raise PretImpossible('Aucun exemplaire disponible')
+        # Les signaux d'Emprunt recalculent les compteurs du livre
+        return Emprunt.objects.create(
+            exemplaire_id=exemplaire_id, utilisateur=utilisateur,
+            date_retour_prévue=timezone.now() + duree, statut='En cours',
+        )
+
+
+def rendre(emprunt_id):
+    """Clôt l'emprunt et rend l'exemplaire disponible ; un emprunt déjà rendu est refusé."""
+    with transaction.atomic():
+        maintenant = timezone.now()
+        if not Emprunt.objects.filter(pk=emprunt_id, date_retour_effective__isnull=True).update(
+            date_retour_effective=maintenant, statut='Terminé',
+        ):
+            if not Emprunt.objects.filter(pk=emprunt_id).exists():
+                raise Emprunt.DoesNotExist()
+            raise PretImpossible('Emprunt déjà rendu')
+        emprunt = Emprunt.objects.select_related('exemplaire').get(pk=emprunt_id)
+        Exemplaire.objects.filter(pk=emprunt.exemplaire_id).update(disponibilité=True)
+        # update() n'envoie pas de signaux
+        Livre.objects.filter(pk=emprunt.exemplaire.livre_id).mettre_a_jour_compteurs()
+        versions.incrementer('livre')
+        return emprunt
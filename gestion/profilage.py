@@ -0,0 +1,289 @@
+import bisect
+import contextvars
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ACTIF': True,
+    # Bornes (secondes) des histogrammes de durée
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'BUCKETS_REQUETES': (1, 2, 5, 10, 20, 50, 100),
+    # Fraction des requêtes exécutées sous cProfile ; seules les lentes sont conservées
+    'ECHANTILLON': 0.0,
+    'SEUIL_LENT': 0.5,
+    'PROFILS': 20,
+    'FONCTIONS': 25,
+    # Dossier où écrire les profils conservés (.prof, lisibles par pstats / snakeviz) ; None pour la mémoire seule
+    'DOSSIER': None,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_PROFILAGE', {}).get(name, DEFAULTS[name])
+
+
+class Mesures:
+    """Temps et requêtes SQL d'une requête HTTP."""
+
+    def __init__(self):
+        self.sql = 0.0
+        self.requetes = Counter()
+        self.chronos = Counter()
+        self.profondeur = Counter()
+
+    @property
+    def nombre_requetes(self):
+        return sum(self.requetes.values())
+
+    @property
+    def dupliquees(self):
+        """Requêtes exécutées à l'identique (mêmes SQL et paramètres) plus d'une fois."""
+        return self.nombre_requetes - len(self.requetes)
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper des connexions : chaque requête est chronométrée et comptée
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - debut
+            self.requetes[sql, repr(params)] += 1
+
+
+_mesures = contextvars.ContextVar('gestion_profilage', default=None)
+
+
+def executer(execute, sql, params, many, context):
+    """execute_wrapper posé une fois pour toutes sur chaque connexion (signal connection_created).
+
+    Les mesures de la requête HTTP en cours sont lues dans la variable de contexte, que asgiref
+    transmet aux threads de sync_to_async : sous ASGI, les requêtes SQL partent de ces threads,
+    sur leurs propres connexions.
+    """
+    mesures = _mesures.get()
+    if mesures is None:
+        return execute(sql, params, many, context)
+    return mesures(execute, sql, params, many, context)
+
+
+def installer(connection):
+    if executer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(executer)
+
+
+@contextmanager
+def chrono(nom):
+    """Ajoute la durée du bloc au compteur `nom` de la requête en cours ; les appels imbriqués ne comptent qu'une fois."""
+    mesures = _mesures.get()
+    if mesures is None or mesures.profondeur[nom]:
+        yield
+        return
+    mesures.profondeur[nom] += 1
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        mesures.chronos[nom] += time.perf_counter() - debut
+        mesures.profondeur[nom] -= 1
+
+
+class Histogramme:
+
+    def __init__(self, nom, aide, buckets):
+        self.nom = nom
+        self.aide = aide
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observer(self, etiquettes, valeur):
+        serie = self.series.get(etiquettes)
+        if serie is None:
+            # Un compteur par borne, puis +Inf, somme
+            serie = self.series[etiquettes] = [0] * (len(self.buckets) + 1) + [0.0]
+        serie[bisect.bisect_left(self.buckets, valeur)] += 1
+        serie[-1] += valeur
+
+    def exposer(self):
+        lignes = [f'# HELP {self.nom} {self.aide}', f'# TYPE {self.nom} histogram']
+        for etiquettes, serie in sorted(self.series.items()):
+            base = ','.join(f'{cle}="{_echapper(valeur)}"' for cle, valeur in etiquettes)
+            cumul = 0
+            for borne, n in zip((*self.buckets, '+Inf'), serie):
+                cumul += n
+                lignes.append(f'{self.nom}_bucket{{{base},le="{borne}"}} {cumul}')
+            lignes.append(f'{self.nom}_sum{{{base}}} {serie[-1]}')
+            lignes.append(f'{self.nom}_count{{{base}}} {cumul}')
+        return lignes
+
+
+class Compteur:
+
+    def __init__(self, nom, aide):
+        self.nom = nom
+        self.aide = aide
+        self.series = Counter()
+
+    def incrementer(self, etiquettes, valeur=1):
+        self.series[etiquettes] += valeur
+
+    def exposer(self):
+        lignes = [f'# HELP {self.nom} {self.aide}', f'# TYPE {self.nom} counter']
+        for etiquettes, valeur in sorted(self.series.items()):
+            base = ','.join(f'{cle}="{_echapper(v)}"' for cle, v in etiquettes)
+            lignes.append(f'{self.nom}{{{base}}} {valeur}')
+        return lignes
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registre:
+    """Métriques agrégées du processus, par vue et méthode HTTP.
+
+    Chaque worker a son propre registre : Prometheus doit interroger chaque processus, ou
+    additionner les séries côté serveur.
+    """
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        buckets = get_setting('BUCKETS')
+        self.duree = Histogramme('gestion_requete_duree_secondes', 'Durée totale de la requête', buckets)
+        self.sql = Histogramme('gestion_requete_sql_secondes', 'Temps passé dans les requêtes SQL', buckets)
+        self.serialisation = Histogramme('gestion_requete_serialisation_secondes', 'Temps passé dans les serializers', buckets)
+        self.rendu = Histogramme('gestion_requete_rendu_secondes', 'Temps passé dans le rendu JSON', buckets)
+        self.requetes = Histogramme(
+            'gestion_requete_sql_nombre', 'Nombre de requêtes SQL par requête HTTP', get_setting('BUCKETS_REQUETES'),
+        )
+        self.dupliquees = Compteur('gestion_requete_sql_dupliquees_total', 'Requêtes SQL exécutées plusieurs fois à l\'identique')
+        self.reponses = Compteur('gestion_reponses_total', 'Réponses par statut HTTP')
+        self.profils = deque(maxlen=get_setting('PROFILS'))
+
+    def enregistrer(self, vue, methode, statut, duree, mesures):
+        etiquettes = (('vue', vue), ('methode', methode))
+        with self.verrou:
+            self.duree.observer(etiquettes, duree)
+            self.sql.observer(etiquettes, mesures.sql)
+            self.serialisation.observer(etiquettes, mesures.chronos['serialisation'])
+            self.rendu.observer(etiquettes, mesures.chronos['rendu'])
+            self.requetes.observer(etiquettes, mesures.nombre_requetes)
+            if mesures.dupliquees:
+                self.dupliquees.incrementer(etiquettes, mesures.dupliquees)
+            self.reponses.incrementer((*etiquettes, ('statut', statut)))
+
+    def exposer(self):
+        with self.verrou:
+            lignes = []
+            for metrique in (self.duree, self.sql, self.serialisation, self.rendu, self.requetes, self.dupliquees, self.reponses):
+                lignes += metrique.exposer()
+        return '\n'.join(lignes) + '\n'
+
+
+registre = Registre()
+
+
+def conserver_profil(profil, vue, methode, chemin, duree):
+    stats = pstats.Stats(profil, stream=io.StringIO())
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    fonctions = []
+    for (fichier, ligne, nom) in stats.fcn_list[:get_setting('FONCTIONS')]:
+        appels, primitifs, propre, cumule, _ = stats.stats[fichier, ligne, nom]
+        fonctions.append({
+            'fonction': f'{fichier}:{ligne}({nom})', 'appels': appels,
+            'propre_ms': round(propre * 1000, 3), 'cumule_ms': round(cumule * 1000, 3),
+        })
+    entree = {
+        'vue': vue, 'methode': methode, 'chemin': chemin, 'duree_ms': round(duree * 1000, 1),
+        'date': timezone.now().isoformat(), 'fonctions': fonctions,
+    }
+    dossier = get_setting('DOSSIER')
+    if dossier:
+        os.makedirs(dossier, exist_ok=True)
+        entree['fichier'] = os.path.join(dossier, f"{timezone.now():%Y%m%dT%H%M%S%f}-{vue}.prof")
+        stats.dump_stats(entree['fichier'])
+    with registre.verrou:
+        registre.profils.append(entree)
+    logger.info('Requête lente profilée : %s %s (%s ms)', methode, chemin, entree['duree_ms'], extra={'profil': entree})
+
+
+class ProfilageMiddleware:
+    """Mesure chaque requête : durée totale, temps et nombre de requêtes SQL, requêtes dupliquées,
+    temps de sérialisation (`chrono('serialisation')`) et de rendu (`chrono('rendu')`).
+
+    Une fraction GESTION_PROFILAGE['ECHANTILLON'] des requêtes passe sous cProfile ; le profil
+    n'est conservé que si la requête dépasse SEUIL_LENT. Sous ASGI, le middleware reste async
+    (pas de passage par un thread) mais ne profile pas : cProfile suivrait la boucle d'événements,
+    où s'entremêlent les requêtes concurrentes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @contextmanager
+    def mesurer(self):
+        # Les requêtes SQL sont comptées par `executer`, installé sur chaque connexion
+        mesures = Mesures()
+        jeton = _mesures.set(mesures)
+        try:
+            yield mesures
+        finally:
+            _mesures.reset(jeton)
+
+    def enregistrer(self, request, response, duree, mesures, profil=None):
+        match = getattr(request, 'resolver_match', None)
+        vue = (match.view_name if match else None) or 'non-resolue'
+        registre.enregistrer(vue, request.method, response.status_code, duree, mesures)
+        if profil is not None and duree >= get_setting('SEUIL_LENT'):
+            conserver_profil(profil, vue, request.method, request.path, duree)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not get_setting('ACTIF'):
+            return self.get_response(request)
+
+        echantillon = get_setting('ECHANTILLON')
+        profil = cProfile.Profile() if echantillon and random.random() < echantillon else None
+        debut = time.perf_counter()
+        with self.mesurer() as mesures:
+            if profil is not None:
+                try:
+                    profil.enable()
+                except ValueError:
+                    # Un autre profileur est déjà actif sur ce thread
+                    profil = None
+            try:
+                response = self.get_response(request)
+            finally:
+                if profil is not None:
+                    profil.disable()
+        self.enregistrer(request, response, time.perf_counter() - debut, mesures, profil)
+        return response
+
+    async def __acall__(self, request):
+        if not get_setting('ACTIF'):
+            return await self.get_response(request)
+
+        debut = time.perf_counter()
+        with self.mesurer() as mesures:
+            response = await self.get_response(request)
+        self.enregistrer(request, response, time.perf_counter() - debut, mesures)
+        return response
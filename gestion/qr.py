@@ -0,0 +1,106 @@
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULTS = {
+    # Format par défaut : 'png' ou 'svg' (vectoriel, mais plus volumineux pour un QR code)
+    'FORMAT': 'png',
+    # 'thread' ou 'process' ; qrcode est en pur Python, seul un pool de processus rend en parallèle
+    'EXECUTOR': 'thread',
+    'WORKERS': 2,
+    # Rendus en attente au-delà desquels on ne pré-calcule plus : l'image sera rendue à la demande
+    'MAX_PENDING': 64,
+    # Durée de vie (secondes) d'un QR code non récupéré
+    'TTL': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_QR', {}).get(name, DEFAULTS[name])
+
+
+def render_png(uri):
+    buffer = BytesIO()
+    qrcode.make(uri).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_svg(uri):
+    buffer = BytesIO()
+    qrcode.make(uri, image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'png': (render_png, 'image/png'),
+    'svg': (render_svg, 'image/svg+xml'),
+}
+
+
+def render(uri, format):
+    return RENDERERS[format][0](uri)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(get_setting('MAX_PENDING'))
+_futures = {}
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            pool = ProcessPoolExecutor if get_setting('EXECUTOR') == 'process' else ThreadPoolExecutor
+            _executor = pool(max_workers=get_setting('WORKERS'))
+        return _executor
+
+
+def _cache_key(cle):
+    return f'gestion:qr:{cle}'
+
+
+def _image_key(cle):
+    return f'gestion:qr:{cle}:image'
+
+
+def _terminer(cle, future):
+    _pending.release()
+    _futures.pop(cle, None)
+    # Image rangée à part, sans jamais réécrire l'entrée : un rendu qui finit après la récupération
+    # ne peut pas rendre la clé à nouveau valable (au pire, une image orpheline expire après TTL)
+    if future.exception() is None and cache.get(_cache_key(cle)) is not None:
+        cache.add(_image_key(cle), future.result(), get_setting('TTL'))
+
+
+def planifier(uri, format=None):
+    """Enregistre un QR code à rendre et lance son rendu en arrière-plan ; renvoie sa clé.
+
+    Si le pool est saturé, rien n'est lancé : l'image sera rendue lors de sa récupération.
+    """
+    format = format or get_setting('FORMAT')
+    cle = secrets.token_urlsafe(32)
+    cache.set(_cache_key(cle), {'uri': uri, 'format': format}, get_setting('TTL'))
+    if _pending.acquire(blocking=False):
+        future = get_executor().submit(render, uri, format)
+        _futures[cle] = future
+        future.add_done_callback(lambda f: _terminer(cle, f))
+    return cle
+
+
+def recuperer(cle, timeout=10):
+    """(contenu, content type) du QR code, ou None. Une clé ne sert qu'une fois : l'image contient le secret OTP."""
+    entree = cache.get(_cache_key(cle))
+    if entree is None:
+        return None
+    image = cache.get(_image_key(cle))
+    if image is None:
+        future = _futures.get(cle)
+        image = future.result(timeout) if future is not None else render(entree['uri'], entree['format'])
+    cache.delete_many([_cache_key(cle), _image_key(cle)])
+    return image, RENDERERS[entree['format']][1]
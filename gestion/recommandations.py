@@ -0,0 +1,240 @@
+import heapq
+import logging
+import math
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations, groupby
+from operator import itemgetter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import RowNumber
+from django.db.models.expressions import Window
+from .models import Emprunt, Evaluation, Exemplaire, LivreSimilaire
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Voisins gardés par livre
+    'K': 20,
+    # Note à partir de laquelle une évaluation compte comme une lecture appréciée
+    'NOTE_MIN': 3,
+    # Lecteurs communs en dessous desquels deux livres ne sont pas rapprochés : un seul lecteur
+    # commun à deux livres peu lus donne sinon une similarité maximale
+    'COMMUNS_MIN': 2,
+    # Un historique plus long (compte de service, bibliothécaire) n'apporte que du bruit et
+    # des paires en nombre quadratique : il est ignoré
+    'MAX_HISTORIQUE': 200,
+    # Mise à jour des voisins à chaque nouvel emprunt ; sinon, seulement par la commande
+    'INCREMENTAL': True,
+    # Threads appliquant ces mises à jour ; 0 pour les faire dans la requête. Un seul thread
+    # les applique dans l'ordre, sans écritures concurrentes sur les mêmes lignes.
+    'WORKERS': 1,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_RECOMMANDATIONS', {}).get(name, DEFAULTS[name])
+
+
+def interactions(utilisateur_id=None, livres=None, distinctes=True):
+    """Paires (lecteur, ouvrage) : emprunts, et évaluations d'au moins NOTE_MIN.
+
+    Sans `distinctes`, une paire apparaît autant de fois qu'elle a d'emprunts et d'évaluations.
+    """
+    emprunts = Emprunt.objects.annotate(lecteur=F('utilisateur_id'), ouvrage=F('exemplaire__livre_id'))
+    evaluations = Evaluation.objects.filter(note__gte=get_setting('NOTE_MIN')).annotate(
+        lecteur=F('utilisateur_id'), ouvrage=F('livre_id'),
+    )
+    if utilisateur_id is not None:
+        emprunts = emprunts.filter(utilisateur_id=utilisateur_id)
+        evaluations = evaluations.filter(utilisateur_id=utilisateur_id)
+    if livres is not None:
+        emprunts = emprunts.filter(exemplaire__livre_id__in=livres)
+        evaluations = evaluations.filter(livre_id__in=livres)
+    return emprunts.values_list('lecteur', 'ouvrage').union(
+        evaluations.values_list('lecteur', 'ouvrage'), all=not distinctes,
+    )
+
+
+def _retenir(tas, k, entree):
+    if len(tas) < k:
+        heapq.heappush(tas, entree)
+    elif entree > tas[0]:
+        heapq.heapreplace(tas, entree)
+
+
+def calculer(k=None):
+    """Voisins de chaque livre : {livre: [(score, communs, voisin)]}, du plus proche au plus lointain.
+
+    Les interactions sont lues en flux, groupées par lecteur ; la matrice de co-occurrence
+    creuse est un Counter de paires (livre, voisin), alimenté par combinations() — boucles en C.
+    """
+    k = k or get_setting('K')
+    maximum = get_setting('MAX_HISTORIQUE')
+    lecteurs = Counter()
+    communs = Counter()
+    flux = interactions().order_by('lecteur').iterator(chunk_size=10_000)
+    for _, paires in groupby(flux, key=itemgetter(0)):
+        livres = sorted(ouvrage for _, ouvrage in paires)
+        if len(livres) > maximum:
+            continue
+        lecteurs.update(livres)
+        communs.update(combinations(livres, 2))
+
+    minimum = get_setting('COMMUNS_MIN')
+    # Tas bornés à K par livre : la mémoire ne dépend que du nombre de livres
+    tas = defaultdict(list)
+    for (a, b), n in communs.items():
+        if n < minimum:
+            continue
+        score = n / math.sqrt(lecteurs[a] * lecteurs[b])
+        # À score égal, le plus petit identifiant d'abord : l'ordre de l'API et de tronquer()
+        _retenir(tas[a], k, (score, -b, n))
+        _retenir(tas[b], k, (score, -a, n))
+    return {
+        livre: [(score, n, -voisin) for score, voisin, n in sorted(entrees, reverse=True)]
+        for livre, entrees in tas.items()
+    }
+
+
+def construire(k=None, batch_size=5000):
+    """Recalcule toute la table LivreSimilaire ; renvoie le nombre de lignes écrites."""
+    voisins = calculer(k)
+    lignes = (
+        LivreSimilaire(livre_id=livre, voisin_id=voisin, communs=n, score=score)
+        for livre, entrees in voisins.items() for score, n, voisin in entrees
+    )
+    total = 0
+    with transaction.atomic():
+        LivreSimilaire.objects.all().delete()
+        while paquet := [ligne for _, ligne in zip(range(batch_size), lignes)]:
+            LivreSimilaire.objects.bulk_create(paquet)
+            total += len(paquet)
+        versions.incrementer('livre')
+    return total
+
+
+def ajouter(utilisateur_id, livre_id):
+    """Met à jour les voisins après la première interaction d'un lecteur avec un livre.
+
+    Seules les paires formées avec l'historique du lecteur sont recalculées (deux requêtes de
+    lecture, une écriture groupée) ; les autres voisins du livre gardent leur score jusqu'à la
+    prochaine reconstruction, qui corrige aussi ce qui a pu être écrit pendant qu'elle tournait.
+    """
+    historique = Counter(ouvrage for _, ouvrage in interactions(utilisateur_id, distinctes=False))
+    if historique[livre_id] != 1 or len(historique) > get_setting('MAX_HISTORIQUE'):
+        # Livre déjà lu (ou interaction déjà supprimée) : la matrice n'a pas changé
+        return 0
+
+    # Par livre de l'historique : lecteurs, et lecteurs qui ont aussi lu `livre_id`
+    sql, params = interactions(livres=list(historique)).query.sql_with_params()
+    sql_livre, params_livre = interactions(livres=[livre_id]).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT i.ouvrage, COUNT(*), SUM(CASE WHEN i.lecteur IN (SELECT j.lecteur FROM ({sql_livre}) j) '
+            f'THEN 1 ELSE 0 END) FROM ({sql}) i GROUP BY i.ouvrage',
+            (*params_livre, *params),
+        )
+        comptes = {ouvrage: (lecteurs, communs) for ouvrage, lecteurs, communs in cursor.fetchall()}
+
+    minimum = get_setting('COMMUNS_MIN')
+    lecteurs_livre = comptes.get(livre_id, (0,))[0]
+    lignes = []
+    for voisin, (lecteurs, communs) in comptes.items():
+        if voisin == livre_id or communs < minimum:
+            continue
+        score = communs / math.sqrt(lecteurs_livre * lecteurs)
+        lignes += [
+            LivreSimilaire(livre_id=livre_id, voisin_id=voisin, communs=communs, score=score),
+            LivreSimilaire(livre_id=voisin, voisin_id=livre_id, communs=communs, score=score),
+        ]
+    if not lignes:
+        return 0
+    with transaction.atomic():
+        LivreSimilaire.objects.bulk_create(
+            lignes, update_conflicts=True, unique_fields=['livre', 'voisin'], update_fields=['communs', 'score'],
+        )
+        tronquer({ligne.livre_id for ligne in lignes})
+        versions.incrementer('livre')
+    return len(lignes)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_setting('WORKERS'), thread_name_prefix='gestion-recommandations')
+        return _executor
+
+
+def _ajouter_en_tache(utilisateur_id, livre_id, exemplaire_id):
+    try:
+        if livre_id is None:
+            livre_id = Exemplaire.objects.values_list('livre_id', flat=True).get(pk=exemplaire_id)
+        ajouter(utilisateur_id, livre_id)
+    except Exception:
+        logger.exception('Échec de la mise à jour des recommandations (utilisateur %s)', utilisateur_id)
+    finally:
+        if get_setting('WORKERS'):
+            # Le thread du pool garde sinon sa propre connexion ouverte
+            connection.close()
+
+
+def planifier(utilisateur_id, livre_id=None, exemplaire_id=None):
+    """Lance ajouter() après la validation de la transaction en cours, en arrière-plan (ou tout de
+    suite si WORKERS vaut 0) : compter les lecteurs des livres populaires de l'historique coûte
+    plus que l'emprunt lui-même.
+
+    Un échec est journalisé sans faire échouer l'emprunt ; la commande `construire_recommandations`
+    rattrape les mises à jour perdues.
+    """
+    if not get_setting('INCREMENTAL'):
+        return
+    if get_setting('WORKERS'):
+        transaction.on_commit(lambda: get_executor().submit(_ajouter_en_tache, utilisateur_id, livre_id, exemplaire_id))
+    else:
+        transaction.on_commit(lambda: _ajouter_en_tache(utilisateur_id, livre_id, exemplaire_id))
+
+
+def tronquer(livres, k=None):
+    """Ne garde que les K meilleurs voisins des livres donnés."""
+    rang = Window(RowNumber(), partition_by=[F('livre_id')], order_by=[F('score').desc(), F('voisin_id').asc()])
+    en_trop = list(
+        LivreSimilaire.objects.filter(livre_id__in=livres).annotate(rang=rang)
+        .filter(rang__gt=k or get_setting('K')).values_list('pk', flat=True)
+    )
+    if en_trop:
+        LivreSimilaire.objects.filter(pk__in=en_trop).delete()
+
+
+def similaires(livre_id, limite):
+    """Voisins d'un livre, lus dans l'index (livre, -score, voisin) en une requête."""
+    return list(
+        LivreSimilaire.objects.filter(livre_id=livre_id).order_by('-score', 'voisin_id')
+        .values_list('voisin_id', 'voisin__titre', 'voisin__note_moyenne', 'voisin__exemplaires_disponibles',
+                     'communs', 'score')[:limite]
+    )
+
+
+def pour_utilisateur(utilisateur_id, limite):
+    """Livres proches de l'historique d'un lecteur, qu'il n'a pas encore lus, en une requête.
+
+    Le score d'un livre est la somme de ses similarités avec les livres de l'historique.
+    """
+    emprunts = Emprunt.objects.filter(utilisateur_id=utilisateur_id).values('exemplaire__livre_id')
+    evaluations = Evaluation.objects.filter(
+        utilisateur_id=utilisateur_id, note__gte=get_setting('NOTE_MIN'),
+    ).values('livre_id')
+    lus = Q(voisin_id__in=emprunts) | Q(voisin_id__in=evaluations)
+    return list(
+        LivreSimilaire.objects.filter(Q(livre_id__in=emprunts) | Q(livre_id__in=evaluations)).exclude(lus)
+        .values_list('voisin_id', 'voisin__titre', 'voisin__note_moyenne', 'voisin__exemplaires_disponibles')
+        .annotate(total=Sum('score')).order_by('-total', 'voisin_id')[:limite]
+    )
@@ -0,0 +1,64 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+from . import profilage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class CSVRenderer(BaseRenderer):
+    """Déclare le format `csv` auprès de la négociation de contenu ; les exports produisent eux-mêmes leur flux."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer de DRF, sérialisé par orjson quand il est installé.
+
+    La sortie est identique à celle du rendu standard : UTF-8 sans échappement des accents,
+    datetimes UTC en `Z`, Decimal et chaînes paresseuses convertis par l'encodeur de DRF,
+    U+2028/U+2029 échappés. Sans orjson, ou dans les cas qu'il ne couvre pas (indentation
+    autre que compacte, UNICODE_JSON/COMPACT_JSON désactivés, NaN non strict, entiers hors
+    64 bits), le rendu retombe sur `json` de la bibliothèque standard.
+    """
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+    default = staticmethod(encoders.JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with profilage.chrono('rendu'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+class PrometheusRenderer(BaseRenderer):
+    """Format texte d'exposition de Prometheus ; les erreurs (401, 403) restent rendues en JSON."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return FastJSONRenderer().render(data)
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import Emprunt
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Intervalle (secondes) du balayage périodique dans le processus web ; None pour le désactiver
+    'INTERVAL': None,
+    'BATCH_SIZE': 1000,
+    # Pause (secondes) entre deux lots, pour laisser passer les autres écritures sur SQLite
+    'PAUSE': 0,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_RETARDS', {}).get(name, DEFAULTS[name])
+
+
+def emprunts_a_marquer(maintenant):
+    # Servi par emprunt_statut_echeance_idx : les emprunts déjà en retard ne sont pas reparcourus
+    return Emprunt.objects.filter(
+        statut='En cours', date_retour_effective__isnull=True, date_retour_prévue__lt=maintenant,
+    )
+
+
+def marquer_retards(maintenant=None, batch_size=None, pause=None):
+    """Passe en 'En retard' les emprunts 'En cours' dont l'échéance est dépassée, par lots.
+
+    Chaque lot est un seul UPDATE, validé aussitôt : le verrou d'écriture SQLite n'est tenu que
+    le temps d'un lot. La condition `statut='En cours'` est réévaluée par l'UPDATE, donc deux
+    balayages simultanés ne marquent jamais deux fois la même ligne. Renvoie les métriques du passage.
+    """
+    maintenant = maintenant or timezone.now()
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    pause = get_setting('PAUSE') if pause is None else pause
+    debut = time.perf_counter()
+    marques = lots = 0
+
+    while True:
+        lot = emprunts_a_marquer(maintenant).order_by('date_retour_prévue').values('pk')[:batch_size]
+        # Le statut est revérifié ligne par ligne : un balayage concurrent a pu passer avant
+        n = Emprunt.objects.filter(pk__in=lot, statut='En cours').update(statut='En retard')
+        if not n:
+            break
+        marques += n
+        lots += 1
+        if pause:
+            time.sleep(pause)
+
+    metriques = {
+        'marques': marques,
+        'lots': lots,
+        'duree_ms': round((time.perf_counter() - debut) * 1000, 1),
+        'echeance': maintenant.isoformat(),
+    }
+    logger.info('Balayage des retards : %(marques)d emprunts marqués en %(lots)d lots (%(duree_ms)s ms)',
+                metriques, extra={'retards': metriques})
+    return metriques
+
+
+class Planificateur(threading.Thread):
+    """Thread démon qui relance `marquer_retards` toutes les `interval` secondes."""
+
+    def __init__(self, interval):
+        super().__init__(name='gestion-retards', daemon=True)
+        self.interval = interval
+        self.arret = threading.Event()
+
+    def run(self):
+        while not self.arret.wait(self.interval):
+            try:
+                marquer_retards()
+            except Exception:
+                logger.exception('Échec du balayage des retards')
+            finally:
+                # Le thread garde sa propre connexion : on la ferme entre deux passages
+                connection.close()
+
+    def arreter(self):
+        self.arret.set()
+
+
+_planificateur = None
+
+
+def demarrer():
+    """Démarre le balayage périodique si GESTION_RETARDS['INTERVAL'] est défini (appelé par wsgi.py / asgi.py)."""
+    global _planificateur
+    interval = get_setting('INTERVAL')
+    if interval and _planificateur is None:
+        _planificateur = Planificateur(interval)
+        _planificateur.start()
+    return _planificateur
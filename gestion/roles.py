@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from .cache import LRUCache
+
+DEFAULTS = {
+    # Cache LRU local au processus : nombre d'utilisateurs et durée de vie en secondes
+    'LOCAL_CACHE_SIZE': 1024,
+    'LOCAL_CACHE_TTL': 60,
+    # Alias d'un cache Django partagé entre workers (None pour le désactiver)
+    'SHARED_CACHE': None,
+    'SHARED_CACHE_TTL': 300,
+    # Ajoute les rôles dans les jetons JWT émis, pour autoriser sans requête SQL
+    'TOKEN_CLAIM': True,
+}
+
+TOKEN_CLAIM = 'roles'
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_ROLES', {}).get(name, DEFAULTS[name])
+
+
+_local = LRUCache(get_setting('LOCAL_CACHE_SIZE'), get_setting('LOCAL_CACHE_TTL'))
+
+
+def _shared_cache():
+    alias = get_setting('SHARED_CACHE')
+    return caches[alias] if alias else None
+
+
+def _cache_key(user_id):
+    return f'gestion:roles:{user_id}'
+
+
+def get_roles_for_user(user):
+    """Rôles (noms de groupes) d'un utilisateur : cache local, puis cache partagé, puis base."""
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    roles = _local.get(user.pk)
+    if roles is not None:
+        return roles
+
+    shared = _shared_cache()
+    if shared is not None:
+        cached = shared.get(_cache_key(user.pk))
+        if cached is not None:
+            roles = frozenset(cached)
+            _local.set(user.pk, roles)
+            return roles
+
+    # Par identifiant : un UtilisateurJeton n'a pas à charger son UserAccount pour cela
+    roles = frozenset(Group.objects.filter(user=user.pk).values_list('name', flat=True))
+    _local.set(user.pk, roles)
+    if shared is not None:
+        shared.set(_cache_key(user.pk), list(roles), get_setting('SHARED_CACHE_TTL'))
+    return roles
+
+
+async def aget_roles_for_user(user):
+    """Version async de `get_roles_for_user`, pour les vues servies nativement sous ASGI."""
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    roles = _local.get(user.pk)
+    if roles is not None:
+        return roles
+
+    shared = _shared_cache()
+    if shared is not None:
+        cached = await shared.aget(_cache_key(user.pk))
+        if cached is not None:
+            roles = frozenset(cached)
+            _local.set(user.pk, roles)
+            return roles
+
+    roles = frozenset([name async for name in Group.objects.filter(user=user.pk).values_list('name', flat=True)])
+    _local.set(user.pk, roles)
+    if shared is not None:
+        await shared.aset(_cache_key(user.pk), list(roles), get_setting('SHARED_CACHE_TTL'))
+    return roles
+
+
+def _roles_du_jeton(request):
+    token = getattr(request, 'auth', None)
+    claim = token.get(TOKEN_CLAIM) if hasattr(token, 'payload') else None
+    return frozenset(claim) if claim is not None else None
+
+
+def get_roles(request):
+    """Rôles de l'utilisateur de la requête, résolus une seule fois par requête.
+
+    Si le jeton d'accès porte la revendication `roles`, aucune requête n'est faite.
+    """
+    roles = getattr(request, '_gestion_roles', None)
+    if roles is not None:
+        return roles
+
+    if not request.user or not request.user.is_authenticated:
+        roles = frozenset()
+    else:
+        roles = _roles_du_jeton(request)
+        if roles is None:
+            roles = get_roles_for_user(request.user)
+
+    request._gestion_roles = roles
+    return roles
+
+
+async def aget_roles(request):
+    roles = getattr(request, '_gestion_roles', None)
+    if roles is not None:
+        return roles
+
+    if not request.user or not request.user.is_authenticated:
+        roles = frozenset()
+    else:
+        roles = _roles_du_jeton(request)
+        if roles is None:
+            roles = await aget_roles_for_user(request.user)
+
+    request._gestion_roles = roles
+    return roles
+
+
+def invalidate(user_ids):
+    shared = _shared_cache()
+    for user_id in user_ids:
+        _local.delete(user_id)
+        if shared is not None:
+            shared.delete(_cache_key(user_id))
+
+
+def add_roles_claim(token, user):
+    """Rôles actuels dans un jeton d'accès, à son émission.
+
+    Jamais dans le jeton de rafraîchissement : chaque rotation les recopierait tels quels.
+    """
+    if get_setting('TOKEN_CLAIM'):
+        token[TOKEN_CLAIM] = sorted(get_roles_for_user(user))
+    return token
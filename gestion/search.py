@@ -0,0 +1,147 @@
+import re
+import unicodedata
+from collections import Counter
+from django.db import connection
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+from .models import Livre, TermeRecherche
+
+FTS_TABLE = 'gestion_livre_fts'
+
+# Poids de chaque champ dans le classement : un mot du titre compte plus qu'un mot de la biographie
+POIDS = {
+    'titre': 10.0,
+    'resume': 2.0,
+    'auteurs': 5.0,
+    'biographies': 1.0,
+    'editeur': 3.0,
+}
+
+MOT = re.compile(r'\w+')
+
+
+def normaliser(texte):
+    """Découpe un texte en mots en minuscules et sans accents ("Misérables" -> ["miserables"])."""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return MOT.findall(texte.lower())
+
+
+def document(livre):
+    """Texte indexé pour un livre ; `auteurs` et `editeur` doivent être préchargés."""
+    auteurs = list(livre.auteurs.all())
+    return {
+        'titre': livre.titre,
+        'resume': livre.résumé,
+        'auteurs': ' '.join(auteur.nom for auteur in auteurs),
+        'biographies': ' '.join(auteur.biographie for auteur in auteurs),
+        'editeur': livre.editeur.nom if livre.editeur else '',
+    }
+
+
+def livres_a_indexer(ids=None):
+    queryset = Livre.objects.select_related('editeur').prefetch_related('auteurs').order_by('pk')
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    return queryset
+
+
+class Fts5Index:
+    """Index plein texte SQLite FTS5, classé par BM25."""
+
+    def indexer(self, livres):
+        lignes = [(livre.pk, *document(livre).values()) for livre in livres]
+        if not lignes:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(ligne[0],) for ligne in lignes])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(POIDS)}) VALUES (%s, %s, %s, %s, %s, %s)', lignes
+            )
+
+    def supprimer(self, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in ids])
+
+    def vider(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def rechercher(self, requete, limite):
+        mots = normaliser(requete)
+        if not mots:
+            return []
+        # Chaque mot est une recherche par préfixe, les mots sont combinés en ET
+        expression = ' '.join(f'"{mot}"*' for mot in mots)
+        bm25 = f'bm25({FTS_TABLE}, {", ".join(str(poids) for poids in POIDS.values())})'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, {bm25} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY {bm25} LIMIT %s',
+                [expression, limite],
+            )
+            # bm25() renvoie des scores négatifs : plus petit = plus pertinent
+            return [(pk, -score) for pk, score in cursor.fetchall()]
+
+
+class InvertedIndex:
+    """Index inversé portable stocké dans TermeRecherche, pour les bases sans FTS5."""
+
+    def indexer(self, livres):
+        livres = list(livres)
+        if not livres:
+            return
+        termes = []
+        for livre in livres:
+            poids = Counter()
+            for champ, texte in document(livre).items():
+                for mot in normaliser(texte):
+                    poids[mot[:TermeRecherche.LONGUEUR_MAX]] += POIDS[champ]
+            termes.extend(TermeRecherche(terme=mot, livre=livre, poids=p) for mot, p in poids.items())
+        self.supprimer([livre.pk for livre in livres])
+        TermeRecherche.objects.bulk_create(termes, batch_size=1000)
+
+    def supprimer(self, ids):
+        TermeRecherche.objects.filter(livre__in=ids).delete()
+
+    def vider(self):
+        TermeRecherche.objects.all().delete()
+
+    def rechercher(self, requete, limite):
+        mots = [mot[:TermeRecherche.LONGUEUR_MAX] for mot in normaliser(requete)]
+        if not mots:
+            return []
+        correspondances = {
+            f'mot_{i}': Max(Case(When(terme__startswith=mot, then=1), default=0, output_field=IntegerField()))
+            for i, mot in enumerate(mots)
+        }
+        prefixes = Q()
+        for mot in mots:
+            prefixes |= Q(terme__startswith=mot)
+        resultats = (
+            TermeRecherche.objects
+            .filter(prefixes)
+            .values('livre')
+            .annotate(score=Sum('poids'), **correspondances)
+            .filter(**{nom: 1 for nom in correspondances})
+            .order_by('-score', 'livre')
+            .values_list('livre', 'score')[:limite]
+        )
+        return list(resultats)
+
+
+def get_index():
+    # La table FTS5 n'est créée par la migration que sur SQLite
+    return Fts5Index() if connection.vendor == 'sqlite' else InvertedIndex()
+
+
+def reindexer(ids):
+    index = get_index()
+    livres = list(livres_a_indexer(ids))
+    index.indexer(livres)
+    trouves = {livre.pk for livre in livres}
+    manquants = [pk for pk in ids if pk not in trouves]
+    if manquants:
+        index.supprimer(manquants)
+
+
+def rechercher(requete, limite=20):
+    return get_index().rechercher(requete, limite)
@@ -1,14 +1,21 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Auteur, Livre, Categorie, Exemplaire, Emprunt, Commentaire, Evaluation, Editeur, UserAccount
 from django.contrib.auth.password_validation import validate_password
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.validators import UniqueValidator, ValidationError
 import re
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 import pyotp
 from django.contrib.auth import authenticate
 import datetime
 import jwt
 from django.conf import settings
+from django.core.files.storage import default_storage
+from . import images, profilage
+from .authentication import ajouter_revendications
+from .liste_noire import RefreshToken
 
 def generate_tmp_token(user):
     payload = {
@@ -32,6 +39,31 @@ class TokenObtainPairSerializer(TokenObtainPairSerializer):
         else:
             raise serializers.ValidationError('Invalid credentials')
 
+class TokenRefreshSerializer(TokenRefreshSerializer):
+    """Relit le compte à chaque rafraîchissement : un compte désactivé n'obtient plus de jeton
+    d'accès, et celui émis porte les rôles actuels (cache de roles.get_roles_for_user)."""
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = UserAccount.objects.only('id', 'username', 'is_active').filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        data = {'access': str(ajouter_revendications(refresh.access_token, user))}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
 class SignupSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(
         required=True,
@@ -81,22 +113,113 @@ class SignupSerializer(serializers.ModelSerializer):
         user.save()
         return user, otp_secret
 
-class AuteurSerializer(serializers.ModelSerializer):
+def liste_de_champs(valeur):
+    return [champ.strip() for champ in (valeur or '').split(',') if champ.strip()]
+
+class SparseFieldsMixin:
+    """Sélection des champs rendus, en lecture uniquement.
+
+    `?fields=a,b` ne garde que ces champs, `?exclude=c` en retire ; sans `?fields=`, le contexte
+    `summary` (actions de liste) réduit la représentation à `Meta.summary_fields` quand il existe.
+    Les champs inconnus sont ignorés.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        demandes = liste_de_champs(request.query_params.get('fields'))
+        resume = getattr(self.Meta, 'summary_fields', None) if self.context.get('summary') else None
+        exclus = set(liste_de_champs(request.query_params.get('exclude')))
+        gardes = set(demandes or resume or self.fields) - exclus
+        for nom in list(self.fields):
+            if nom not in gardes:
+                self.fields.pop(nom)
+
+    def to_representation(self, instance):
+        with profilage.chrono('serialisation'):
+            return super().to_representation(instance)
+
+def restreindre_queryset(queryset, serializer, toujours=()):
+    """Ne charge que les colonnes lues par `serializer` (`.only()`), plus `toujours` (ordre de pagination).
+
+    Les select_related / prefetch_related des relations qui ne sont plus rendues sont retirés.
+    """
+    model = queryset.model
+    sources = set()
+    for field in serializer.fields.values():
+        if field.source == '*':
+            return queryset
+        sources.add(field.source.split('.')[0])
+    concrets = {field.name for field in model._meta.concrete_fields}
+    colonnes = {model._meta.pk.name} | {nom for nom in sources | set(toujours) if nom in concrets}
+
+    if isinstance(queryset.query.select_related, dict):
+        def chemins(arbre, prefixe=''):
+            for nom, sous_arbre in arbre.items():
+                yield from chemins(sous_arbre, f'{prefixe}{nom}__') if sous_arbre else [f'{prefixe}{nom}']
+        gardes = [chemin for chemin in chemins(queryset.query.select_related) if chemin.split('__')[0] in colonnes]
+        queryset = queryset.select_related(None)
+        if gardes:
+            queryset = queryset.select_related(*gardes)
+    prefetch = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if getattr(lookup, 'prefetch_through', lookup).split('__')[0] in sources
+    ]
+    return queryset.prefetch_related(None).prefetch_related(*prefetch).only(*colonnes)
+
+class VignettesField(serializers.Field):
+    """URLs des vignettes d'une image, `{format: {largeur: url}}`, construites depuis l'empreinte
+    mémorisée sans accès au stockage ; None tant qu'elles n'ont pas été générées."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, valeur):
+        if not valeur:
+            return None
+        request = self.context.get('request')
+        absolue = request.build_absolute_uri if request is not None else str
+        return {
+            format: {str(largeur): absolue(default_storage.url(nom)) for largeur, nom in chemins.items()}
+            for format, chemins in images.chemins(valeur).items()
+        }
+
+class BatchListSerializer(serializers.ListSerializer):
+    """ListSerializer pour les écritures groupées : `instance` est un dict {pk: objet} et chaque
+    élément est validé contre son propre objet (mises à jour) ou sans objet (créations)."""
+
+    def run_child_validation(self, data):
+        self.child.instance = self.instance.get(data.get('id')) if self.instance and isinstance(data, dict) else None
+        self.child.initial_data = data
+        return super().run_child_validation(data)
+
+class AuteurSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    photo_vignettes = VignettesField(source='photo_empreinte')
+
     class Meta:
         model = Auteur
-        fields = '__all__'
+        exclude = ('photo_empreinte',)
+        summary_fields = ('id', 'nom', 'date_de_naissance', 'date_de_décès', 'nationalité', 'photo_vignettes')
+
+class LivreSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    couverture_vignettes = VignettesField(source='couverture_empreinte')
 
-class LivreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Livre
-        fields = '__all__'
+        exclude = ('couverture_empreinte',)
+        summary_fields = ('id', 'titre', 'date_de_publication', 'langue', 'format', 'auteurs', 'categorie', 'editeur',
+                          'exemplaires_disponibles', 'note_moyenne', 'nombre_evaluations', 'couverture_vignettes')
 
-class CategorieSerializer(serializers.ModelSerializer):
+class CategorieSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Categorie
         fields = '__all__'
+        summary_fields = ('id', 'nom', 'slug')
 
-class CommentaireSerializer(serializers.ModelSerializer):
+class CommentaireSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     utilisateur = serializers.StringRelatedField()
     livre = serializers.StringRelatedField()
 
@@ -104,28 +227,38 @@ class CommentaireSerializer(serializers.ModelSerializer):
         model = Commentaire
         fields = '__all__'
 
-class EvaluationSerializer(serializers.ModelSerializer):
+class EvaluationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     utilisateur = serializers.StringRelatedField()
     livre = serializers.StringRelatedField()
 
     class Meta:
         model = Evaluation
         fields = '__all__'
+        summary_fields = ('id', 'livre', 'utilisateur', 'note', 'recommandé', 'date_évaluation')
+
+class EditeurSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    logo_vignettes = VignettesField(source='logo_empreinte')
 
-class EditeurSerializer(serializers.ModelSerializer):
     class Meta:
         model = Editeur
-        fields = '__all__'
+        exclude = ('logo_empreinte',)
+        summary_fields = ('id', 'nom', 'site_web', 'logo_vignettes')
 
-class ExemplaireSerializer(serializers.ModelSerializer):
+class ExemplaireSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Exemplaire
         fields = '__all__'
 
-class EmpruntSerializer(serializers.ModelSerializer):
+class EmpruntSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     utilisateur = serializers.StringRelatedField()
     exemplaire = serializers.StringRelatedField()
 
     class Meta:
         model = Emprunt
         fields = '__all__'
+        summary_fields = ('id', 'exemplaire', 'utilisateur', 'date_emprunt', 'date_retour_prévue', 'date_retour_effective', 'statut')
+
+class EmpruntCheckoutSerializer(serializers.Serializer):
+    livre = serializers.IntegerField()
+    utilisateur = serializers.PrimaryKeyRelatedField(queryset=UserAccount.objects.all(), required=False)
+    duree_jours = serializers.IntegerField(min_value=1, max_value=365, default=14)
@@ -0,0 +1,173 @@
+from django.db import transaction
+from django.contrib.auth.models import Group
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+from .models import Livre, Exemplaire, Emprunt, Evaluation, Auteur, Categorie, Editeur, UserAccount
+from . import images, profilage, recommandations, roles, search, sqlite, versions
+
+@receiver(connection_created)
+def configurer_connexion(sender, connection, **kwargs):
+    sqlite.configurer(connection)
+    profilage.installer(connection)
+
+@receiver(post_save, sender=Exemplaire)
+@receiver(post_delete, sender=Exemplaire)
+def compteurs_exemplaire(sender, instance, **kwargs):
+    livres = {instance.livre_id, getattr(instance, '_livre_enregistre', instance.livre_id)}
+    Livre.objects.filter(pk__in=livres).mettre_a_jour_compteurs()
+    instance.memoriser_livre()
+
+@receiver(post_save, sender=Emprunt)
+@receiver(post_delete, sender=Emprunt)
+def compteurs_emprunt(sender, instance, **kwargs):
+    exemplaires = {instance.exemplaire_id, getattr(instance, '_exemplaire_enregistre', instance.exemplaire_id)}
+    Livre.objects.filter(exemplaires__in=exemplaires).mettre_a_jour_compteurs()
+    instance.memoriser_exemplaire()
+
+@receiver(post_save, sender=Emprunt)
+def recommandations_emprunt(sender, instance, created, **kwargs):
+    if created:
+        recommandations.planifier(instance.utilisateur_id, exemplaire_id=instance.exemplaire_id)
+
+@receiver(post_save, sender=Evaluation)
+def recommandations_evaluation(sender, instance, created, **kwargs):
+    if created and instance.note >= recommandations.get_setting('NOTE_MIN'):
+        recommandations.planifier(instance.utilisateur_id, livre_id=instance.livre_id)
+
+@receiver(post_save, sender=Evaluation)
+def notes_evaluation_enregistree(sender, instance, created, **kwargs):
+    if created:
+        Livre.objects.filter(pk=instance.livre_id).ajuster_notes(instance.note, instance.recommandé, 1)
+    elif hasattr(instance, '_note_enregistree'):
+        livre_id, note, recommande = instance._note_enregistree
+        if (livre_id, note, recommande) != (instance.livre_id, instance.note, instance.recommandé):
+            Livre.objects.filter(pk=livre_id).ajuster_notes(note, recommande, -1)
+            Livre.objects.filter(pk=instance.livre_id).ajuster_notes(instance.note, instance.recommandé, 1)
+    else:
+        # Ancienne valeur inconnue (instance non chargée depuis la base) : recalcul complet
+        Livre.objects.filter(pk=instance.livre_id).mettre_a_jour_notes()
+    instance.memoriser_note()
+
+@receiver(post_delete, sender=Evaluation)
+def notes_evaluation_supprimee(sender, instance, **kwargs):
+    livre_id, note, recommande = getattr(
+        instance, '_note_enregistree', (instance.livre_id, instance.note, instance.recommandé)
+    )
+    Livre.objects.filter(pk=livre_id).ajuster_notes(note, recommande, -1)
+
+@receiver(post_save, sender=Livre)
+def indexer_livre(sender, instance, **kwargs):
+    search.reindexer([instance.pk])
+
+@receiver(post_delete, sender=Livre)
+def desindexer_livre(sender, instance, **kwargs):
+    search.get_index().supprimer([instance.pk])
+
+@receiver(m2m_changed, sender=Livre.auteurs.through)
+def indexer_auteurs_livre(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.reindexer([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        search.reindexer(list(pk_set))
+    elif action == 'pre_clear':
+        # Les liens auront disparu au post_clear : on mémorise les livres concernés
+        instance._livres_a_reindexer = list(instance.livres.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        search.reindexer(getattr(instance, '_livres_a_reindexer', []))
+
+@receiver(post_save, sender=Auteur)
+def indexer_livres_auteur(sender, instance, created, **kwargs):
+    if not created:
+        search.reindexer(list(instance.livres.values_list('pk', flat=True)))
+
+@receiver(post_save, sender=Editeur)
+def indexer_livres_editeur(sender, instance, created, **kwargs):
+    if not created:
+        search.reindexer(list(instance.livres.values_list('pk', flat=True)))
+
+@receiver(pre_delete, sender=Auteur)
+@receiver(pre_delete, sender=Editeur)
+def memoriser_livres(sender, instance, **kwargs):
+    instance._livres_a_reindexer = list(instance.livres.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Auteur)
+@receiver(post_delete, sender=Editeur)
+def reindexer_livres(sender, instance, **kwargs):
+    search.reindexer(getattr(instance, '_livres_a_reindexer', []))
+
+@receiver(m2m_changed, sender=UserAccount.groups.through)
+def invalider_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            roles.invalidate([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        roles.invalidate(pk_set)
+    elif action == 'pre_clear':
+        instance._utilisateurs_a_invalider = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        roles.invalidate(getattr(instance, '_utilisateurs_a_invalider', []))
+
+@receiver(post_save, sender=UserAccount)
+@receiver(post_delete, sender=UserAccount)
+def invalider_roles_utilisateur(sender, instance, **kwargs):
+    # Les identifiants peuvent être réutilisés : un nouvel utilisateur ne doit pas hériter d'une entrée en cache
+    roles.invalidate([instance.pk])
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalider_roles_groupe(sender, instance, created=False, **kwargs):
+    if not created:
+        roles.invalidate(list(instance.user_set.values_list('pk', flat=True)))
+
+# Ressources de l'API dont la représentation change quand un modèle est modifié.
+# Les compteurs et notes de Livre sont maintenus à partir d'Exemplaire, Emprunt et Evaluation.
+VERSIONS = {
+    Auteur: ('auteur',),
+    Categorie: ('categorie',),
+    Editeur: ('editeur',),
+    Livre: ('livre',),
+    Exemplaire: ('livre',),
+    Emprunt: ('livre',),
+    Evaluation: ('livre',),
+}
+
+def incrementer_version(sender, **kwargs):
+    versions.incrementer(*VERSIONS[sender])
+
+for model in VERSIONS:
+    post_save.connect(incrementer_version, sender=model, dispatch_uid=f'version-{model.__name__}')
+    post_delete.connect(incrementer_version, sender=model, dispatch_uid=f'version-{model.__name__}')
+
+@receiver(m2m_changed, sender=Livre.auteurs.through)
+def version_auteurs_livre(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        versions.incrementer('livre')
+
+@receiver(pre_save, sender=Auteur)
+@receiver(pre_save, sender=Editeur)
+@receiver(pre_save, sender=Livre)
+def oublier_vignettes(sender, instance, **kwargs):
+    champ, champ_empreinte = images.IMAGES[sender]
+    fichier = getattr(instance, champ)
+    # Un fichier envoyé n'est écrit dans le stockage qu'après ce signal : _committed est encore faux
+    if not fichier or not fichier._committed:
+        instance._empreinte_effacee = bool(getattr(instance, champ_empreinte)) or bool(fichier)
+        setattr(instance, champ_empreinte, '')
+        instance._image_a_deriver = bool(fichier)
+
+@receiver(post_save, sender=Auteur)
+@receiver(post_save, sender=Editeur)
+@receiver(post_save, sender=Livre)
+def deriver_image(sender, instance, update_fields=None, **kwargs):
+    champ_empreinte = images.IMAGES[sender][1]
+    if getattr(instance, '_empreinte_effacee', False):
+        instance._empreinte_effacee = False
+        if update_fields is not None and champ_empreinte not in update_fields:
+            # Champ non éditable, donc absent des update_fields de Livre.save : écrit à part
+            sender.objects.filter(pk=instance.pk).update(**{champ_empreinte: ''})
+    if getattr(instance, '_image_a_deriver', False):
+        instance._image_a_deriver = False
+        nom = getattr(instance, images.IMAGES[sender][0]).name
+        transaction.on_commit(lambda: images.planifier(sender, instance.pk, nom))
@@ -0,0 +1,49 @@
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA appliqués à chaque nouvelle connexion SQLite, par profil
+PROFILS = {
+    'production': {
+        # Les lecteurs ne bloquent plus l'écrivain, ni l'inverse ; persistant dans le fichier
+        'journal_mode': 'wal',
+        # En WAL, une coupure de courant peut perdre les dernières transactions, jamais corrompre la base
+        'synchronous': 'normal',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        # Négatif : en Kio, par connexion
+        'cache_size': -32 * 1024,
+        'temp_store': 'memory',
+    },
+    # Réglages par défaut de SQLite (journal « delete », synchronous=FULL)
+    'defaut': {},
+}
+
+DEFAULTS = {
+    'PROFIL': 'production',
+    # PRAGMA ajoutés ou remplacés par rapport au profil
+    'PRAGMAS': {},
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_SQLITE', {}).get(name, DEFAULTS[name])
+
+
+def pragmas():
+    return {**PROFILS[get_setting('PROFIL')], **get_setting('PRAGMAS')}
+
+
+def configurer(connection):
+    """Applique les PRAGMA du profil à une connexion qui vient d'être ouverte (signal connection_created)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for nom, valeur in pragmas().items():
+            cursor.execute(f'PRAGMA {nom} = {valeur}')
+            if nom == 'journal_mode':
+                # Refusé en silence pour une base en mémoire : SQLite renvoie le mode effectif
+                mode = cursor.fetchone()[0]
+                if mode != valeur and not connection.is_in_memory_db():
+                    logger.warning('journal_mode=%s refusé par SQLite (mode actuel : %s)', valeur, mode)
@@ -0,0 +1,216 @@
+import datetime
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Emprunt, Evaluation, Filigrane, Livre, StatistiqueJour, StatistiqueLivreJour, StatistiqueLivreMois
+
+DEFAULTS = {
+    # Relu avant le filigrane : une ligne horodatée avant lui peut n'avoir été validée qu'après
+    'MARGE': datetime.timedelta(hours=1),
+    # Période servie par défaut par /api/stats/, en jours
+    'PERIODE': 30,
+}
+
+FILIGRANE = 'statistiques'
+COMPTEURS = ('emprunts', 'retours', 'retards', 'evaluations')
+
+
+def get_setting(name):
+    return getattr(settings, 'GESTION_STATISTIQUES', {}).get(name, DEFAULTS[name])
+
+
+def _sources(debut, fin):
+    """Un queryset par compteur, dans l'ordre de COMPTEURS, des événements datés dans [debut, fin).
+
+    Chaque événement est compté le jour de sa propre date : l'emprunt à la sortie, le retour au
+    retour, le retard à l'échéance (qu'il soit rendu depuis ou non).
+    """
+    def periode(champ):
+        return Q(**{f'{champ}__gte': debut, f'{champ}__lt': fin})
+
+    emprunts = Emprunt.objects.values(
+        ouvrage=F('exemplaire__livre_id'), categorie=F('exemplaire__livre__categorie_id'),
+        langue=F('exemplaire__livre__langue'),
+    )
+    return (
+        (emprunts.filter(periode('date_emprunt')), 'date_emprunt'),
+        (emprunts.filter(periode('date_retour_effective')), 'date_retour_effective'),
+        (emprunts.filter(periode('date_retour_prévue')).filter(
+            Q(date_retour_effective__isnull=True) | Q(date_retour_effective__gt=F('date_retour_prévue'))
+        ), 'date_retour_prévue'),
+        (Evaluation.objects.filter(periode('date_évaluation')).values(
+            ouvrage=F('livre_id'), categorie=F('livre__categorie_id'), langue=F('livre__langue'),
+        ), 'date_évaluation'),
+    )
+
+
+def _sommes():
+    return {compteur: Sum(compteur) for compteur in COMPTEURS}
+
+
+def recalculer(debut, fin):
+    """Remplace les agrégats des jours de [debut, fin) et ceux de leur mois.
+
+    `debut` est un début de jour et `fin` au plus le début du mois suivant.
+
+    Renvoie le nombre de lignes StatistiqueLivreJour écrites.
+    """
+    livres = defaultdict(lambda: [0] * len(COMPTEURS))
+    lignes = defaultdict(lambda: [0] * len(COMPTEURS))
+    for i, (queryset, champ) in enumerate(_sources(debut, fin)):
+        # GROUP BY jour et livre en SQL : seuls les totaux remontent
+        groupes = queryset.annotate(jour=TruncDate(champ)).annotate(n=Count('pk')).values_list(
+            'jour', 'ouvrage', 'categorie', 'langue', 'n',
+        ).order_by()
+        for jour, livre, categorie, langue, n in groupes.iterator():
+            livres[jour, livre][i] += n
+            lignes[jour, categorie, langue][i] += n
+
+    # `fin` est un début de jour, ou l'instant présent : son jour est alors en cours, donc recalculé
+    jours = (timezone.localdate(debut), timezone.localdate(fin - datetime.timedelta(microseconds=1)))
+    StatistiqueLivreJour.objects.filter(jour__range=jours).delete()
+    StatistiqueJour.objects.filter(jour__range=jours).delete()
+    StatistiqueLivreJour.objects.bulk_create(
+        (StatistiqueLivreJour(jour=jour, livre_id=livre, **dict(zip(COMPTEURS, compteurs)))
+         for (jour, livre), compteurs in livres.items()),
+        batch_size=5000,
+    )
+    StatistiqueJour.objects.bulk_create(
+        (StatistiqueJour(jour=jour, categorie_id=categorie, langue=langue, **dict(zip(COMPTEURS, compteurs)))
+         for (jour, categorie, langue), compteurs in lignes.items()),
+        batch_size=5000,
+    )
+
+    # La tranche tient dans un mois : son total est celui de la tranche, plus les jours qui la
+    # précèdent dans le mois (déjà agrégés) lors d'un passage incrémental
+    mois = jours[0].replace(day=1)
+    totaux = defaultdict(lambda: [0] * len(COMPTEURS))
+    for (_, livre), compteurs in livres.items():
+        totaux[livre] = [a + b for a, b in zip(totaux[livre], compteurs)]
+    if jours[0] > mois:
+        precedents = (
+            StatistiqueLivreJour.objects.filter(jour__gte=mois, jour__lt=jours[0])
+            .values_list('livre_id').annotate(**_sommes()).order_by()
+        )
+        for livre, *compteurs in precedents.iterator():
+            totaux[livre] = [a + b for a, b in zip(totaux[livre], compteurs)]
+    StatistiqueLivreMois.objects.filter(mois=mois).delete()
+    StatistiqueLivreMois.objects.bulk_create(
+        (StatistiqueLivreMois(mois=mois, livre_id=livre, **dict(zip(COMPTEURS, compteurs)))
+         for livre, compteurs in totaux.items()),
+        batch_size=5000,
+    )
+    return len(livres)
+
+
+def mois_suivant(jour):
+    return (jour.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def debut_du_jour(jour):
+    """Minuit (heure locale) d'une date, ou du jour d'un instant."""
+    if isinstance(jour, datetime.datetime):
+        jour = timezone.localdate(jour)
+    return timezone.make_aware(datetime.datetime.combine(jour, datetime.time()))
+
+
+def filigrane():
+    return Filigrane.objects.filter(nom=FILIGRANE).values_list('position', flat=True).first()
+
+
+def premier_evenement():
+    dates = [
+        Emprunt.objects.aggregate(d=Min('date_emprunt'))['d'],
+        Evaluation.objects.aggregate(d=Min('date_évaluation'))['d'],
+    ]
+    dates = [date for date in dates if date is not None]
+    return min(dates) if dates else None
+
+
+def agreger(jusqua=None):
+    """Met à jour les agrégats avec les événements survenus depuis le filigrane.
+
+    Les jours depuis celui du filigrane (moins MARGE) sont recalculés entièrement, un mois
+    calendaire par transaction : une exécution interrompue reprend au dernier mois validé.
+    Renvoie le nombre de lignes StatistiqueLivreJour écrites.
+    """
+    fin = jusqua or timezone.now()
+    position = filigrane()
+    depart = position - get_setting('MARGE') if position else premier_evenement()
+    total = 0
+    if depart is not None:
+        debut = debut_du_jour(depart)
+        while debut < fin:
+            suivant = min(debut_du_jour(mois_suivant(timezone.localdate(debut))), fin)
+            with transaction.atomic():
+                total += recalculer(debut, suivant)
+                Filigrane.objects.update_or_create(nom=FILIGRANE, defaults={'position': suivant})
+            debut = suivant
+    else:
+        Filigrane.objects.update_or_create(nom=FILIGRANE, defaults={'position': fin})
+    return total
+
+
+def _totaux(queryset, groupes, ordre, limite=None, **expressions):
+    """Sommes des compteurs de `queryset` par `groupes` (et `expressions`, comme values())."""
+    lignes = queryset.values(*groupes, **expressions).annotate(
+        # Préfixe : un alias ne peut pas porter le nom d'un champ du modèle
+        **{f'total_{compteur}': Sum(compteur) for compteur in COMPTEURS}
+    ).order_by(*ordre)
+    if limite is not None:
+        lignes = lignes[:limite]
+    return [{cle.removeprefix('total_'): valeur for cle, valeur in ligne.items()} for ligne in lignes]
+
+
+def par_jour(debut, fin, categorie=None, langue=None):
+    queryset = StatistiqueJour.objects.filter(jour__range=(debut, fin))
+    if categorie is not None:
+        queryset = queryset.filter(categorie_id=categorie)
+    if langue is not None:
+        queryset = queryset.filter(langue=langue)
+    return _totaux(queryset, ['jour'], ['jour'])
+
+
+def par_categorie(debut, fin):
+    return _totaux(
+        StatistiqueJour.objects.filter(jour__range=(debut, fin)), ['categorie_id'], ['-total_emprunts', 'categorie_id'],
+        nom=F('categorie__nom'),
+    )
+
+
+def par_langue(debut, fin):
+    return _totaux(StatistiqueJour.objects.filter(jour__range=(debut, fin)), ['langue'], ['-total_emprunts', 'langue'])
+
+
+def par_livre(debut, fin, tri='emprunts', limite=10):
+    """Livres les plus concernés sur [debut, fin] : mois entiers lus dans StatistiqueLivreMois, jours des bords dans StatistiqueLivreJour."""
+    premier = debut if debut.day == 1 else mois_suivant(debut)
+    # Premier jour du mois qui suit le dernier mois entier de la période
+    dernier = (fin + datetime.timedelta(days=1)).replace(day=1)
+    if premier >= dernier:
+        premier = dernier = fin + datetime.timedelta(days=1)
+    # Alias explicites : la requête englobante désigne les colonnes de l'UNION par leur nom
+    colonnes = {'ouvrage': F('livre_id'), **{f'total_{compteur}': F(compteur) for compteur in COMPTEURS}}
+    parties = StatistiqueLivreMois.objects.filter(mois__gte=premier, mois__lt=dernier).annotate(**colonnes).values_list(*colonnes).union(
+        StatistiqueLivreJour.objects.filter(
+            Q(jour__gte=debut, jour__lt=premier) | Q(jour__gte=dernier, jour__lte=fin)
+        ).annotate(**colonnes).values_list(*colonnes),
+        all=True,
+    )
+    sql, params = parties.query.sql_with_params()
+    sommes = ', '.join(f'SUM(total_{compteur})' for compteur in COMPTEURS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT ouvrage, {sommes} FROM ({sql}) parties GROUP BY ouvrage '
+            f'ORDER BY SUM(total_{tri}) DESC, ouvrage LIMIT %s',
+            (*params, limite),
+        )
+        lignes = cursor.fetchall()
+    titres = dict(Livre.objects.filter(pk__in=[ligne[0] for ligne in lignes]).values_list('pk', 'titre'))
+    return [
+        {'livre_id': livre, 'titre': titres.get(livre), **dict(zip(COMPTEURS, compteurs))}
+        for livre, *compteurs in lignes
+    ]
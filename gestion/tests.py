@@ -1,3 +1,1399 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import json
+import tempfile
+from collections import Counter
+from concurrent.futures import Future
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+import pyotp
+
+from . import images, liste_noire, otp, prets, profilage, qr, recommandations, roles, search, statistiques
+from .authentication import UtilisateurJeton, ajouter_revendications, utilisateur_reel
+from .liste_noire import RefreshToken
+from .importation import ImportCatalogue
+from .pagination import KeysetPagination
+from .serializers import generate_tmp_token
+from .models import Auteur, Livre, Categorie, Exemplaire, Emprunt, Commentaire, Evaluation, Editeur, LivreSimilaire, StatistiqueJour, UserAccount, VersionRessource
+
+
+def creer_catalogue(nombre, prefixe='livre'):
+    """Crée `nombre` livres avec un exemplaire, un emprunt, un commentaire et une évaluation chacun."""
+    categorie, _ = Categorie.objects.get_or_create(slug='roman', defaults={'nom': 'Roman', 'description': ''})
+    editeur, _ = Editeur.objects.get_or_create(
+        nom='Hetzel',
+        defaults={'adresse': '', 'site_web': 'https://hetzel.fr', 'email_contact': 'contact@hetzel.fr', 'description': ''},
+    )
+    for i in range(nombre):
+        auteur = Auteur.objects.create(
+            nom=f'Auteur {prefixe} {i}', biographie='', date_de_naissance=datetime.date(1802, 2, 26), nationalité='Française'
+        )
+        utilisateur = UserAccount.objects.create(username=f'{prefixe}-lecteur-{i}', email=f'{prefixe}{i}@example.com')
+        livre = Livre.objects.create(
+            titre=f'{prefixe} {i}', résumé='', date_de_publication=datetime.date(1862, 1, 1), isbn=f'{prefixe[:3]}{i:010d}',
+            nombre_de_pages=100, langue='fr', format='Broché', categorie=categorie, editeur=editeur,
+        )
+        livre.auteurs.add(auteur)
+        exemplaire = Exemplaire.objects.create(
+            livre=livre, état='Bon', date_acquisition=datetime.date(2020, 1, 1), localisation='A1'
+        )
+        Emprunt.objects.create(
+            exemplaire=exemplaire, utilisateur=utilisateur,
+            date_retour_prévue=timezone.now() + datetime.timedelta(days=14), statut='En cours',
+        )
+        Commentaire.objects.create(utilisateur=utilisateur, livre=livre, contenu='Superbe')
+        Evaluation.objects.create(utilisateur=utilisateur, livre=livre, note=5)
+
+
+class ListQueryCountTests(TestCase):
+    """Le nombre de requêtes SQL d'une liste ne doit pas dépendre du nombre de lignes renvoyées."""
+
+    endpoints = [
+        '/api/auteurs/',
+        '/api/livres/',
+        '/api/categories/',
+        '/api/exemplaires/',
+        '/api/emprunts/',
+        '/api/commentaires/',
+        '/api/evaluations/',
+        '/api/editeurs/',
+    ]
+
+    def setUp(self):
+        self.user = UserAccount.objects.create(username='bibliothecaire', email='biblio@example.com')
+        self.user.groups.add(Group.objects.create(name='lecteur'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def compter_requetes(self, url, page_size):
+        cache.clear()
+        roles.invalidate([self.user.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'page_size': page_size})
+        self.assertEqual(response.status_code, 200, url)
+        return len(ctx.captured_queries)
+
+    def test_nombre_de_requetes_constant(self):
+        creer_catalogue(2, prefixe='petit')
+        petites = {url: self.compter_requetes(url, 2) for url in self.endpoints}
+
+        creer_catalogue(10, prefixe='grand')
+        for url in self.endpoints:
+            with self.subTest(url=url):
+                self.assertEqual(self.compter_requetes(url, 10), petites[url])
+
+
+class CompteursLivreTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(1)
+        self.livre = Livre.objects.get()
+        self.utilisateur = UserAccount.objects.get(username='livre-lecteur-0')
+
+    def ajouter_exemplaire(self, disponible=True):
+        return Exemplaire.objects.create(
+            livre=self.livre, état='Neuf', date_acquisition=datetime.date(2024, 1, 1),
+            localisation='B2', disponibilité=disponible,
+        )
+
+    def assertCompteurs(self, total, disponibles, en_cours):
+        self.livre.refresh_from_db()
+        self.assertEqual(
+            (self.livre.nombre_exemplaires, self.livre.exemplaires_disponibles, self.livre.emprunts_en_cours),
+            (total, disponibles, en_cours),
+        )
+
+    def test_creation_et_suppression(self):
+        self.assertCompteurs(1, 1, 1)
+        exemplaire = self.ajouter_exemplaire(disponible=False)
+        self.assertCompteurs(2, 1, 1)
+        exemplaire.delete()
+        self.assertCompteurs(1, 1, 1)
+
+    def test_retour_emprunt(self):
+        emprunt = Emprunt.objects.get()
+        emprunt.date_retour_effective = timezone.now()
+        emprunt.statut = 'Terminé'
+        emprunt.save()
+        self.assertCompteurs(1, 1, 0)
+
+    def test_deplacement_vers_un_autre_livre(self):
+        creer_catalogue(1, prefixe='autre')
+        autre = Livre.objects.get(titre='autre 0')
+        admin = UserAccount.objects.create(username='admin', email='admin@example.com')
+        admin.groups.add(Group.objects.create(name='admin'))
+        client = APIClient()
+        client.force_authenticate(admin)
+        exemplaire = self.livre.exemplaires.get()
+        cache.clear()
+        response = client.patch(f'/api/exemplaires/{exemplaire.pk}/', {'livre': autre.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertCompteurs(0, 0, 0)
+        autre.refresh_from_db()
+        self.assertEqual((autre.nombre_exemplaires, autre.emprunts_en_cours), (2, 2))
+
+        # Emprunt rattaché à un exemplaire d'un autre livre
+        exemplaire = self.ajouter_exemplaire()
+        emprunt = Emprunt.objects.filter(exemplaire__livre=autre).first()
+        emprunt.exemplaire = exemplaire
+        emprunt.save()
+        self.assertCompteurs(1, 1, 1)
+        autre.refresh_from_db()
+        self.assertEqual((autre.nombre_exemplaires, autre.emprunts_en_cours), (2, 1))
+
+    def test_filtre_available(self):
+        creer_catalogue(1, prefixe='indispo')
+        Exemplaire.objects.filter(livre__titre='indispo 0').update(disponibilité=False)
+        Livre.objects.mettre_a_jour_compteurs()
+
+        user = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+        user.groups.add(Group.objects.create(name='lecteur'))
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/livres/', {'available': 'true'})
+        self.assertEqual([livre['titre'] for livre in response.data['results']], ['livre 0'])
+        self.assertEqual(response.data['results'][0]['exemplaires_disponibles'], 1)
+
+    def test_commande_repare_les_derives(self):
+        Livre.objects.update(nombre_exemplaires=42, exemplaires_disponibles=0, emprunts_en_cours=7)
+        call_command('recalculer_compteurs', batch_size=1, stdout=StringIO())
+        self.assertCompteurs(1, 1, 1)
+
+
+class RechercheTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(2)
+        self.miserables = Livre.objects.get(titre='livre 0')
+        self.miserables.titre = 'Les Misérables'
+        self.miserables.save()
+        self.autre = Livre.objects.get(titre='livre 1')
+        self.autre.résumé = 'Une étude sur les misérables de Paris'
+        self.autre.save()
+
+    def ids(self, requete, index=None):
+        return [pk for pk, _ in (index or search.get_index()).rechercher(requete, 10)]
+
+    def test_prefixe_accents_et_classement(self):
+        self.assertEqual(self.ids('miser'), [self.miserables.pk, self.autre.pk])
+        self.assertEqual(self.ids('MISÉRABLES paris'), [self.autre.pk])
+
+    def test_mise_a_jour_incrementale(self):
+        auteur = self.miserables.auteurs.get()
+        auteur.nom = 'Victor Hugo'
+        auteur.save()
+        self.assertEqual(self.ids('hugo'), [self.miserables.pk])
+
+        self.miserables.auteurs.clear()
+        self.assertEqual(self.ids('hugo'), [])
+
+        self.miserables.delete()
+        self.assertEqual(self.ids('miserables'), [self.autre.pk])
+
+    def test_index_inverse(self):
+        index = search.InvertedIndex()
+        index.indexer(search.livres_a_indexer())
+        self.assertEqual(self.ids('miser', index), [self.miserables.pk, self.autre.pk])
+        self.assertEqual(self.ids('misérables PAR', index), [self.autre.pk])
+
+    def test_commande_et_endpoint(self):
+        call_command('reindexer_recherche', batch_size=1, stdout=StringIO())
+
+        user = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+        user.groups.add(Group.objects.create(name='lecteur'))
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/search/', {'q': 'miserables'})
+        self.assertEqual([livre['titre'] for livre in response.data['results']], ['Les Misérables', 'livre 1'])
+        response = client.get('/api/search/', {'q': 'miserables', 'limit': -1})
+        self.assertEqual([livre['titre'] for livre in response.data['results']], ['Les Misérables'])
+
+
+class RolesTests(TestCase):
+
+    def setUp(self):
+        self.user = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+        self.lecteur = Group.objects.create(name='lecteur')
+        self.client = APIClient()
+
+    def test_roles_mis_en_cache_et_invalides(self):
+        self.assertEqual(roles.get_roles_for_user(self.user), frozenset())
+        self.user.groups.add(self.lecteur)
+        self.assertEqual(roles.get_roles_for_user(self.user), {'lecteur'})
+        with self.assertNumQueries(0):
+            roles.get_roles_for_user(self.user)
+
+        self.lecteur.user_set.clear()
+        self.assertEqual(roles.get_roles_for_user(self.user), frozenset())
+
+    def test_revendication_du_jeton(self):
+        self.user.groups.add(self.lecteur)
+        token = roles.add_roles_claim(RefreshToken.for_user(self.user).access_token, self.user)
+        self.assertEqual(token['roles'], ['lecteur'])
+
+        roles.invalidate([self.user.pk])
+        self.client.force_authenticate(self.user, token=token)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/categories/')
+        self.assertFalse(any('auth_group' in query['sql'] for query in ctx.captured_queries))
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(7)
+        # Dates identiques pour vérifier le départage par la clé primaire
+        Livre.objects.filter(titre__in=['livre 2', 'livre 3', 'livre 4']).update(date_de_publication=datetime.date(1900, 1, 1))
+        user = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+        user.groups.add(Group.objects.create(name='lecteur'))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def parcourir(self, url, cle):
+        pages = []
+        while url:
+            cache.clear()
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item[cle] for item in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_parcours_avant_et_arriere(self):
+        attendu = list(Livre.objects.order_by('-date_de_publication', '-id').values_list('id', flat=True))
+        pages = self.parcourir('/api/livres/?page_size=3', 'id')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), attendu)
+
+        cache.clear()
+        derniere = self.client.get('/api/livres/?page_size=3').data['next']
+        cache.clear()
+        derniere = self.client.get(derniere).data
+        cache.clear()
+        precedente = self.client.get(derniere['previous']).data
+        self.assertEqual([item['id'] for item in precedente['results']], pages[0])
+        self.assertIsNone(precedente['previous'])
+
+    def test_ordering_et_comptage(self):
+        pages = self.parcourir('/api/auteurs/?page_size=2&ordering=-nom', 'nom')
+        self.assertEqual(sum(pages, []), sorted(Auteur.objects.values_list('nom', flat=True), reverse=True))
+
+        response = self.client.get('/api/emprunts/', {'count': 'exact'})
+        self.assertEqual(response.data['count'], 7)
+        self.assertNotIn('count', self.client.get('/api/emprunts/').data)
+
+    def test_curseur_invalide(self):
+        self.assertEqual(self.client.get('/api/livres/', {'cursor': 'pas-un-curseur'}).status_code, 404)
+        for valeurs in (['abc', 'x'], [None, 1], ['1900-01-01', [1]]):
+            curseur = KeysetPagination.make_cursor(valeurs, False)
+            cache.clear()
+            self.assertEqual(self.client.get('/api/livres/', {'cursor': curseur}).status_code, 404)
+
+
+class NotesLivreTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(2)
+        self.livre, self.autre = Livre.objects.order_by('titre')
+        self.utilisateur = UserAccount.objects.get(username='livre-lecteur-0')
+
+    def resume(self, livre):
+        livre.refresh_from_db()
+        return (
+            livre.nombre_evaluations, livre.somme_notes, livre.note_moyenne, livre.nombre_recommandations,
+            [getattr(livre, f'notes_{note}') for note in range(1, 6)],
+        )
+
+    def test_maintenance_incrementale(self):
+        # creer_catalogue a déjà ajouté une note de 5 à chaque livre
+        evaluation = Evaluation.objects.create(utilisateur=self.utilisateur, livre=self.livre, note=2, recommandé=True)
+        self.assertEqual(self.resume(self.livre), (2, 7, 3.5, 1, [0, 1, 0, 0, 1]))
+
+        evaluation = Evaluation.objects.get(pk=evaluation.pk)
+        evaluation.note = 4
+        evaluation.livre = self.autre
+        evaluation.save()
+        self.assertEqual(self.resume(self.livre), (1, 5, 5.0, 0, [0, 0, 0, 0, 1]))
+        self.assertEqual(self.resume(self.autre), (2, 9, 4.5, 1, [0, 0, 0, 1, 1]))
+
+        evaluation.delete()
+        Evaluation.objects.filter(livre=self.livre).delete()
+        self.assertEqual(self.resume(self.livre), (0, 0, 0.0, 0, [0, 0, 0, 0, 0]))
+        self.assertEqual(self.resume(self.autre), (1, 5, 5.0, 0, [0, 0, 0, 0, 1]))
+
+    def test_recalcul_complet_identique(self):
+        Evaluation.objects.create(utilisateur=self.utilisateur, livre=self.livre, note=1)
+        attendu = self.resume(self.livre)
+        Livre.objects.update(nombre_evaluations=0, somme_notes=0, note_moyenne=0, notes_5=0)
+        Livre.objects.mettre_a_jour_notes()
+        self.assertEqual(self.resume(self.livre), attendu)
+
+    def test_top_et_ordering(self):
+        Evaluation.objects.create(utilisateur=self.utilisateur, livre=self.livre, note=1)
+        user = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+        user.groups.add(Group.objects.create(name='lecteur'))
+        client = APIClient()
+        client.force_authenticate(user)
+
+        top = client.get('/api/livres/top/').data
+        self.assertEqual([livre['id'] for livre in top], [self.autre.pk, self.livre.pk])
+        self.assertEqual(top[1]['note_moyenne'], 3.0)
+        self.assertEqual(client.get('/api/livres/top/', {'min_evaluations': 2}).data[0]['id'], self.livre.pk)
+        self.assertEqual(len(client.get('/api/livres/top/', {'limit': -5, 'min_evaluations': -1}).data), 1)
+        self.assertEqual(client.get('/api/livres/top/', {'limit': 'abc'}).status_code, 400)
+
+        cache.clear()
+        response = client.get('/api/livres/', {'ordering': 'note_moyenne'})
+        self.assertEqual([livre['id'] for livre in response.data['results']], [self.livre.pk, self.autre.pk])
+
+    def test_enregistrer_le_livre_n_ecrase_pas_les_compteurs(self):
+        livre = Livre.objects.get(pk=self.livre.pk)
+        Evaluation.objects.create(utilisateur=self.utilisateur, livre=self.livre, note=1)
+        livre.titre = 'Nouveau titre'
+        livre.save()
+        self.assertEqual(self.resume(self.livre)[0], 2)
+
+
+class ImportCatalogueTests(TestCase):
+
+    CSV = (
+        'titre,résumé,date_de_publication,isbn,nombre_de_pages,langue,format,categorie,editeur,auteurs,auteurs_naissance,exemplaires\n'
+        'Les Misérables,Jean Valjean,1862-04-03,9782070409228,1900,fr,Broché,Roman,Hetzel,Victor Hugo,1802-02-26,2\n'
+        'Notre-Dame de Paris,Quasimodo,1831-03-16,9782070413089,900,fr,Relié,Roman,Hetzel,Victor Hugo,,1\n'
+        'Sans date,,pas-une-date,9782070000001,10,fr,Broché,Roman,,,,0\n'
+        'Doublon,,1862-04-03,9782070409228,10,fr,Broché,Roman,,,,0\n'
+        'Inconnu,,1900-01-01,9782070000002,10,fr,Broché,Essai,,Auteur Mystère,,0\n'
+    )
+
+    def test_import_csv(self):
+        importation = ImportCatalogue(batch_size=2).importer(StringIO(self.CSV), 'csv')
+        self.assertEqual((importation.crees, importation.exemplaires), (2, 3))
+        self.assertEqual([erreur['ligne'] for erreur in importation.erreurs], [3, 4, 5])
+
+        hugo = Auteur.objects.get(nom='Victor Hugo')
+        self.assertEqual(hugo.livres.count(), 2)
+        livre = Livre.objects.get(isbn='9782070409228')
+        self.assertEqual((livre.nombre_exemplaires, livre.exemplaires_disponibles, livre.editeur.nom), (2, 2, 'Hetzel'))
+        self.assertEqual([pk for pk, _ in search.rechercher('valjean')], [livre.pk])
+
+    def test_endpoint_jsonl_admin(self):
+        admin = UserAccount.objects.create(username='admin', email='admin@example.com')
+        admin.groups.add(Group.objects.create(name='admin'))
+        client = APIClient()
+        client.force_authenticate(admin)
+        ligne = {
+            'titre': 'Germinal', 'date_de_publication': '1885-03-01', 'isbn': 9782253004226, 'nombre_de_pages': 600,
+            'langue': 'fr', 'format': 'Broché', 'categorie': 'Roman',
+            'auteurs': [{'nom': 'Émile Zola', 'date_de_naissance': '1840-04-02'}],
+        }
+        fichier = SimpleUploadedFile('catalogue.jsonl', (json.dumps(ligne) + '\n{pas du json\n').encode())
+        response = client.post('/api/livres/import/', {'fichier': fichier}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['crees'], 1)
+        self.assertEqual(response.data['erreurs'][0]['ligne'], 2)
+        self.assertTrue(Livre.objects.filter(titre='Germinal', auteurs__nom='Émile Zola').exists())
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(3)
+        user = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+        user.groups.add(Group.objects.create(name='lecteur'))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def lire(self, url, params):
+        cache.clear()
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_csv_filtre(self):
+        Livre.objects.filter(titre='livre 1').update(langue='en')
+        lignes = list(csv.reader(StringIO(self.lire('/api/livres/export/', {'format': 'csv', 'langue': 'fr'}))))
+        self.assertEqual(lignes[0][:3], ['id', 'titre', 'isbn'])
+        self.assertEqual(sorted(ligne[1] for ligne in lignes[1:]), ['livre 0', 'livre 2'])
+
+    def test_export_ndjson(self):
+        lignes = [json.loads(ligne) for ligne in self.lire('/api/emprunts/export/', {'format': 'ndjson'}).splitlines()]
+        self.assertEqual(len(lignes), 3)
+        emprunt = Emprunt.objects.select_related('exemplaire').get(pk=lignes[0]['id'])
+        self.assertEqual(lignes[0]['exemplaire__livre_id'], emprunt.exemplaire.livre_id)
+        self.assertEqual(lignes[0]['date_emprunt'], emprunt.date_emprunt.isoformat())
+        self.assertIsNone(lignes[0]['date_retour_effective'])
+
+    def test_requetes_constantes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.lire('/api/evaluations/export/', {'format': 'csv'})
+        creer_catalogue(20, prefixe='grand')
+        roles.invalidate([UserAccount.objects.get(username='lecteur').pk])
+        with CaptureQueriesContext(connection) as ctx2:
+            contenu = self.lire('/api/evaluations/export/', {'format': 'csv'})
+        self.assertEqual(len(ctx.captured_queries), len(ctx2.captured_queries))
+        self.assertEqual(len(contenu.splitlines()), 24)
+
+
+class OTPTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserAccount.objects.create(username='otp', email='otp@example.com', otp_secret=pyotp.random_base32())
+        self.client = APIClient()
+
+    def verifier(self, code, tmp_token=None):
+        return self.client.post('/api/auth/verify-otp/', {
+            'tmp_token': tmp_token or generate_tmp_token(self.user), 'otp_token': code,
+        })
+
+    def test_code_non_rejouable(self):
+        code = pyotp.TOTP(self.user.otp_secret).now()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.verifier(code)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        # Le nom d'utilisateur des revendications est lu avec le compte, pas par un chargement différé
+        self.assertEqual(sum('FROM "gestion_useraccount"' in query['sql'] for query in ctx.captured_queries), 1)
+        self.assertEqual(self.verifier(code).status_code, 401)
+
+    def test_roles_dans_le_seul_jeton_d_acces(self):
+        self.user.groups.add(Group.objects.create(name='lecteur'))
+        response = self.verifier(pyotp.TOTP(self.user.otp_secret).now())
+        self.assertEqual(AccessToken(response.data['access'])[roles.TOKEN_CLAIM], ['lecteur'])
+        self.assertNotIn(roles.TOKEN_CLAIM, RefreshToken(response.data['refresh']))
+
+    def test_verification_sans_ecriture(self):
+        code = pyotp.TOTP(self.user.otp_secret).now()
+        otp.get_totp(self.user)
+        with self.assertNumQueries(0):
+            self.assertTrue(otp.verify(self.user, code))
+
+    def test_utilisateur_supprime(self):
+        tmp_token = generate_tmp_token(self.user)
+        self.user.delete()
+        self.assertEqual(self.verifier('123456', tmp_token).status_code, 401)
+
+
+class SignupQRCodeTests(TestCase):
+
+    def inscrire(self, **params):
+        cache.clear()
+        mot_de_passe = 'Un-Mot-De-Passe-42!'
+        url = '/api/auth/signup/' + ('?' + '&'.join(f'{k}={v}' for k, v in params.items()) if params else '')
+        return APIClient().post(url, {
+            'username': 'nouveau', 'email': 'nouveau@example.com', 'password': mot_de_passe, 'password2': mot_de_passe,
+        })
+
+    def test_uri_immediate_et_image_a_usage_unique(self):
+        response = self.inscrire(qr_format='svg')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['otp_uri'].startswith('otpauth://totp/'))
+        self.assertNotIn('qr_code', response.data)
+
+        image = self.client.get(response.data['qr_code_url'])
+        self.assertEqual(image.status_code, 200)
+        self.assertEqual(image['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', image.content)
+        self.assertEqual(self.client.get(response.data['qr_code_url']).status_code, 404)
+
+    def test_image_en_ligne(self):
+        response = self.inscrire(qr='inline')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(base64.b64decode(response.data['qr_code']).startswith(b'\x89PNG'))
+
+    def test_format_refuse_avant_creation(self):
+        self.assertEqual(self.inscrire(qr_format='gif').status_code, 400)
+        self.assertFalse(UserAccount.objects.filter(username='nouveau').exists())
+
+    def test_rendu_tardif_apres_recuperation(self):
+        cle = 'tardif'
+        cache.set(qr._cache_key(cle), {'uri': 'otpauth://totp/x?secret=JBSWY3DPEHPK3PXP', 'format': 'png'})
+        self.assertTrue(qr._pending.acquire(blocking=False))
+        rendu = Future()
+        rendu.set_result(b'image')
+        self.assertIsNotNone(qr.recuperer(cle))
+        qr._terminer(cle, rendu)
+        self.assertIsNone(qr.recuperer(cle))
+
+
+class CacheHTTPTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(3)
+        self.user = UserAccount.objects.get(username='livre-lecteur-0')
+        self.user.groups.add(Group.objects.create(name='lecteur'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **headers):
+        cache.clear()
+        return self.client.get(url, headers=headers)
+
+    def test_304_sans_serializer(self):
+        response = self.get('/api/livres/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/livres/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('"gestion_livre"' in query['sql'] for query in ctx.captured_queries))
+
+    def test_page_en_cache(self):
+        premiere = self.get('/api/auteurs/')
+        with CaptureQueriesContext(connection) as ctx:
+            seconde = self.client.get('/api/auteurs/')
+        self.assertEqual(seconde.data, premiere.data)
+        self.assertFalse(any('"gestion_auteur"' in query['sql'] for query in ctx.captured_queries))
+
+    def test_ecritures_changent_la_version(self):
+        etag = self.get('/api/livres/')['ETag']
+        livre = Livre.objects.first()
+        Evaluation.objects.create(utilisateur=self.user, livre=livre, note=1)
+        response = self.client.get('/api/livres/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        livre.auteurs.clear()
+        self.assertNotEqual(self.client.get(f'/api/livres/{livre.pk}/')['ETag'], etag)
+
+    def test_import_incremente_les_versions(self):
+        avant = dict(VersionRessource.objects.values_list('nom', 'version'))
+        ImportCatalogue().importer(StringIO(
+            'titre,date_de_publication,isbn,nombre_de_pages,langue,format,categorie,auteurs,auteurs_naissance\n'
+            'Nouveau,2000-01-01,9990000000001,10,fr,Broché,Essai,Inconnu,1950-01-01\n'
+        ))
+        apres = dict(VersionRessource.objects.values_list('nom', 'version'))
+        self.assertTrue(all(apres[nom] > avant[nom] for nom in ('auteur', 'categorie', 'editeur', 'livre')))
+
+
+class AsyncCatalogueTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(3)
+        self.user = UserAccount.objects.get(username='livre-lecteur-0')
+        self.lecteur = Group.objects.create(name='lecteur')
+        self.user.groups.add(self.lecteur)
+        roles.invalidate([self.user.pk])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def jeton(self, user=None):
+        user = user or self.user
+        return {'Authorization': f'Bearer {roles.add_roles_claim(RefreshToken.for_user(user).access_token, user)}'}
+
+    def test_meme_representation_que_le_viewset(self):
+        for nom in ('livres', 'auteurs', 'exemplaires'):
+            with self.subTest(nom=nom):
+                cache.clear()
+                attendu = self.client.get(f'/api/{nom}/', {'page_size': 2}).json()
+                response = self.client.get(f'/api/async/{nom}/', {'page_size': 2}, headers=self.jeton())
+                self.assertEqual(response.status_code, 200)
+                obtenu = response.json()
+                self.assertEqual(obtenu['results'], attendu['results'])
+                self.assertEqual(obtenu['next'].replace('/async', ''), attendu['next'])
+
+                pk = obtenu['results'][0]['id']
+                cache.clear()
+                detail = self.client.get(f'/api/async/{nom}/{pk}/', headers=self.jeton())
+                self.assertEqual(detail.json(), self.client.get(f'/api/{nom}/{pk}/').json())
+
+    def test_filtres_et_tri(self):
+        Livre.objects.filter(titre='livre 1').update(langue='en')
+        response = self.client.get('/api/async/livres/', {'langue': 'en'}, headers=self.jeton())
+        self.assertEqual([livre['titre'] for livre in response.json()['results']], ['livre 1'])
+
+    def test_authentification_et_role(self):
+        self.assertEqual(self.client.get('/api/async/livres/').status_code, 401)
+        self.assertEqual(self.client.get('/api/async/livres/', headers={'Authorization': 'Bearer abc'}).status_code, 401)
+
+        autre = UserAccount.objects.create(username='sans-role', email='sans-role@example.com')
+        self.assertEqual(self.client.get('/api/async/livres/', headers=self.jeton(autre)).status_code, 403)
+        self.assertEqual(self.client.get('/api/async/livres/999999/', headers=self.jeton()).status_code, 404)
+
+    async def test_client_async(self):
+        from django.test import AsyncClient
+        jeton = await sync_to_async(self.jeton)()
+        response = await AsyncClient().get('/api/async/auteurs/', headers=jeton)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+
+
+class RetardsTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(4)
+        maintenant = timezone.now()
+        emprunts = list(Emprunt.objects.order_by('pk'))
+        # 0 et 1 en retard, 2 en retard mais rendu, 3 pas encore dû
+        Emprunt.objects.filter(pk__in=[e.pk for e in emprunts[:3]]).update(date_retour_prévue=maintenant - datetime.timedelta(days=1))
+        Emprunt.objects.filter(pk=emprunts[2].pk).update(date_retour_effective=maintenant, statut='Terminé')
+        self.emprunts = emprunts
+
+    def statuts(self):
+        return list(Emprunt.objects.order_by('pk').values_list('statut', flat=True))
+
+    def test_balayage_par_lots_idempotent(self):
+        sortie = StringIO()
+        call_command('sweep_overdue', '--batch-size', '1', '--json', stdout=sortie)
+        metriques = json.loads(sortie.getvalue())
+        self.assertEqual((metriques['marques'], metriques['lots']), (2, 2))
+        self.assertEqual(self.statuts(), ['En retard', 'En retard', 'Terminé', 'En cours'])
+
+        sortie = StringIO()
+        call_command('sweep_overdue', '--json', stdout=sortie)
+        self.assertEqual(json.loads(sortie.getvalue())['marques'], 0)
+
+
+class PretsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.livre = Livre.objects.create(
+            titre='Nana', date_de_publication=datetime.date(1880, 1, 1), isbn='9780000000077', nombre_de_pages=400,
+            langue='fr', format='Broché', categorie=Categorie.objects.create(nom='Roman', slug='roman', description=''),
+        )
+        for _ in range(2):
+            Exemplaire.objects.create(livre=self.livre, état='Bon', date_acquisition=datetime.date(2020, 1, 1), localisation='A1')
+        self.admin = UserAccount.objects.create(username='admin', email='admin@example.com')
+        self.admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def checkout(self):
+        cache.clear()
+        return self.client.post('/api/emprunts/checkout/', {'livre': self.livre.pk})
+
+    def test_emprunt_puis_retour(self):
+        premier, second = self.checkout(), self.checkout()
+        self.assertEqual((premier.status_code, second.status_code), (201, 201))
+        self.assertEqual(self.checkout().status_code, 409)
+        self.assertFalse(Exemplaire.objects.filter(disponibilité=True).exists())
+        self.livre.refresh_from_db()
+        self.assertEqual((self.livre.exemplaires_disponibles, self.livre.emprunts_en_cours), (0, 2))
+
+        cache.clear()
+        response = self.client.post(f"/api/emprunts/{premier.data['id']}/return/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['statut'], 'Terminé')
+        cache.clear()
+        self.assertEqual(self.client.post(f"/api/emprunts/{premier.data['id']}/return/").status_code, 409)
+        self.livre.refresh_from_db()
+        self.assertEqual((self.livre.exemplaires_disponibles, self.livre.emprunts_en_cours), (1, 1))
+        self.assertEqual(self.checkout().status_code, 201)
+
+    def test_livre_inconnu(self):
+        cache.clear()
+        self.assertEqual(self.client.post('/api/emprunts/checkout/', {'livre': 999999}).status_code, 404)
+
+    def test_reservation_sans_returning(self):
+        premier, second = Exemplaire.objects.order_by('pk').values_list('pk', flat=True)
+        with transaction.atomic():
+            self.assertEqual(prets._reserver_conditionnel(self.livre.pk), premier)
+            self.assertEqual(prets._reserver_conditionnel(self.livre.pk), second)
+            self.assertIsNone(prets._reserver_conditionnel(self.livre.pk))
+        self.assertFalse(Exemplaire.objects.filter(disponibilité=True).exists())
+
+
+class BatchTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(2)
+        self.livre = Livre.objects.get(titre='livre 0')
+        self.admin = UserAccount.objects.create(username='admin', email='admin@example.com')
+        self.admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def envoyer(self, methode, url, data):
+        cache.clear()
+        return getattr(self.client, methode)(url, data, format='json')
+
+    def exemplaire(self, **champs):
+        return {'livre': self.livre.pk, 'état': 'Neuf', 'date_acquisition': '2024-01-01', 'localisation': 'B2', **champs}
+
+    def test_creation_groupee(self):
+        response = self.envoyer('post', '/api/exemplaires/batch/', [self.exemplaire() for _ in range(5)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['results']], [201] * 5)
+        self.livre.refresh_from_db()
+        self.assertEqual(self.livre.nombre_exemplaires, 6)
+
+        with CaptureQueriesContext(connection) as petit:
+            self.envoyer('post', '/api/exemplaires/batch/', [self.exemplaire() for _ in range(2)])
+        with CaptureQueriesContext(connection) as grand:
+            self.envoyer('post', '/api/exemplaires/batch/', [self.exemplaire() for _ in range(20)])
+        # Seule la validation des clés étrangères dépend du nombre d'éléments
+        self.assertEqual(len(grand.captured_queries) - len(petit.captured_queries), 18)
+
+    def test_tout_ou_rien(self):
+        response = self.envoyer('post', '/api/exemplaires/batch/', [self.exemplaire(), self.exemplaire(livre=999999)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], [424, 400])
+        self.assertEqual(Exemplaire.objects.count(), 2)
+
+    def test_livres_avec_auteurs(self):
+        auteur = Auteur.objects.get(nom='Auteur livre 1')
+        response = self.envoyer('post', '/api/livres/batch/', [{
+            'titre': f'Germinal {i}', 'résumé': 'Mineurs', 'date_de_publication': '1885-01-01', 'isbn': f'97800000001{i:02d}',
+            'nombre_de_pages': 500, 'langue': 'fr', 'format': 'Broché', 'categorie': self.livre.categorie_id,
+            'auteurs': [auteur.pk],
+        } for i in range(3)])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['results'][0]['data']['auteurs'], [auteur.pk])
+        self.assertEqual(len(search.rechercher('germinal')), 3)
+
+    def test_modification_et_suppression(self):
+        ids = list(Exemplaire.objects.values_list('pk', flat=True))
+        autre = Livre.objects.get(titre='livre 1')
+        response = self.envoyer('patch', '/api/exemplaires/batch/', [{'id': ids[0], 'livre': autre.pk}, {'id': ids[1], 'état': 'Abîmé'}])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.livre.refresh_from_db()
+        autre.refresh_from_db()
+        self.assertEqual((self.livre.nombre_exemplaires, autre.nombre_exemplaires), (0, 2))
+
+        self.assertEqual(self.envoyer('patch', '/api/exemplaires/batch/', [{'id': 999999, 'état': 'x'}]).status_code, 404)
+        response = self.envoyer('delete', '/api/exemplaires/batch/', ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Exemplaire.objects.exists())
+        autre.refresh_from_db()
+        self.assertEqual(autre.nombre_exemplaires, 0)
+
+    def test_identifiants_invalides(self):
+        pk = Exemplaire.objects.first().pk
+        for methode, data in (
+            ('delete', [{'id': pk}]), ('delete', [[pk]]), ('delete', [pk, 'abc']),
+            ('patch', [{'id': [pk], 'état': 'x'}]), ('patch', [{'id': {'pk': pk}, 'état': 'x'}]),
+            ('patch', [{'id': pk, 'état': 'x'}, {'id': 'abc', 'état': 'x'}]),
+        ):
+            with self.subTest(methode=methode, data=data):
+                response = self.envoyer(methode, '/api/exemplaires/batch/', data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['results'][-1]['errors'], {'id': ['Identifiant invalide']})
+        # Une chaîne numérique désigne bien l'objet
+        response = self.envoyer('patch', '/api/exemplaires/batch/', [{'id': str(pk), 'état': 'Abîmé'}])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Exemplaire.objects.get(pk=pk).état, 'Abîmé')
+
+
+class ChampsTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(3)
+        self.user = UserAccount.objects.get(username='livre-lecteur-0')
+        self.user.groups.add(Group.objects.create(name='lecteur'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None):
+        cache.clear()
+        roles.invalidate([self.user.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in ctx.captured_queries]
+
+    def test_liste_resumee_et_detail_complet(self):
+        data, requetes = self.get('/api/livres/')
+        self.assertNotIn('résumé', data['results'][0])
+        self.assertIn('auteurs', data['results'][0])
+        self.assertFalse(any('"résumé"' in sql for sql in requetes))
+
+        detail, _ = self.get(f"/api/livres/{data['results'][0]['id']}/")
+        self.assertIn('résumé', detail)
+
+    def test_fields_et_exclude(self):
+        data, requetes = self.get('/api/livres/', {'fields': 'id,titre'})
+        self.assertEqual(set(data['results'][0]), {'id', 'titre'})
+        # Plus de prefetch des auteurs quand ils ne sont pas demandés
+        self.assertFalse(any('gestion_livre_auteurs' in sql for sql in requetes))
+
+        data, _ = self.get('/api/emprunts/', {'exclude': 'utilisateur,exemplaire'})
+        self.assertNotIn('utilisateur', data['results'][0])
+        self.assertIn('statut', data['results'][0])
+
+        data, requetes = self.get('/api/livres/', {'fields': 'titre', 'ordering': 'note_moyenne', 'page_size': 1})
+        suivante, requetes_suivante = self.get(data['next'])
+        self.assertEqual(len(requetes), len(requetes_suivante))
+
+
+class JSONRapideTests(TestCase):
+    donnees = {
+        'résumé': 'Voyage au centre de la Terre',
+        'état': 'Bon',
+        'disponibilité': True,
+        'date': datetime.date(1864, 11, 25),
+        'emprunté': datetime.datetime(2024, 5, 1, 8, 30, 15, 250, tzinfo=datetime.timezone.utc),
+        'prix': Decimal('12.50'),
+        'note': 'ligne\u2028suivante',
+    }
+
+    def test_rendu_identique_au_rendu_standard(self):
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+        rendu = FastJSONRenderer().render(self.donnees)
+        self.assertEqual(rendu, JSONRenderer().render(self.donnees))
+        self.assertIn('"résumé"'.encode(), rendu)
+        # L'indentation (API navigable, `; indent=4`) passe par json de la bibliothèque standard
+        self.assertEqual(
+            FastJSONRenderer().render(self.donnees, 'application/json; indent=4'),
+            JSONRenderer().render(self.donnees, 'application/json; indent=4'),
+        )
+
+    def test_lecture(self):
+        from rest_framework.exceptions import ParseError
+        from .parsers import FastJSONParser
+        corps = '{"état": "Abîmé", "disponibilité": false}'.encode()
+        self.assertEqual(FastJSONParser().parse(BytesIO(corps)), {'état': 'Abîmé', 'disponibilité': False})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"note": NaN}'))
+
+    def test_api(self):
+        creer_catalogue(1)
+        user = UserAccount.objects.get(username='livre-lecteur-0')
+        user.groups.add(Group.objects.create(name='lecteur'), Group.objects.create(name='admin'))
+        client = APIClient()
+        client.force_authenticate(user)
+        exemplaire = Exemplaire.objects.get()
+        response = client.patch(f'/api/exemplaires/{exemplaire.pk}/', {'état': 'Abîmé'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"état":"Abîmé"'.encode(), response.content)
+
+
+@override_settings(GESTION_IMAGES={'WORKERS': 0, 'LARGEURS': (80, 160)})
+class VignettesTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        reglages = override_settings(MEDIA_ROOT=self.media.name)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.admin = UserAccount.objects.create(username='admin', email='admin@example.com')
+        self.admin.groups.add(Group.objects.create(name='admin'), Group.objects.create(name='lecteur'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def image(self, couleur='red', nom='photo.png'):
+        contenu = BytesIO()
+        Image.new('RGBA', (120, 240), couleur).save(contenu, format='PNG')
+        return SimpleUploadedFile(nom, contenu.getvalue(), content_type='image/png')
+
+    def envoyer(self, methode, url, data):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, methode)(url, data, format='multipart')
+        self.assertIn(response.status_code, (200, 201), response.data)
+        return response
+
+    def test_vignettes_generees_a_l_envoi(self):
+        response = self.envoyer('post', '/api/auteurs/', {
+            'nom': 'Victor Hugo', 'biographie': 'Poète', 'date_de_naissance': '1802-02-26',
+            'nationalité': 'Française', 'photo': self.image(),
+        })
+        # Les vignettes sont générées après la réponse
+        self.assertIsNone(response.data['photo_vignettes'])
+        auteur = Auteur.objects.get()
+        self.assertTrue(auteur.photo_empreinte)
+
+        cache.clear()
+        vignettes = self.client.get(f'/api/auteurs/{auteur.pk}/').data['photo_vignettes']
+        self.assertEqual(set(vignettes), {'webp', 'jpeg'})
+        self.assertIn(auteur.photo_empreinte, vignettes['webp']['80'])
+        # Pas d'agrandissement : 120 px de large au plus
+        with default_storage.open(images.chemin(auteur.photo_empreinte, 160, 'jpeg')) as fichier:
+            self.assertEqual(Image.open(fichier).size, (120, 240))
+        with default_storage.open(images.chemin(auteur.photo_empreinte, 80, 'webp')) as fichier:
+            self.assertEqual(Image.open(fichier).size, (80, 160))
+
+        # Une nouvelle photo change l'empreinte, donc les URLs
+        ancienne = auteur.photo_empreinte
+        self.envoyer('patch', f'/api/auteurs/{auteur.pk}/', {'photo': self.image('blue')})
+        auteur.refresh_from_db()
+        self.assertNotIn(auteur.photo_empreinte, ('', ancienne))
+        # Modifier un autre champ ne régénère rien
+        self.envoyer('patch', f'/api/auteurs/{auteur.pk}/', {'nom': 'V. Hugo'})
+        self.assertEqual(Auteur.objects.get().photo_empreinte, auteur.photo_empreinte)
+
+    def test_nouvelle_couverture_de_livre(self):
+        creer_catalogue(1)
+        livre = Livre.objects.get()
+        self.envoyer('patch', f'/api/livres/{livre.pk}/', {'image_de_couverture': self.image()})
+        ancienne = Livre.objects.get().couverture_empreinte
+        self.assertTrue(ancienne)
+
+        # Tant que la nouvelle couverture n'est pas dérivée, l'ancienne empreinte n'est plus servie
+        cache.clear()
+        with self.captureOnCommitCallbacks() as rappels:
+            response = self.client.patch(f'/api/livres/{livre.pk}/', {'image_de_couverture': self.image('blue')}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Livre.objects.get().couverture_empreinte, '')
+        for rappel in rappels:
+            rappel()
+        self.assertNotIn(Livre.objects.get().couverture_empreinte, ('', ancienne))
+
+        livre = Livre.objects.get()
+        livre.image_de_couverture = None
+        livre.save()
+        self.assertEqual(Livre.objects.get().couverture_empreinte, '')
+
+    def test_commande_de_rattrapage(self):
+        creer_catalogue(2)
+        nom = default_storage.save('livres_couvertures/couverture.png', self.image())
+        Livre.objects.update(image_de_couverture=nom)
+        Editeur.objects.update(logo='editeurs_logos/absent.png')
+
+        sortie = StringIO()
+        call_command('deriver_images', workers=2, stdout=sortie, stderr=StringIO())
+        self.assertIn('1 images dérivées', sortie.getvalue())
+        self.assertIn('2 lignes mises à jour', sortie.getvalue())
+        self.assertEqual(set(Livre.objects.values_list('couverture_empreinte', flat=True)), {images.empreinte(
+            default_storage.open(nom).read())})
+        self.assertFalse(images.manquantes(Livre.objects.first().couverture_empreinte))
+
+
+class ProfilageTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(3)
+        self.lecteur = UserAccount.objects.get(username='livre-lecteur-0')
+        self.lecteur.groups.add(Group.objects.create(name='lecteur'))
+        self.admin = UserAccount.objects.create(username='admin', email='admin@example.com')
+        self.admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        profilage.registre = profilage.Registre()
+
+    def get(self, user, url):
+        cache.clear()
+        self.client.force_authenticate(user)
+        return self.client.get(url)
+
+    def test_metriques_prometheus(self):
+        self.assertEqual(self.get(self.lecteur, '/api/livres/').status_code, 200)
+        self.assertEqual(self.get(self.lecteur, '/api/metrics/').status_code, 403)
+
+        response = self.get(self.admin, '/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        texte = response.content.decode()
+        self.assertIn('# TYPE gestion_requete_duree_secondes histogram', texte)
+        self.assertIn('gestion_requete_duree_secondes_count{vue="livre-list",methode="GET"} 1', texte)
+        self.assertIn('gestion_requete_sql_nombre_bucket{vue="livre-list",methode="GET",le="+Inf"} 1', texte)
+        self.assertNotIn('gestion_requete_sql_nombre_sum{vue="livre-list",methode="GET"} 0.0\n', texte)
+        self.assertIn('gestion_reponses_total{vue="metrics",methode="GET",statut="403"} 1', texte)
+        serialisation = next(l for l in texte.splitlines() if l.startswith('gestion_requete_serialisation_secondes_sum{vue="livre-list"'))
+        self.assertGreater(float(serialisation.split()[-1]), 0)
+
+    def test_requetes_dupliquees(self):
+        mesures = profilage.Mesures()
+        with connection.execute_wrapper(mesures):
+            for pk in (1, 1, 2):
+                list(Livre.objects.filter(pk=pk))
+        self.assertEqual((mesures.nombre_requetes, mesures.dupliquees), (3, 1))
+        self.assertGreater(mesures.sql, 0)
+
+    @override_settings(GESTION_PROFILAGE={'ECHANTILLON': 1, 'SEUIL_LENT': 0})
+    def test_profil_des_requetes_lentes(self):
+        self.get(self.lecteur, '/api/livres/')
+        profils = self.get(self.admin, '/api/metrics/profils/').json()
+        self.assertEqual(profils[0]['vue'], 'livre-list')
+        self.assertTrue(profils[0]['fonctions'])
+
+    async def test_middleware_async(self):
+        async def vue(request):
+            await Livre.objects.acount()
+            return HttpResponse()
+
+        self.assertFalse(iscoroutinefunction(profilage.ProfilageMiddleware(lambda request: HttpResponse())))
+        middleware = profilage.ProfilageMiddleware(vue)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/api/async/livres/'))
+        self.assertEqual(response.status_code, 200)
+        texte = profilage.registre.exposer()
+        # La requête SQL part du thread de sync_to_async : elle doit pourtant être comptée
+        self.assertIn('gestion_requete_sql_nombre_sum{vue="non-resolue",methode="GET"} 1.0\n', texte)
+
+
+class ListeNoireTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserAccount.objects.create(username='lecteur', email='lecteur@example.com')
+        self.client = APIClient()
+
+    def rafraichir(self, refresh):
+        cache.clear()
+        return self.client.post('/api/auth/token/refresh/', {'refresh': str(refresh)}, format='json')
+
+    def test_rotation_et_reutilisation(self):
+        refresh = RefreshToken.for_user(self.user)
+        response = self.rafraichir(refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], str(refresh))
+        # Le jeton tourné est révoqué : le réutiliser échoue, sans requête SQL pour le savoir
+        with self.assertNumQueries(0):
+            self.assertTrue(liste_noire.liste_noire.contient(refresh['jti']))
+            self.assertFalse(liste_noire.liste_noire.contient('jamais-emis'))
+        self.assertEqual(self.rafraichir(refresh).status_code, 401)
+        self.assertEqual(self.rafraichir(response.data['refresh']).status_code, 200)
+
+    def test_revocation_concurrente(self):
+        refresh = RefreshToken.for_user(self.user)
+        doublon = RefreshToken(str(refresh))
+        refresh.blacklist()
+        with self.assertRaises(TokenError):
+            doublon.blacklist()
+
+    def test_propagation_entre_workers(self):
+        autre = liste_noire.ListeNoire()
+        self.assertFalse(autre.contient('x'))
+        refresh = RefreshToken.for_user(self.user)
+        refresh.blacklist()
+        with self.assertNumQueries(0):
+            self.assertTrue(autre.contient(refresh['jti']))
+
+        # Un processus qui démarre relit la base dans son filtre, puis confirme en SQL
+        cache.clear()
+        with self.assertNumQueries(2):
+            self.assertTrue(liste_noire.ListeNoire().contient(refresh['jti']))
+
+    def test_filtre_bloom(self):
+        filtre = liste_noire.FiltreBloom(1000, 0.01)
+        for i in range(1000):
+            filtre.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in filtre for i in range(1000)))
+        faux_positifs = sum(f'autre-{i}' in filtre for i in range(10000))
+        self.assertLess(faux_positifs, 300)
+
+    def test_purge_par_lots(self):
+        passe = timezone.now() - datetime.timedelta(days=1)
+        for i in range(5):
+            OutstandingToken.objects.create(jti=f'expire-{i}', token='', expires_at=passe)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti='expire-0'))
+        OutstandingToken.objects.create(jti='valide', token='', expires_at=timezone.now() + datetime.timedelta(days=1))
+
+        sortie = StringIO()
+        call_command('flush_expired_tokens', batch_size=2, stdout=sortie)
+        self.assertIn('5 jetons expirés supprimés, dont 1 révoqués (3 lots)', sortie.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['valide'])
+
+
+class AuthentificationSansEtatTests(TestCase):
+
+    def setUp(self):
+        creer_catalogue(1)
+        self.user = UserAccount.objects.get(username='livre-lecteur-0')
+        self.user.groups.add(Group.objects.create(name='lecteur'), Group.objects.create(name='admin'))
+        self.client = APIClient()
+
+    def jeton(self):
+        return str(ajouter_revendications(RefreshToken.for_user(self.user).access_token, self.user))
+
+    def requete(self, methode, url, data=None):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.jeton()}')
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, methode)(url, data, format='json')
+        return response, [query['sql'] for query in ctx.captured_queries]
+
+    def test_lecture_sans_charger_l_utilisateur(self):
+        response, requetes = self.requete('get', '/api/livres/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('gestion_useraccount' in sql for sql in requetes))
+
+    def test_chargement_paresseux(self):
+        utilisateur = UtilisateurJeton(AccessToken(self.jeton()))
+        with self.assertNumQueries(0):
+            self.assertEqual((utilisateur.pk, utilisateur.username), (self.user.pk, self.user.username))
+        with self.assertNumQueries(1):
+            self.assertEqual(utilisateur.email, self.user.email)
+            self.assertEqual(utilisateur.date_joined, self.user.date_joined)
+        self.assertEqual(utilisateur_reel(utilisateur), self.user)
+
+    def test_admin_reverifie_en_base(self):
+        livre = Livre.objects.get()
+        response, _ = self.requete('post', '/api/emprunts/checkout/', {'livre': livre.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Emprunt.objects.get(pk=response.data['id']).utilisateur, self.user)
+
+        # Le jeton porte toujours le rôle admin, mais il a été retiré ou le compte désactivé
+        jeton = self.jeton()
+        self.user.groups.remove(Group.objects.get(name='admin'))
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {jeton}')
+        self.assertEqual(self.client.post('/api/emprunts/checkout/', {'livre': livre.pk}).status_code, 403)
+
+        self.user.groups.add(Group.objects.get(name='admin'))
+        jeton = self.jeton()
+        UserAccount.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {jeton}')
+        self.assertEqual(self.client.post('/api/emprunts/checkout/', {'livre': livre.pk}).status_code, 403)
+
+    def test_rafraichissement_relit_le_compte(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.user.groups.remove(Group.objects.get(name='lecteur'))
+        cache.clear()
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])[roles.TOKEN_CLAIM], ['admin'])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/livres/').status_code, 403)
+
+        UserAccount.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+        self.client.credentials()
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': response.data['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.client.get('/api/livres/').status_code, 401)
+
+
+class RecommandationsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        creer_catalogue(4)
+        self.lecteurs = list(UserAccount.objects.filter(username__startswith='livre-lecteur-').order_by('username'))
+        self.livres = list(Livre.objects.order_by('titre'))
+        # Lecteurs par livre : 0 {0, 1, 2}, 1 {0, 1}, 2 {0, 1, 2}, 3 {3}
+        for lecteur, livre in ((0, 1), (0, 2), (1, 0), (1, 2), (2, 0)):
+            Evaluation.objects.create(utilisateur=self.lecteurs[lecteur], livre=self.livres[livre], note=4)
+        # Une note basse n'est pas une lecture appréciée
+        Evaluation.objects.create(utilisateur=self.lecteurs[3], livre=self.livres[0], note=1)
+        self.client = APIClient()
+
+    def table(self):
+        return {
+            (self.livres.index(Livre(pk=livre)), self.livres.index(Livre(pk=voisin))): (communs, round(score, 6))
+            for livre, voisin, communs, score in LivreSimilaire.objects.values_list('livre', 'voisin', 'communs', 'score')
+        }
+
+    def get(self, url, lecteur=0):
+        cache.clear()
+        user = self.lecteurs[lecteur]
+        user.groups.add(Group.objects.get_or_create(name='lecteur')[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {ajouter_revendications(RefreshToken.for_user(user).access_token, user)}')
+        return self.client.get(url)
+
+    def test_construction(self):
+        call_command('construire_recommandations', stdout=StringIO())
+        proche = round(2 / 6 ** 0.5, 6)
+        self.assertEqual(self.table(), {
+            (0, 2): (3, 1.0), (2, 0): (3, 1.0), (0, 1): (2, proche), (1, 0): (2, proche),
+            (1, 2): (2, proche), (2, 1): (2, proche),
+        })
+
+        with override_settings(GESTION_RECOMMANDATIONS={'K': 1}):
+            recommandations.construire()
+        # À score égal, le plus petit identifiant
+        self.assertEqual(set(self.table()), {(0, 2), (1, 0), (2, 0)})
+
+    def test_api(self):
+        recommandations.construire()
+        livre = self.livres[0]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get(f'/api/livres/{livre.pk}/similaires/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([voisin['id'] for voisin in response.data], [self.livres[2].pk, self.livres[1].pk])
+        self.assertEqual(response.data[0]['titre'], self.livres[2].titre)
+        self.assertEqual(response.data[0]['communs'], 3)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'gestion_livresimilaire' in q['sql']]), 1)
+
+        self.assertEqual(self.get(f'/api/livres/{livre.pk}/similaires/?limit=1').data[0]['id'], self.livres[2].pk)
+        self.assertEqual(self.get(f'/api/livres/{self.livres[3].pk}/similaires/').data, [])
+        self.assertEqual(self.get('/api/livres/999999/similaires/').status_code, 404)
+        self.assertEqual(self.get(f'/api/livres/{livre.pk}/similaires/?limit=x').status_code, 400)
+
+        # Le lecteur 2 a lu les livres 0 et 2, tous deux proches du livre 1
+        response = self.get('/api/livres/recommandations/', lecteur=2)
+        self.assertEqual([livre['id'] for livre in response.data], [self.livres[1].pk])
+        self.assertEqual(self.get('/api/livres/recommandations/', lecteur=3).data, [])
+
+    @override_settings(GESTION_RECOMMANDATIONS={'K': 1, 'WORKERS': 0})
+    def test_mise_a_jour_incrementale(self):
+        recommandations.construire()
+        exemplaire = Exemplaire.objects.get(livre=self.livres[1])
+        emprunt = dict(
+            exemplaire=exemplaire, utilisateur=self.lecteurs[2],
+            date_retour_prévue=timezone.now() + datetime.timedelta(days=14), statut='En cours',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Emprunt.objects.create(**emprunt)
+        incrementale = self.table()
+        recommandations.construire()
+        self.assertEqual(incrementale, self.table())
+        self.assertEqual(incrementale[1, 0], (3, 1.0))
+
+        # Un livre déjà lu ne change rien
+        Emprunt.objects.create(**emprunt)
+        self.assertEqual(recommandations.ajouter(self.lecteurs[2].pk, self.livres[1].pk), 0)
+
+
+class StatistiquesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        creer_catalogue(3)
+        self.aujourdhui = timezone.localdate()
+        self.hier = self.aujourdhui - datetime.timedelta(days=1)
+        self.livres = list(Livre.objects.order_by('titre'))
+        self.livres[2].langue = 'en'
+        self.livres[2].save()
+        # Livre 0 : emprunté hier, échu hier sans retour, donc en retard
+        maintenant = timezone.now()
+        Emprunt.objects.filter(exemplaire__livre=self.livres[0]).update(
+            date_emprunt=maintenant - datetime.timedelta(days=1), date_retour_prévue=maintenant - datetime.timedelta(hours=23),
+        )
+
+    def totaux(self, jour):
+        return {
+            (ligne.categorie_id, ligne.langue): (ligne.emprunts, ligne.retours, ligne.retards, ligne.evaluations)
+            for ligne in StatistiqueJour.objects.filter(jour=jour)
+        }
+
+    def test_sources_servies_par_index(self):
+        # Un passage incrémental ne relit que la fenêtre depuis le filigrane, sans parcourir tous les emprunts
+        maintenant = timezone.now()
+        for queryset, _ in statistiques._sources(maintenant - datetime.timedelta(days=1), maintenant):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(ligne[-1] for ligne in cursor.fetchall())
+            self.assertNotIn('SCAN gestion_emprunt', plan)
+            self.assertNotIn('SCAN gestion_evaluation', plan)
+
+    def test_agregation_incrementale(self):
+        call_command('agreger_statistiques', stdout=StringIO())
+        categorie = self.livres[0].categorie_id
+        self.assertEqual(self.totaux(self.hier), {(categorie, 'fr'): (1, 0, 1, 0)})
+        self.assertEqual(self.totaux(self.aujourdhui), {(categorie, 'fr'): (1, 0, 0, 2), (categorie, 'en'): (1, 0, 0, 1)})
+
+        # Un retour aujourd'hui, et un emprunt antidaté de plus que la marge : seuls les
+        # événements depuis le filigrane sont relus
+        Emprunt.objects.filter(exemplaire__livre=self.livres[1]).update(date_retour_effective=timezone.now(), statut='Terminé')
+        Emprunt.objects.create(
+            exemplaire=Exemplaire.objects.get(livre=self.livres[1]), utilisateur=UserAccount.objects.get(username='livre-lecteur-0'),
+            date_retour_prévue=timezone.now() + datetime.timedelta(days=14), statut='En cours',
+        )
+        Emprunt.objects.filter(date_retour_effective__isnull=True, exemplaire__livre=self.livres[1]).update(
+            date_emprunt=timezone.now() - datetime.timedelta(days=10),
+        )
+        statistiques.agreger()
+        self.assertEqual(self.totaux(self.aujourdhui)[categorie, 'fr'], (1, 1, 0, 2))
+        self.assertFalse(StatistiqueJour.objects.filter(jour__lt=self.hier).exists())
+
+        call_command('agreger_statistiques', '--depuis-le-debut', stdout=StringIO())
+        self.assertEqual(StatistiqueJour.objects.get(jour=self.aujourdhui - datetime.timedelta(days=10)).emprunts, 1)
+        self.assertEqual(self.totaux(self.aujourdhui)[categorie, 'fr'], (1, 1, 0, 2))
+
+    def test_classement_par_mois_et_jours(self):
+        # Emprunts étalés sur quatre mois : livre 1 tous les deux jours, livre 2 tous les trois
+        exemplaires = {livre: Exemplaire.objects.get(livre=livre) for livre in self.livres[1:]}
+        utilisateur = UserAccount.objects.get(username='livre-lecteur-0')
+        for jours in range(1, 120):
+            for livre, pas in ((self.livres[1], 2), (self.livres[2], 3)):
+                if jours % pas == 0:
+                    emprunt = Emprunt.objects.create(
+                        exemplaire=exemplaires[livre], utilisateur=utilisateur,
+                        date_retour_prévue=timezone.now() + datetime.timedelta(days=14), statut='En cours',
+                    )
+                    Emprunt.objects.filter(pk=emprunt.pk).update(date_emprunt=timezone.now() - datetime.timedelta(days=jours))
+        statistiques.agreger()
+
+        for decalage, duree in ((100, 80), (60, 3), (119, 119), (40, 40)):
+            debut = self.aujourdhui - datetime.timedelta(days=decalage)
+            fin = debut + datetime.timedelta(days=duree)
+            attendu = Counter(
+                Emprunt.objects.filter(date_emprunt__date__range=(debut, fin)).values_list('exemplaire__livre_id', flat=True)
+            )
+            self.assertEqual(
+                [(ligne['livre_id'], ligne['emprunts']) for ligne in statistiques.par_livre(debut, fin, limite=3)],
+                sorted(attendu.items(), key=lambda item: (-item[1], item[0])),
+            )
+
+    def test_api(self):
+        statistiques.agreger()
+        admin = UserAccount.objects.get(username='livre-lecteur-0')
+        admin.groups.add(Group.objects.create(name='admin'))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {ajouter_revendications(RefreshToken.for_user(admin).access_token, admin)}')
+
+        # Rôle admin revérifié en base, agrégats, filigrane
+        with self.assertNumQueries(3):
+            response = client.get('/api/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(jour['jour'], jour['emprunts'], jour['retards']) for jour in response.data['results']],
+            [(self.hier, 1, 1), (self.aujourdhui, 2, 0)],
+        )
+        self.assertIsNotNone(response.data['a_jour_au'])
+
+        response = client.get('/api/stats/', {'debut': self.aujourdhui.isoformat(), 'langue': 'en'})
+        self.assertEqual([(jour['jour'], jour['emprunts']) for jour in response.data['results']], [(self.aujourdhui, 1)])
+        response = client.get('/api/stats/langues/')
+        self.assertEqual([(ligne['langue'], ligne['emprunts']) for ligne in response.data['results']], [('fr', 2), ('en', 1)])
+        response = client.get('/api/stats/categories/')
+        self.assertEqual([(ligne['nom'], ligne['evaluations']) for ligne in response.data['results']], [('Roman', 3)])
+        response = client.get('/api/stats/livres/', {'tri': 'retards', 'limit': 1})
+        self.assertEqual([(ligne['titre'], ligne['retards']) for ligne in response.data['results']], [(self.livres[0].titre, 1)])
+        # LIMIT négatif : sans limite pour SQLite
+        self.assertEqual(len(client.get('/api/stats/livres/', {'limit': -1}).data['results']), 1)
+
+        self.assertEqual(client.get('/api/stats/', {'debut': 'hier'}).status_code, 400)
+        self.assertEqual(client.get('/api/stats/livres/', {'tri': 'titre'}).status_code, 400)
+        lecteur = UserAccount.objects.get(username='livre-lecteur-1')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {ajouter_revendications(RefreshToken.for_user(lecteur).access_token, lecteur)}')
+        self.assertEqual(client.get('/api/stats/').status_code, 403)
+
+
+class SQLiteTests(TestCase):
+
+    def ouvrir(self, dossier):
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': f'{dossier}/base.sqlite3'})
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, nom):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nom}')
+            return cursor.fetchone()[0]
+
+    def test_profil_production(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            wrapper = self.ouvrir(dossier)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+            # 1 : NORMAL
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+            self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+            self.assertEqual(self.pragma(wrapper, 'cache_size'), -32 * 1024)
+
+    @override_settings(GESTION_SQLITE={'PROFIL': 'defaut', 'PRAGMAS': {'busy_timeout': 1234}})
+    def test_profil_defaut_et_surcharges(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            wrapper = self.ouvrir(dossier)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 2)
+            self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
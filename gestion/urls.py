@@ -1,5 +1,6 @@
 from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
+from .async_views import AsyncAuteurView, AsyncExemplaireView, AsyncLivreView
 from .views import (
     AuteurViewSet,
     LivreViewSet,
@@ -11,9 +12,14 @@ from .views import (
     EditeurViewSet,
     LogoutView,
     SignupView,
+    SignupQRCodeView,
     LoginView,
     RefreshView,
     OTPVerificationView,
+    RechercheView,
+    MetriquesView,
+    ProfilsView,
+    StatistiquesView,
     csrf_token_view
 )
 
@@ -34,6 +40,21 @@ urlpatterns = [
     path('auth/token/refresh/', RefreshView.as_view(), name='token_refresh'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('auth/signup/', SignupView.as_view(), name='signup'),
+    path('auth/signup/qr/<str:cle>/', SignupQRCodeView.as_view(), name='signup-qr'),
     path('auth/verify-otp/', OTPVerificationView.as_view(), name='verify-otp'),
+    path('search/', RechercheView.as_view(), name='search'),
+    path('metrics/', MetriquesView.as_view(), name='metrics'),
+    path('metrics/profils/', ProfilsView.as_view(), name='metrics-profils'),
+    path('stats/', StatistiquesView.as_view(dimension='jour'), name='stats-jours'),
+    path('stats/categories/', StatistiquesView.as_view(dimension='categorie'), name='stats-categories'),
+    path('stats/langues/', StatistiquesView.as_view(dimension='langue'), name='stats-langues'),
+    path('stats/livres/', StatistiquesView.as_view(dimension='livre'), name='stats-livres'),
+    # Lecture seule native ASGI (vues async), même représentation que les viewsets
+    path('async/livres/', AsyncLivreView.as_view(), name='async-livre-list'),
+    path('async/livres/<int:pk>/', AsyncLivreView.as_view(), name='async-livre-detail'),
+    path('async/auteurs/', AsyncAuteurView.as_view(), name='async-auteur-list'),
+    path('async/auteurs/<int:pk>/', AsyncAuteurView.as_view(), name='async-auteur-detail'),
+    path('async/exemplaires/', AsyncExemplaireView.as_view(), name='async-exemplaire-list'),
+    path('async/exemplaires/<int:pk>/', AsyncExemplaireView.as_view(), name='async-exemplaire-detail'),
     path('', include(router.urls)),
 ]
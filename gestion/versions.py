@@ -0,0 +1,19 @@
+from django.db.models import F
+from django.utils import timezone
+from .models import VersionRessource
+
+
+def incrementer(*noms):
+    """Nouvelle version des ressources données, dans la transaction de l'écriture qui la provoque."""
+    maintenant = timezone.now()
+    modifies = VersionRessource.objects.filter(nom__in=noms).update(version=F('version') + 1, modifie=maintenant)
+    if modifies < len(set(noms)):
+        # Table vidée (flush) : les compteurs manquants repartent de 1
+        VersionRessource.objects.bulk_create(
+            [VersionRessource(nom=nom, version=1, modifie=maintenant) for nom in noms], ignore_conflicts=True
+        )
+
+
+def lire(nom):
+    """(version, date de modification) d'une ressource, ou None si elle n'a pas de compteur."""
+    return VersionRessource.objects.filter(nom=nom).values_list('version', 'modifie').first()
@@ -1,31 +1,44 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from .models import Auteur, Livre, Categorie, Emprunt, Commentaire, Evaluation, Editeur, Exemplaire, UserAccount
-from .serializers import TokenObtainPairSerializer, SignupSerializer, AuteurSerializer, LivreSerializer, CategorieSerializer, EmpruntSerializer, CommentaireSerializer, EvaluationSerializer, EditeurSerializer, ExemplaireSerializer
+from .serializers import TokenObtainPairSerializer, TokenRefreshSerializer, SignupSerializer, AuteurSerializer, LivreSerializer, CategorieSerializer, EmpruntSerializer, CommentaireSerializer, EvaluationSerializer, EditeurSerializer, ExemplaireSerializer, EmpruntCheckoutSerializer, BatchListSerializer, restreindre_queryset
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from .liste_noire import RefreshToken
 from .permissions import IsLecteur, IsAdmin
+from .filters import LivreFilter
+from .http_cache import CacheMixin
+from . import prets, profilage, qr, recommandations, search, statistiques, versions
+from .importation import ImportCatalogue, LECTEURS
+from .authentication import ajouter_revendications, utilisateur_reel
+from .renderers import CSVRenderer, NDJSONRenderer, PrometheusRenderer
 from rest_framework.permissions import SAFE_METHODS
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
-from io import BytesIO
 import base64
 import pyotp
-import qrcode
 from rest_framework.authtoken.models import Token
 import jwt
 import pyotp
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from itertools import islice
+import copy
+import csv
+import datetime
+import json
 from django.middleware.csrf import get_token
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_protect
 
@@ -42,14 +55,13 @@ class LoginView(TokenObtainPairView):
 class OTPVerificationView(APIView):
 
     def verify_otp(self, user, otp_token):
-        totp = pyotp.TOTP(user.otp_secret)
-        return totp.verify(otp_token)
+        return user.verify_otp(otp_token)
 
     def get_tokens_for_user(self, user):
         refresh = RefreshToken.for_user(user)
         return {
             'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            'access': str(ajouter_revendications(refresh.access_token, user)),
         }
 
     def post(self, request):
@@ -59,10 +71,10 @@ class OTPVerificationView(APIView):
         try:
             payload = jwt.decode(tmp_token, settings.SECRET_KEY, algorithms=['HS256'])
             user_id = payload.get('user_id')
-            user = UserAccount.objects.get(id=user_id)
+            user = UserAccount.objects.only('id', 'username', 'otp_secret', 'password', 'is_active').get(id=user_id, is_active=True)
         except jwt.ExpiredSignatureError:
             return Response({'error': 'Temporary token expired'}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
+        except (jwt.InvalidTokenError, UserAccount.DoesNotExist):
             return Response({'error': 'Invalid temporary token'}, status=status.HTTP_401_UNAUTHORIZED)
 
         if self.verify_otp(user, otp_token):
@@ -73,6 +85,7 @@ class OTPVerificationView(APIView):
 
 @method_decorator(csrf_protect, name='dispatch')
 class RefreshView(TokenRefreshView):
+    serializer_class = TokenRefreshSerializer
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
 
 @method_decorator(csrf_protect, name='dispatch')
@@ -80,6 +93,10 @@ class SignupView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
+        # Vérifié avant la création du compte : un format refusé ne doit pas laisser d'utilisateur
+        format_qr = request.query_params.get('qr_format') or qr.get_setting('FORMAT')
+        if format_qr not in qr.RENDERERS:
+            return Response({'qr_format': f'Doit être parmi {", ".join(qr.RENDERERS)}'}, status=status.HTTP_400_BAD_REQUEST)
         serializer = SignupSerializer(data=request.data)
         if serializer.is_valid():
             user, otp_secret = serializer.save()
@@ -87,17 +104,31 @@ class SignupView(APIView):
                 user.email, issuer_name="YourAppName"
             )
 
-            qr = qrcode.make(otp_uri)
-            buffer = BytesIO()
-            qr.save(buffer, format="PNG")
-            qr_code_image = base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-            return Response({
-                "message": "Utilisateur créé avec succès",
-                "qr_code": qr_code_image
-            }, status=status.HTTP_201_CREATED)
+            data = {"message": "Utilisateur créé avec succès", "otp_uri": otp_uri}
+            if request.query_params.get('qr') == 'inline':
+                # Ancien comportement : image rendue pendant la requête
+                data["qr_code"] = base64.b64encode(qr.render(otp_uri, format_qr)).decode('utf-8')
+            else:
+                cle = qr.planifier(otp_uri, format_qr)
+                data["qr_code_url"] = request.build_absolute_uri(reverse('signup-qr', args=[cle]))
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+class SignupQRCodeView(APIView):
+    """Image du QR code d'inscription, récupérable une seule fois par la clé renvoyée à l'inscription."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, cle):
+        resultat = qr.recuperer(cle)
+        if resultat is None:
+            return Response({'error': 'QR code inconnu ou expiré'}, status=status.HTTP_404_NOT_FOUND)
+        image, content_type = resultat
+        response = HttpResponse(image, content_type=content_type)
+        response['Cache-Control'] = 'no-store'
+        return response
+
 @method_decorator(csrf_protect, name='dispatch')
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
@@ -112,20 +143,301 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({"detail": "Échec de la déconnexion."}, status=status.HTTP_400_BAD_REQUEST)
 
-class CustomPagination(PageNumberPagination):
-    page_size = 2
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+class RechercheView(APIView):
+    permission_classes = [IsAuthenticated, IsLecteur]
+
+    def get(self, request):
+        requete = request.query_params.get('q', '')
+        try:
+            limite = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            return Response({'error': 'Paramètre limit invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultats = search.rechercher(requete, limite)
+        livres = Livre.objects.prefetch_related('auteurs').in_bulk([pk for pk, _ in resultats])
+        data = []
+        for pk, score in resultats:
+            if pk in livres:
+                data.append({**LivreSerializer(livres[pk]).data, 'score': score})
+        return Response({'count': len(data), 'results': data})
+
+class MetriquesView(APIView):
+    """Métriques par vue du processus (voir profilage.ProfilageMiddleware), au format texte Prometheus."""
+    permission_classes = [IsAdmin]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(profilage.registre.exposer())
+
+class ProfilsView(APIView):
+    """Derniers profils cProfile des requêtes lentes échantillonnées, fonctions les plus coûteuses en tête."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(list(reversed(profilage.registre.profils)))
+
+class StatistiquesView(APIView):
+    """Séries et classements sur une période, lus dans les agrégats quotidiens (voir statistiques.py).
+
+    Les données s'arrêtent au dernier passage de `manage.py agreger_statistiques` (`a_jour_au`).
+    """
+    permission_classes = [IsAdmin]
+    dimension = 'jour'
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            fin = datetime.date.fromisoformat(params['fin']) if 'fin' in params else timezone.localdate()
+            debut = (datetime.date.fromisoformat(params['debut']) if 'debut' in params
+                     else fin - datetime.timedelta(days=statistiques.get_setting('PERIODE') - 1))
+            categorie = int(params['categorie']) if 'categorie' in params else None
+            limite = max(1, min(int(params.get('limit', 10)), 100))
+        except ValueError:
+            return Response({'error': 'Paramètres debut/fin/categorie/limit invalides'}, status=status.HTTP_400_BAD_REQUEST)
+        tri = params.get('tri', 'emprunts')
+        if tri not in statistiques.COMPTEURS:
+            return Response({'error': f'Tri inconnu : {tri}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if self.dimension == 'jour':
+            resultats = statistiques.par_jour(debut, fin, categorie, params.get('langue'))
+        elif self.dimension == 'categorie':
+            resultats = statistiques.par_categorie(debut, fin)
+        elif self.dimension == 'langue':
+            resultats = statistiques.par_langue(debut, fin)
+        else:
+            resultats = statistiques.par_livre(debut, fin, tri, limite)
+        return Response({
+            'debut': debut, 'fin': fin, 'a_jour_au': statistiques.filigrane(), 'results': resultats,
+        })
+
+class Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+def valeur_json(valeur):
+    if isinstance(valeur, (datetime.date, datetime.time)):
+        return valeur.isoformat()
+    return str(valeur)
+
+class ExportMixin:
+    """Action `export/?format=csv|ndjson` diffusant la liste filtrée en flux, ligne par ligne.
+
+    Les lignes sont lues par `values_list(*export_fields).iterator()` : ni instance de modèle
+    ni serializer par ligne, et une mémoire constante quelle que soit la taille de la table.
+    """
+    export_fields = ()
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        if not queryset.ordered:
+            queryset = queryset.order_by(*self.ordering)
+        lignes = queryset.values_list(*self.export_fields).iterator(chunk_size=self.export_chunk_size)
+
+        if request.accepted_renderer.format == 'ndjson':
+            contenu = self.export_ndjson(lignes)
+        else:
+            contenu = self.export_csv(lignes)
+        response = StreamingHttpResponse(contenu, content_type=request.accepted_renderer.media_type)
+        nom = self.basename or queryset.model._meta.model_name
+        response['Content-Disposition'] = f'attachment; filename="{nom}.{request.accepted_renderer.format}"'
+        return response
+
+    def paquets(self, lignes, formater):
+        # Un morceau de réponse par lot de lignes plutôt qu'un par ligne
+        while True:
+            paquet = list(islice(lignes, self.export_chunk_size))
+            if not paquet:
+                return
+            yield ''.join(formater(ligne) for ligne in paquet)
+
+    def export_csv(self, lignes):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.export_fields)
+        yield from self.paquets(lignes, writer.writerow)
+
+    def export_ndjson(self, lignes):
+        champs = self.export_fields
+        yield from self.paquets(
+            lignes,
+            lambda ligne: json.dumps(dict(zip(champs, ligne)), default=valeur_json, ensure_ascii=False) + '\n',
+        )
+
+class SparseFieldsMixin:
+    """`?fields=` / `?exclude=` et représentation résumée des listes (voir serializers.SparseFieldsMixin),
+    avec un queryset réduit aux colonnes effectivement rendues."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['summary'] = self.action == 'list'
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        toujours = ()
+        if self.action == 'list' and hasattr(self.paginator, 'get_ordering'):
+            # La pagination par clé relit les colonnes de tri sur chaque page
+            toujours = [champ.lstrip('-') for champ in self.paginator.get_ordering(self.request, queryset, self)]
+        return restreindre_queryset(queryset, self.get_serializer(), toujours)
+
+class BatchMixin:
+    """Action `batch/` : création (POST), modification partielle (PATCH) ou suppression (DELETE)
+    d'une liste d'objets en une requête et une transaction, tout ou rien.
+
+    La validation passe par un ListSerializer ; créations et modifications sont écrites par
+    `bulk_create` / `bulk_update`, qui n'envoient pas de signaux : `batch_effets(objets)` refait
+    en une fois, pour l'ensemble des objets écrits (anciens et nouveaux états), le travail des
+    signaux. Les suppressions passent par `QuerySet.delete()`, qui envoie les signaux.
+    La réponse donne un résultat par élément, dans l'ordre de la requête.
+    """
+    batch_max_size = 500
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def batch(self, request):
+        if not isinstance(request.data, list):
+            return Response({'error': 'Une liste est attendue'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.batch_max_size:
+            return Response({'error': f'{self.batch_max_size} éléments au plus'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'POST':
+            return self.batch_create(request.data)
+        if request.method == 'PATCH':
+            return self.batch_update(request.data)
+        return self.batch_delete(request.data)
+
+    def batch_effets(self, objets):
+        pass
+
+    def batch_serializer(self, data, instances=None):
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        partial = instances is not None
+        child = serializer_class(context=context, partial=partial)
+        return BatchListSerializer(child=child, instance=instances, data=data, context=context, partial=partial)
+
+    def batch_invalide(self, erreurs, code=status.HTTP_400_BAD_REQUEST):
+        # Les éléments valides ne sont pas écrits : 424 (Failed Dependency)
+        return Response({'results': [
+            {'index': i, 'status': code, 'errors': erreur} if erreur else {'index': i, 'status': status.HTTP_424_FAILED_DEPENDENCY}
+            for i, erreur in enumerate(erreurs)
+        ]}, status=code)
+
+    def batch_ids(self, ids):
+        """Identifiants convertis au type de la clé primaire, None pour ceux qui ne s'y prêtent pas
+        (listes, objets, ...) ; renvoie aussi la réponse d'erreur à donner, ou None."""
+        pk = self.get_queryset().model._meta.pk
+        convertis = []
+        for valeur in ids:
+            try:
+                convertis.append(None if isinstance(valeur, bool) else pk.to_python(valeur))
+            except (ValidationError, TypeError, ValueError):
+                convertis.append(None)
+        if None in convertis:
+            return convertis, self.batch_invalide([
+                {'id': ['Identifiant invalide']} if valeur is None else None for valeur in convertis
+            ])
+        if len(set(convertis)) < len(convertis):
+            return convertis, Response({'error': 'Identifiants en double'}, status=status.HTTP_400_BAD_REQUEST)
+        return convertis, None
+
+    def batch_resultats(self, pks, code):
+        objets = self.get_queryset().in_bulk(pks)
+        return [
+            {'index': i, 'status': code, 'data': self.get_serializer(objets[pk]).data}
+            for i, pk in enumerate(pks)
+        ]
+
+    def batch_create(self, data):
+        serializer = self.batch_serializer(data)
+        if not serializer.is_valid():
+            return self.batch_invalide(serializer.errors)
+
+        model = self.get_queryset().model
+        m2m = {field.name: field for field in model._meta.many_to_many}
+        try:
+            with transaction.atomic():
+                objets = model.objects.bulk_create([
+                    model(**{nom: valeur for nom, valeur in attrs.items() if nom not in m2m})
+                    for attrs in serializer.validated_data
+                ])
+                for nom, field in m2m.items():
+                    through = field.remote_field.through
+                    source, cible = field.m2m_field_name(), field.m2m_reverse_field_name()
+                    through.objects.bulk_create([
+                        through(**{f'{source}_id': objet.pk, f'{cible}_id': lie.pk})
+                        for objet, attrs in zip(objets, serializer.validated_data)
+                        for lie in attrs.get(nom, [])
+                    ], ignore_conflicts=True)
+                self.batch_effets(objets)
+        except IntegrityError as e:
+            return Response({'error': f'Lot rejeté : {e}'}, status=status.HTTP_409_CONFLICT)
+        results = self.batch_resultats([objet.pk for objet in objets], status.HTTP_201_CREATED)
+        return Response({'results': results}, status=status.HTTP_201_CREATED)
+
+    def batch_update(self, data):
+        ids, erreur = self.batch_ids([item.get('id') if isinstance(item, dict) else None for item in data])
+        if erreur is not None:
+            return erreur
+        instances = self.get_queryset().in_bulk(ids)
+        if len(instances) < len(ids):
+            return self.batch_invalide([
+                None if pk in instances else {'id': ['Objet introuvable']} for pk in ids
+            ], status.HTTP_404_NOT_FOUND)
+
+        anciens = [copy.copy(instances[pk]) for pk in ids]
+        serializer = self.batch_serializer(data, instances)
+        if not serializer.is_valid():
+            return self.batch_invalide(serializer.errors)
+
+        model = self.get_queryset().model
+        m2m = {field.name for field in model._meta.many_to_many}
+        champs = set()
+        try:
+            with transaction.atomic():
+                for pk, attrs in zip(ids, serializer.validated_data):
+                    for nom, valeur in attrs.items():
+                        if nom in m2m:
+                            getattr(instances[pk], nom).set(valeur)
+                        else:
+                            setattr(instances[pk], nom, valeur)
+                            champs.add(nom)
+                if champs:
+                    model.objects.bulk_update([instances[pk] for pk in ids], sorted(champs))
+                self.batch_effets(anciens + [instances[pk] for pk in ids])
+        except IntegrityError as e:
+            return Response({'error': f'Lot rejeté : {e}'}, status=status.HTTP_409_CONFLICT)
+        return Response({'results': self.batch_resultats(ids, status.HTTP_200_OK)})
+
+    def batch_delete(self, ids):
+        ids, erreur = self.batch_ids(ids)
+        if erreur is not None:
+            return erreur
+        queryset = self.get_queryset()
+        existants = set(queryset.filter(pk__in=ids).values_list('pk', flat=True))
+        if len(existants) < len(ids):
+            return self.batch_invalide([
+                None if pk in existants else {'id': ['Objet introuvable']} for pk in ids
+            ], status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=ids).delete()
+        return Response({'results': [
+            {'index': i, 'status': status.HTTP_204_NO_CONTENT, 'id': pk} for i, pk in enumerate(ids)
+        ]})
 
 @method_decorator(csrf_protect, name='dispatch')
-class AuteurViewSet(viewsets.ModelViewSet):
+class AuteurViewSet(CacheMixin, BatchMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    cache_resource = 'auteur'
     queryset = Auteur.objects.all()
     serializer_class = AuteurSerializer
+    ordering = ('nom', 'id')
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['nom', 'nationalité']
     ordering_fields = ['date_de_naissance', 'nom']
-    pagination_class = CustomPagination
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -135,15 +447,23 @@ class AuteurViewSet(viewsets.ModelViewSet):
 
         return super().get_permissions()
 
+    def batch_effets(self, objets):
+        versions.incrementer('auteur')
+        search.reindexer(list(Livre.objects.filter(auteurs__in=objets).values_list('pk', flat=True).distinct()))
+
 @method_decorator(csrf_protect, name='dispatch')
-class LivreViewSet(viewsets.ModelViewSet):
+class LivreViewSet(CacheMixin, BatchMixin, ExportMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = Livre.objects.all()
+    cache_resource = 'livre'
+    queryset = Livre.objects.prefetch_related('auteurs')
     serializer_class = LivreSerializer
+    export_fields = ('id', 'titre', 'isbn', 'date_de_publication', 'langue', 'format', 'nombre_de_pages',
+                     'categorie_id', 'editeur_id', 'nombre_exemplaires', 'exemplaires_disponibles',
+                     'nombre_evaluations', 'note_moyenne')
+    ordering = ('-date_de_publication', '-id')
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['titre', 'langue']
-    ordering_fields = ['date_de_publication']
-    pagination_class = CustomPagination
+    filterset_class = LivreFilter
+    ordering_fields = ['date_de_publication', 'exemplaires_disponibles', 'note_moyenne']
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -153,11 +473,88 @@ class LivreViewSet(viewsets.ModelViewSet):
 
         return super().get_permissions()
 
+    def batch_effets(self, objets):
+        versions.incrementer('livre')
+        search.reindexer(list({livre.pk for livre in objets}))
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def importer(self, request):
+        fichier = request.FILES.get('fichier')
+        if fichier is None:
+            return Response({'error': 'Fichier manquant'}, status=status.HTTP_400_BAD_REQUEST)
+        format = request.data.get('format') or fichier.name.rsplit('.', 1)[-1].lower()
+        if format not in LECTEURS:
+            return Response({'error': f'Format inconnu : {format}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        importation = ImportCatalogue().importer(fichier.file, format)
+        return Response(importation.resume(), status=status.HTTP_201_CREATED if importation.crees else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        try:
+            limite = max(1, min(int(request.query_params.get('limit', 10)), 100))
+            minimum = max(1, int(request.query_params.get('min_evaluations', 1)))
+        except ValueError:
+            return Response({'error': 'Paramètres limit/min_evaluations invalides'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Lu uniquement dans les colonnes de résumé de Livre, via l'index sur note_moyenne
+        livres = (
+            Livre.objects
+            .filter(nombre_evaluations__gte=minimum)
+            .order_by('-note_moyenne', '-id')
+            .values('id', 'titre', 'note_moyenne', 'nombre_evaluations', 'nombre_recommandations',
+                    'notes_1', 'notes_2', 'notes_3', 'notes_4', 'notes_5')[:limite]
+        )
+        return Response(list(livres))
+
+    def limite(self, request):
+        try:
+            return max(1, min(int(request.query_params.get('limit', 10)), recommandations.get_setting('K')))
+        except ValueError:
+            return None
+
+    @action(detail=True, methods=['get'])
+    def similaires(self, request, pk=None):
+        limite = self.limite(request)
+        if limite is None:
+            return Response({'error': 'Paramètre limit invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def calculer():
+            try:
+                voisins = recommandations.similaires(int(pk), limite)
+            except ValueError:
+                voisins = None
+            # Une liste vide est ambiguë : livre sans voisin, ou livre inexistant
+            if not voisins and (voisins is None or not Livre.objects.filter(pk=pk).exists()):
+                return Response({'error': 'Livre introuvable'}, status=status.HTTP_404_NOT_FOUND)
+            return Response([
+                {'id': id, 'titre': titre, 'note_moyenne': note, 'exemplaires_disponibles': disponibles,
+                 'communs': communs, 'score': round(score, 4)}
+                for id, titre, note, disponibles, communs, score in voisins
+            ])
+
+        # Table mise à jour par les emprunts et la commande construire_recommandations, qui
+        # incrémentent la version de 'livre' : même ETag et même cache de page que la liste
+        return self.conditional(request, calculer, self.page_cache_key(request))
+
+    @action(detail=False, methods=['get'], url_path='recommandations')
+    def pour_moi(self, request):
+        limite = self.limite(request)
+        if limite is None:
+            return Response({'error': 'Paramètre limit invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([
+            {'id': id, 'titre': titre, 'note_moyenne': note, 'exemplaires_disponibles': disponibles,
+             'score': round(score, 4)}
+            for id, titre, note, disponibles, score in recommandations.pour_utilisateur(request.user.pk, limite)
+        ])
+
 @method_decorator(csrf_protect, name='dispatch')
-class CategorieViewSet(viewsets.ModelViewSet):
+class CategorieViewSet(CacheMixin, BatchMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    cache_resource = 'categorie'
     queryset = Categorie.objects.all()
     serializer_class = CategorieSerializer
+    ordering = ('id',)
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -167,11 +564,17 @@ class CategorieViewSet(viewsets.ModelViewSet):
 
         return super().get_permissions()
 
+    def batch_effets(self, objets):
+        versions.incrementer('categorie')
+
 @method_decorator(csrf_protect, name='dispatch')
-class EmpruntViewSet(viewsets.ModelViewSet):
+class EmpruntViewSet(ExportMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = Emprunt.objects.all()
+    queryset = Emprunt.objects.select_related('exemplaire__livre', 'utilisateur')
     serializer_class = EmpruntSerializer
+    export_fields = ('id', 'exemplaire_id', 'exemplaire__livre_id', 'utilisateur_id', 'date_emprunt',
+                     'date_retour_prévue', 'date_retour_effective', 'statut')
+    ordering = ('-date_emprunt', '-id')
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -181,11 +584,38 @@ class EmpruntViewSet(viewsets.ModelViewSet):
 
         return super().get_permissions()
 
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        serializer = EmpruntCheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            emprunt = prets.emprunter(
+                serializer.validated_data['livre'],
+                serializer.validated_data.get('utilisateur') or utilisateur_reel(request.user),
+                datetime.timedelta(days=serializer.validated_data['duree_jours']),
+            )
+        except Livre.DoesNotExist:
+            return Response({'error': 'Livre introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        except prets.PretImpossible as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(emprunt).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='return')
+    def retour(self, request, pk=None):
+        try:
+            emprunt = prets.rendre(self.get_object().pk)
+        except Emprunt.DoesNotExist:
+            return Response({'error': 'Emprunt introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        except prets.PretImpossible as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(emprunt).data)
+
 @method_decorator(csrf_protect, name='dispatch')
-class CommentaireViewSet(viewsets.ModelViewSet):
+class CommentaireViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = Commentaire.objects.all()
+    queryset = Commentaire.objects.select_related('livre', 'utilisateur')
     serializer_class = CommentaireSerializer
+    ordering = ('-date_publication', '-id')
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -196,10 +626,12 @@ class CommentaireViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
 @method_decorator(csrf_protect, name='dispatch')
-class EvaluationViewSet(viewsets.ModelViewSet):
+class EvaluationViewSet(ExportMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = Evaluation.objects.all()
+    queryset = Evaluation.objects.select_related('livre', 'utilisateur')
     serializer_class = EvaluationSerializer
+    export_fields = ('id', 'livre_id', 'utilisateur_id', 'note', 'recommandé', 'date_évaluation')
+    ordering = ('-date_évaluation', '-id')
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -210,10 +642,12 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
 @method_decorator(csrf_protect, name='dispatch')
-class EditeurViewSet(viewsets.ModelViewSet):
+class EditeurViewSet(CacheMixin, BatchMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    cache_resource = 'editeur'
     queryset = Editeur.objects.all()
     serializer_class = EditeurSerializer
+    ordering = ('id',)
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -223,11 +657,16 @@ class EditeurViewSet(viewsets.ModelViewSet):
 
         return super().get_permissions()
 
+    def batch_effets(self, objets):
+        versions.incrementer('editeur')
+        search.reindexer(list(Livre.objects.filter(editeur__in=objets).values_list('pk', flat=True)))
+
 @method_decorator(csrf_protect, name='dispatch')
-class ExemplaireViewSet(viewsets.ModelViewSet):
+class ExemplaireViewSet(BatchMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Exemplaire.objects.all()
     serializer_class = ExemplaireSerializer
+    ordering = ('id',)
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
@@ -236,3 +675,8 @@ class ExemplaireViewSet(viewsets.ModelViewSet):
             self.permission_classes = [IsAuthenticated, IsAdmin]
 
         return super().get_permissions()
+
+    def batch_effets(self, objets):
+        # Anciens et nouveaux livres : un exemplaire peut changer de livre
+        Livre.objects.filter(pk__in={exemplaire.livre_id for exemplaire in objets}).mettre_a_jour_compteurs()
+        versions.incrementer('livre')